@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+from config import (
+    ADMISSION_MAX_RUNNING,
+    ADMISSION_MAX_WAITING,
+    ADMISSION_MAX_PER_SESSION,
+    ADMISSION_RETRY_AFTER_SECONDS
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    A stream was refused before it started.
+
+    Attributes:
+        status: 429 when the session is over its own limit, 503 when the server is full
+        retry_after: Seconds for the Retry-After header
+    """
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A stream's place in the admission queue, then its running slot."""
+
+    def __init__(self, controller: 'AdmissionController', session_id: str):
+        self.controller = controller
+        self.session_id = session_id
+        self.enqueued = time.monotonic()
+        self.admitted = False
+        self.released = False
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to timeout to be admitted; True once the stream may run."""
+        return self.controller._wait(self, timeout)
+
+    def position(self) -> int:
+        """1-based place among waiting streams, 0 once admitted."""
+        return self.controller._position(self)
+
+    def release(self) -> None:
+        """Give up the slot (or the place in the queue). Safe to call twice."""
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Caps concurrent agent runs, with a bounded wait queue in front.
+
+    A session may hold at most max_per_session tickets (running or waiting).
+    A freed slot goes to the session running the fewest streams, ties going
+    to the one admitted least recently (round robin), so one busy client
+    cannot starve the others.
+    """
+
+    def __init__(self, max_running: int, max_waiting: int, max_per_session: int):
+        self.max_running = max_running
+        self.max_waiting = max_waiting
+        self.max_per_session = max_per_session
+        self._running: List[Ticket] = []
+        self._waiting: List[Ticket] = []
+        self._cond = threading.Condition()
+        self._last_admitted: Dict[str, float] = {}  # session -> when it was last given a slot
+        self._rejected = Counter()
+        self._wait_seconds = []
+
+    def reserve(self, session_id: str) -> Ticket:
+        """
+        Take a running slot, or a place in the queue.
+
+        Raises:
+            AdmissionRejected: 429 if the session already has max_per_session
+                streams, 503 if the queue is full
+        """
+        with self._cond:
+            held = sum(1 for t in self._running + self._waiting if t.session_id == session_id)
+            if held >= self.max_per_session:
+                self._rejected['session'] += 1
+                raise AdmissionRejected(
+                    f'You already have {held} analyses in progress; wait for one to finish',
+                    429, ADMISSION_RETRY_AFTER_SECONDS
+                )
+            if len(self._running) >= self.max_running and len(self._waiting) >= self.max_waiting:
+                self._rejected['busy'] += 1
+                raise AdmissionRejected(
+                    'The server is busy, try again shortly',
+                    503, ADMISSION_RETRY_AFTER_SECONDS * (1 + len(self._waiting) // max(self.max_running, 1))
+                )
+            ticket = Ticket(self, session_id)
+            self._waiting.append(ticket)
+            self._admit()
+            return ticket
+
+    def metrics(self) -> Dict[str, object]:
+        with self._cond:
+            waits = sorted(self._wait_seconds)
+            return {
+                'max_running': self.max_running,
+                'running': len(self._running),
+                'waiting': len(self._waiting),
+                'rejected': dict(self._rejected),
+                'wait_p50': round(waits[len(waits) // 2], 3) if waits else None,
+                'wait_max': round(waits[-1], 3) if waits else None
+            }
+
+    def _admit(self) -> None:
+        # Caller holds the lock
+        while self._waiting and len(self._running) < self.max_running:
+            running = Counter(t.session_id for t in self._running)
+            ticket = min(self._waiting, key=lambda t: (
+                running[t.session_id], self._last_admitted.get(t.session_id, 0.0), t.enqueued
+            ))
+            self._waiting.remove(ticket)
+            self._running.append(ticket)
+            ticket.admitted = True
+            self._last_admitted[ticket.session_id] = time.monotonic()
+            self._wait_seconds = self._wait_seconds[-199:] + [time.monotonic() - ticket.enqueued]
+            self._cond.notify_all()
+
+    def _wait(self, ticket: Ticket, timeout: float) -> bool:
+        with self._cond:
+            if not ticket.admitted and not ticket.released:
+                self._cond.wait_for(lambda: ticket.admitted or ticket.released, timeout)
+            return ticket.admitted
+
+    def _position(self, ticket: Ticket) -> int:
+        with self._cond:
+            if ticket.admitted or ticket not in self._waiting:
+                return 0
+            return self._waiting.index(ticket) + 1
+
+    def _release(self, ticket: Ticket) -> None:
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket in self._running:
+                self._running.remove(ticket)
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+            if not any(t.session_id == ticket.session_id for t in self._running + self._waiting):
+                self._last_admitted.pop(ticket.session_id, None)
+            self._admit()
+            self._cond.notify_all()
+
+
+admission = AdmissionController(ADMISSION_MAX_RUNNING, ADMISSION_MAX_WAITING, ADMISSION_MAX_PER_SESSION)
@@ -3,15 +3,25 @@ from tools.format_checker import check_format
 from tools.heading_search import search_headings
 from tools.summarizer import summarize_content
 from tools.diagram_checker import check_diagram
+from tools.retriever import retrieve_passages
+from config import ONE_SHOT_TOOLS
+from memory.document_store import state_document
+from observability.log import get_logger
+
+logger = get_logger(__name__)
 
 
 TOOL_REGISTRY = {
     "format_checker": check_format,
     "heading_search": search_headings,
     "summarizer": summarize_content,
-    "diagram_checker": check_diagram
+    "diagram_checker": check_diagram,
+    "retriever": retrieve_passages
 }
 
+# Tools that also take the user's query as a second argument
+QUERY_AWARE_TOOLS = {"heading_search", "retriever", "diagram_checker"}
+
 
 def tool_node(state: AgentState) -> AgentState:
     """Execute the planned tool with the document."""
@@ -19,29 +29,71 @@ def tool_node(state: AgentState) -> AgentState:
         return state
     
     tool_name = state['pending_actions'].pop(0)
+    run_tool(state, tool_name)
+    return state
+
+
+def run_tool(state: AgentState, tool_name: str) -> None:
+    """Run one tool on the state's document and record its output and observation."""
     tool_fn = TOOL_REGISTRY.get(tool_name)
     
     if not tool_fn:
         state['internal_notes'].append(f"Unknown tool: {tool_name}")
         state['observations'].append(f"Error: Tool {tool_name} not found")
-        return state
+        return
     
-    # Execute tool with actual document
-    output = tool_fn(state['document'])
+    # Execute tool with a read-only view of the document
+    document = state_document(state)
+    if tool_name in QUERY_AWARE_TOOLS:
+        output = tool_fn(document, state['query'])
+    else:
+        output = tool_fn(document)
     state['tool_outputs'][tool_name] = output
     
     # Record observation
     observation = f"{tool_name}: {output['summary']}"
     state['observations'].append(observation)
     state['actions_taken'].append(f"tool_executed:{tool_name}")
+
+
+def skip_reused_tools(state: AgentState) -> None:
+    """
+    Drop planned tools whose output carried over from an earlier turn.
+    
+    Query-aware tools always run again, since their output depends on the query.
+    """
+    reused = [t for t in state['pending_actions'] if t in state['tool_outputs'] and t not in QUERY_AWARE_TOOLS]
+    if reused:
+        state['pending_actions'] = [t for t in state['pending_actions'] if t not in reused]
+        state['internal_notes'].append(f"Reusing earlier outputs of: {reused}")
+
+
+def quick_tools_node(state: AgentState) -> AgentState:
+    """
+    Run every cheap tool up front, for the one-shot graph.
+    
+    Stands in for planning, reasoning and the tool loop: the tools cost
+    milliseconds, so running all of them is cheaper than asking the LLM
+    which ones to run.
+    """
+    state['goal'] = "Answer the query directly from the tool results"
+    state['plan'] = list(ONE_SHOT_TOOLS)
+    state['reasoning'] = "Simple query, answered in a single LLM call"
+    state['status'] = 'executing'
+    
+    for tool_name in ONE_SHOT_TOOLS:
+        if tool_name in state['tool_outputs'] and tool_name not in QUERY_AWARE_TOOLS:
+            continue  # Carried over from an earlier turn of the conversation
+        run_tool(state, tool_name)
     
+    state['actions_taken'].append('quick_tools:complete')
     return state
 
 
 def user_input_node(state: AgentState) -> AgentState:
     """Handle user input when agent needs clarification."""
     if state.get('awaiting_user_input'):
-        print("\n⏸️  Agent is waiting for user input...")
+        logger.info('agent is waiting for user input')
         # In real implementation, collect actual input
         state['observations'].append("User input received")
         state['awaiting_user_input'] = False
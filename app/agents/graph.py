@@ -1,11 +1,24 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, Optional
 from langgraph.graph import StateGraph, END
 from state.agent_state import AgentState, create_initial_state
 from agents.reasonings import planning_node, reasoning_node, synthesis_node
-from agents.actions import tool_node, user_input_node
+from agents.actions import QUERY_AWARE_TOOLS, tool_node, user_input_node, quick_tools_node
+from agents.router import AGENT_MODES, choose_mode
+from config import ENABLE_CHECKPOINTS
+from memory import checkpoints
+from memory.document_store import pinned
+from observability.log import get_logger
+from observability.profiling import profile_section
 from tools.critic import critic_node, should_continue
 
+logger = get_logger(__name__)
 
-def create_agent_graph() -> StateGraph:
+
+def create_agent_graph(checkpointer=None) -> StateGraph:
     """
     Create the autonomous agent execution graph.
     
@@ -20,6 +33,9 @@ def create_agent_graph() -> StateGraph:
        - If completed/error -> END
        - Otherwise -> reasoning_node (continue)
     
+    Args:
+        checkpointer: Optional LangGraph checkpointer (conversation memory)
+    
     Returns:
         Compiled StateGraph ready for execution
     """
@@ -55,10 +71,116 @@ def create_agent_graph() -> StateGraph:
         }
     )
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def create_one_shot_graph(checkpointer=None) -> StateGraph:
+    """
+    Create the one-shot graph for simple queries.
+    
+    Graph flow:
+    1. START -> quick_tools (run every cheap tool, no LLM)
+    2. quick_tools -> synthesis_node (the only LLM call) -> END
+    
+    Args:
+        checkpointer: Optional LangGraph checkpointer (conversation memory)
+    
+    Returns:
+        Compiled StateGraph ready for execution
+    """
+    workflow = StateGraph(AgentState)
+    workflow.add_node("quick_tools", quick_tools_node)
+    workflow.add_node("synthesis", synthesis_node)
+    workflow.set_entry_point("quick_tools")
+    workflow.add_edge("quick_tools", "synthesis")
+    workflow.add_edge("synthesis", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+GRAPH_BUILDERS = {
+    "full": create_agent_graph,
+    "one_shot": create_one_shot_graph
+}
+
+# Compiled graphs are stateless, so one per mode serves every request
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_agent_graph(mode: str = "full", checkpointed: bool = False):
+    """
+    Return the compiled graph for a mode, compiling it on first use.
+    
+    Checkpointed graphs share the conversation saver and must be run with a
+    thread_id config; the plain ones serve one-off runs (CLI, precompute).
+    """
+    key = (mode, checkpointed)
+    with _graphs_lock:
+        if key not in _graphs:
+            _graphs[key] = GRAPH_BUILDERS[mode](checkpoints.get_saver() if checkpointed else None)
+        return _graphs[key]
+
+
+def resume_conversation(state: AgentState, app, thread: str) -> None:
+    """
+    Seed a new turn with the tool outputs and observations of the conversation so far.
+    
+    Query-aware tool outputs are left behind, since they answered a different
+    query, and so is every output if the earlier turn looked at other pages.
+    """
+    carryover = checkpoints.load_carryover(app, thread)
+    if carryover:
+        same_pages = carryover['page_range'] == state['page_range']
+        state['tool_outputs'] = {
+            name: output for name, output in carryover['tool_outputs'].items()
+            if name not in QUERY_AWARE_TOOLS and same_pages
+        }
+        state['observations'] = carryover['observations']
+        state['internal_notes'].append(
+            f"Resumed conversation with {len(state['tool_outputs'])} earlier tool output(s)"
+        )
+    checkpoints.start_turn(thread)
+
+
+# mode -> recent (first answer token, total) run times in seconds
+LATENCY_SAMPLES = 200
+_latency = {mode: deque(maxlen=LATENCY_SAMPLES) for mode in AGENT_MODES}
+
+
+def record_latency(mode: str, first_token: Optional[float], total: float) -> None:
+    _latency[mode].append((first_token, total))
+
+
+def latency_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Per-mode latency over recent streamed runs, to compare one-shot with the full agent.
+    
+    Returns:
+        mode -> runs, median/p95 time to first answer token and total time (ms)
+    """
+    stats = {}
+    for mode, samples in _latency.items():
+        samples = list(samples)
+        firsts = sorted(f for f, _ in samples if f is not None)
+        totals = sorted(t for _, t in samples)
+        stats[mode] = {
+            'runs': len(samples),
+            'first_token_median_ms': _percentile_ms(firsts, 0.5),
+            'first_token_p95_ms': _percentile_ms(firsts, 0.95),
+            'total_median_ms': _percentile_ms(totals, 0.5),
+            'total_p95_ms': _percentile_ms(totals, 0.95)
+        }
+    return stats
+
 
+def _percentile_ms(values, q: float) -> float:
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 1)
 
-def run_agent(query: str, document: dict = None, verbose: bool = True) -> AgentState:
+
+def run_agent(query: str, document: dict = None, verbose: bool = True,
+              mode: Optional[str] = None) -> AgentState:
     """
     Run the autonomous agent with just a query!
     
@@ -66,30 +188,32 @@ def run_agent(query: str, document: dict = None, verbose: bool = True) -> AgentS
         query: User's question (e.g., "Is there an overview in this document?")
         document: The document to analyze (dict with content, metadata, etc.)
         verbose: Whether to print progress
+        mode: "full" or "one_shot"; chosen from the query when omitted
         
     Returns:
         Final agent state with answer
     """
-    # Create initial state
-    initial_state = create_initial_state(query=query, document=document)
-    
-    # Create and run graph
-    app = create_agent_graph()
+    # Pick graph
+    app = get_agent_graph(mode or choose_mode(query))
     
     if verbose:
         print(f"\n🤖 Agent received query: '{query}'")
         print("🧠 Agent is planning...\n")
     
     try:
-        final_state = app.invoke(initial_state)
+        # State carries a handle; the document stays in the store for the run
+        with pinned(document) as document_ref:
+            initial_state = create_initial_state(query=query, document=document_ref)
+            # Synthesis is an async node, so the graph has to run on an event loop
+            final_state = asyncio.run(app.ainvoke(initial_state))
         
         if verbose:
             print_execution_summary(final_state)
         
         return final_state
         
-    except Exception as e:
-        print(f"\n❌ Agent execution failed: {str(e)}")
+    except Exception:
+        logger.exception('agent execution failed')
         raise
 
 
@@ -97,30 +221,32 @@ async def run_agent_stream(query: str, document: dict):
     """
     Asynchronous generator that yields tokens for the UI.
     """
-    initial_state = create_initial_state(query=query, document=document)
-    app = create_agent_graph()
-
-    # We use astream_events to catch tokens from the LLM mid-execution
-    async for event in app.astream_events(initial_state, version="v2"):
-        kind = event["event"]
-        if kind == "on_chain_start" and event["name"] in ["planning", "reasoning", "tool_execution", "synthesis"]:
-            node_name = event["name"].replace("_", " ").title()
-            yield f"🔄 [Working: {node_name}...]\n"
-        # Handle Token Streaming (The actual text answer)
-        # In LangGraph, synthesis_node usually generates the final text.
-        # This captures tokens from the chat model during that (and other) nodes.
-        if kind == "on_chat_model_stream":
-            content = event["data"]["chunk"].content
-            if content:
-                yield content
-
-        # OPTIONAL: Handle Node Transitions (e.g., telling the user what the agent is doing)
-        elif kind == "on_chain_start" and event["name"] in ["planning", "reasoning", "synthesis"]:
-            # You could yield special tags to show status in UI
-            # yield f" [Status: {event['name']}...] "
-            pass
-
-    print("\n\n✅ Done")
+    app = get_agent_graph("full")
+
+    with pinned(document) as document_ref:
+        initial_state = create_initial_state(query=query, document=document_ref)
+
+        # We use astream_events to catch tokens from the LLM mid-execution
+        async for event in app.astream_events(initial_state, version="v2"):
+            kind = event["event"]
+            if kind == "on_chain_start" and event["name"] in ["planning", "reasoning", "tool_execution", "synthesis"]:
+                node_name = event["name"].replace("_", " ").title()
+                yield f"🔄 [Working: {node_name}...]\n"
+            # Handle Token Streaming (The actual text answer)
+            # In LangGraph, synthesis_node usually generates the final text.
+            # This captures tokens from the chat model during that (and other) nodes.
+            if kind == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if content:
+                    yield content
+
+            # OPTIONAL: Handle Node Transitions (e.g., telling the user what the agent is doing)
+            elif kind == "on_chain_start" and event["name"] in ["planning", "reasoning", "synthesis"]:
+                # You could yield special tags to show status in UI
+                # yield f" [Status: {event['name']}...] "
+                pass
+
+    logger.debug('agent stream done')
 
 # async def run_agent_stream_v2(query: str, document: dict):
 #         initial_state = create_initial_state(query=query, document=document)
@@ -181,61 +307,119 @@ async def run_agent_stream(query: str, document: dict):
 #                 yield f"ANSWER:{content}"
 
 #version#4
-async def run_agent_stream_v2(query: str, document: dict):
-    initial_state = create_initial_state(query=query, document=document)
-    app = create_agent_graph()
+async def run_agent_stream_v2(query: str, document: dict, mode: Optional[str] = None,
+                              thread: Optional[str] = None):
+    mode = mode or choose_mode(query)
+    # A conversation thread picks up where the previous turn left off
+    checkpointed = bool(thread) and ENABLE_CHECKPOINTS
+    app = get_agent_graph(mode, checkpointed)
 
-    planning_shown = False  # Track if we've shown planning output
+    # State (and every event and checkpoint) carries a handle, not the document
+    with pinned(document) as document_ref:
+        initial_state = create_initial_state(query=query, document=document_ref)
+        run_config = None
+        if checkpointed:
+            resume_conversation(initial_state, app, thread)
+            run_config = checkpoints.thread_config(thread)
 
-    async for event in app.astream_events(initial_state, version="v2"):
-        kind = event["event"]
-        name = event["name"]
+        planning_shown = False  # Track if we've shown planning output
+        answer_streamed = False  # Answer tokens already sent, so no fallback copy
+        started = time.perf_counter()
+        first_token = None
 
-        # 1. CATCH THE PLANNING NODE OUTPUT
-        if kind == "on_chain_end" and name == "planning" and not planning_shown:
-            output = event["data"]["output"]
+        try:
+            async for event in app.astream_events(initial_state, config=run_config, version="v2"):
+                kind = event["event"]
+                name = event["name"]
+
+                # 1. CATCH THE PLANNING NODE OUTPUT (quick_tools plays that role in one-shot mode)
+                if kind == "on_chain_end" and name in ("planning", "quick_tools") and not planning_shown:
+                    output = event["data"]["output"]
             
-            # Only extract clean, parsed fields from the state
-            goal = output.get('goal', '')
-            reasoning = output.get('reasoning', '')
-            plan = output.get('plan', [])
+                    # Only extract clean, parsed fields from the state
+                    goal = output.get('goal', '')
+                    reasoning = output.get('reasoning', '')
+                    plan = output.get('plan', [])
             
-            # Validate that we have actual data (not raw JSON strings)
-            if goal and isinstance(goal, str) and not goal.strip().startswith('{'):
-                yield f"THOUGHT:\n### 🎯 Goal\n{goal}\n\n"
+                    # Validate that we have actual data (not raw JSON strings)
+                    if goal and isinstance(goal, str) and not goal.strip().startswith('{'):
+                        yield f"THOUGHT:\n### 🎯 Goal\n{goal}\n\n"
             
-            if reasoning and isinstance(reasoning, str) and not reasoning.strip().startswith('{'):
-                yield f"THOUGHT:### 🧠 Strategy\n{reasoning}\n\n"
+                    if reasoning and isinstance(reasoning, str) and not reasoning.strip().startswith('{'):
+                        yield f"THOUGHT:### 🧠 Strategy\n{reasoning}\n\n"
             
-            if plan and isinstance(plan, list):
-                plan_str = " → ".join(plan)
-                yield f"THOUGHT:### 🔧 Action Plan\n`{plan_str}`\n\n---\n"
+                    if plan and isinstance(plan, list):
+                        plan_str = " → ".join(plan)
+                        yield f"THOUGHT:### 🔧 Action Plan\n`{plan_str}`\n\n---\n"
             
-            planning_shown = True
+                    planning_shown = True
 
-        # 2. CATCH LLM STREAMING FROM SYNTHESIS NODE
-        elif kind == "on_chat_model_stream":
-            # Only stream content from the synthesis node (final answer)
-            # Ignore any LLM streams from the planning node
-            if name == "synthesis" or "synthesis" in str(event.get("tags", [])):
-                content = event["data"]["chunk"].content
-                if content:
-                    # Additional filter: Don't send if it looks like JSON
-                    if not (content.strip().startswith('{') or 
-                            '"goal"' in content or 
-                            '"reasoning"' in content or
-                            '"plan"' in content):
-                        yield f"ANSWER:{content}"
+                # 2. STREAM THE ANSWER TOKENS AS THE SYNTHESIS NODE GENERATES THEM
+                # Only the synthesis node's model output is the answer; planning's JSON is not
+                elif kind == "on_chat_model_stream":
+                    if event.get("metadata", {}).get("langgraph_node") == "synthesis":
+                        content = event["data"]["chunk"].content
+                        if content:
+                            if first_token is None:
+                                first_token = time.perf_counter() - started
+                            answer_streamed = True
+                            yield f"ANSWER:{content}"
         
-        # 3. FALLBACK: Catch the final answer from state if streaming didn't work
-        elif kind == "on_chain_end" and name == "synthesis":
-            output = event["data"]["output"]
-            final_answer = output.get('final_answer', '')
+                # 3. FALLBACK: send the final answer from state only if nothing streamed
+                # (e.g. fallback synthesis without an LLM)
+                elif kind == "on_chain_end" and name == "synthesis" and not answer_streamed:
+                    output = event["data"]["output"]
+                    final_answer = output.get('final_answer', '')
             
-            if final_answer and isinstance(final_answer, str):
-                # Only yield if it's not JSON
-                if not final_answer.strip().startswith('{'):
-                    yield f"ANSWER:{final_answer}"
+                    if final_answer and isinstance(final_answer, str):
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        yield f"ANSWER:{final_answer}"
+        finally:
+            # Also when the client disconnects or the run fails: the checkpoint
+            # byte budget must not wait for some later turn
+            if checkpointed:
+                checkpoints.end_turn(thread)
+
+    total = time.perf_counter() - started
+    record_latency(mode, first_token, total)
+    logger.info('agent run', extra={
+        'mode': mode,
+        'first_token_ms': round(first_token * 1000) if first_token is not None else None,
+        'total_ms': round(total * 1000)
+    })
+
+
+def iter_agent_stream(query: str, document: dict, mode: Optional[str] = None,
+                      thread: Optional[str] = None) -> Iterator[str]:
+    """
+    Run run_agent_stream_v2 on a private event loop and yield its tokens synchronously.
+    
+    Lets plain threads (Flask request handlers, background workers) consume
+    the agent stream without managing an event loop themselves.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    gen = run_agent_stream_v2(query=query, document=document, mode=mode, thread=thread)
+    
+    # Samples of a profiled request's graph run are labelled 'graph' (a no-op otherwise)
+    with profile_section('graph'):
+        try:
+            while True:
+                try:
+                    token = loop.run_until_complete(gen.__anext__())
+                except StopAsyncIteration:
+                    break
+                
+                # Skip raw LangGraph state dictionaries
+                if isinstance(token, str):
+                    yield token
+        finally:
+            try:
+                loop.run_until_complete(gen.aclose())
+                loop.close()
+            except:
+                pass
 
 
 def print_execution_summary(state: AgentState) -> None:
@@ -1,6 +1,13 @@
 from state.agent_state import AgentState
-from config import get_llm, log_llm_interaction, ENABLE_LLM_REASONING, LLM_RETRY_ATTEMPTS
+from config import get_llm, log_llm_interaction, ENABLE_LLM_REASONING, LLM_RETRY_ATTEMPTS, RETRIEVAL_IN_SYNTHESIS
+from tools.retriever import retrieve_passages
+from agents.actions import skip_reused_tools
+from memory.document_store import state_document
+from observability.log import get_logger
 import json
+import time
+
+logger = get_logger(__name__)
 
 
 # def planning_node(state: AgentState) -> AgentState:
@@ -126,7 +133,7 @@ def planning_node(state: AgentState) -> AgentState:
     This is where the agent decides what to do autonomously using AI.
     """
     query = state['query']
-    document_metadata = state['document'].get('metadata', {})
+    document_metadata = state_document(state).get('metadata', {})
     sections = document_metadata.get('sections', [])
     
     if not ENABLE_LLM_REASONING:
@@ -139,11 +146,12 @@ Available tools:
 2. format_checker - Check document format, structure, and completeness
 3. diagram_checker - Find and analyze diagrams, figures, charts, or images
 4. summarizer - Summarize document content or specific sections
+5. retriever - Retrieve the passages of the document most relevant to the query
 
 Document Info:
 - Sections found: {', '.join(sections[:10]) if sections else 'None detected'}
 - File type: {document_metadata.get('file_type', 'unknown')}
-
+{page_scope_note(document_metadata)}{reused_tools_note(state)}
 User Query: "{query}"
 
 Analyze this query and respond with a JSON object containing:
@@ -167,65 +175,109 @@ Query: "check if document has overview, flow diagram and use case diagram"
     "reasoning": "First check for overview in headings, then search for flow and use case diagrams"
 }}
 
+Query: "What accuracy does the validation achieve?"
+{{
+    "goal": "Find the reported validation accuracy",
+    "plan": ["retriever"],
+    "reasoning": "Specific content question, so retrieve the relevant passages"
+}}
+
 Now analyze: "{query}"
 
 Respond ONLY with valid JSON, no additional text."""
 
-    llm = get_llm(temperature=0.1)
-    
     for attempt in range(LLM_RETRY_ATTEMPTS):
         try:
+            # Only a reply that parses into a plan is cached; a retry asks the model again
+            llm = get_llm(temperature=0.1, call_site="planning",
+                          cache_validator=_is_plan, read_cache=attempt == 0)
             response = llm.invoke(planning_prompt)
             response_text = response.content.strip()
             
             # IMPORTANT: Log but DON'T print/yield the raw JSON
             log_llm_interaction(planning_prompt, response_text)
             
-            # Clean response - remove markdown code blocks
-            if '```json' in response_text:
-                response_text = response_text.split('```json')[1].split('```')[0].strip()
-            elif '```' in response_text:
-                response_text = response_text.split('```')[1].split('```')[0].strip()
-            
-            # Try to find JSON in the response
-            if '{' in response_text:
-                start = response_text.find('{')
-                end = response_text.rfind('}') + 1
-                response_text = response_text[start:end]
-            
-            plan_data = json.loads(response_text)
-            
-            # Validate plan
-            if 'goal' not in plan_data or 'plan' not in plan_data:
-                raise ValueError("Missing required fields in plan")
+            plan_data = parse_plan(response_text)
             
             # Extract clean strings (not the raw JSON)
             state['goal'] = str(plan_data['goal'])
             state['plan'] = plan_data['plan']
             state['pending_actions'] = plan_data['plan'].copy()
+            skip_reused_tools(state)
             state['reasoning'] = str(plan_data.get('reasoning', 'Plan created'))
             state['status'] = 'executing'
             state['internal_notes'].append(f"LLM created plan: {plan_data['plan']}")
             state['actions_taken'].append('planning:complete')
             
-            # Print to console for debugging (this won't go to the stream)
-            print(f"🎯 Goal: {state['goal']}")
-            print(f"📝 Reasoning: {state['reasoning']}")
-            print(f"🔧 Plan: {' → '.join(state['plan'])}\n")
+            # Logged for debugging (this won't go to the stream)
+            logger.info('plan created', extra={
+                'goal': state['goal'], 'reasoning': state['reasoning'], 'plan': state['plan']
+            })
             
             return state
             
         except Exception as e:
-            print(f"⚠️  LLM planning attempt {attempt + 1} failed: {str(e)}")
+            logger.warning('LLM planning attempt failed', extra={'attempt': attempt + 1, 'error': str(e)})
             if attempt < LLM_RETRY_ATTEMPTS - 1:
-                print("🔄 Retrying...")
                 continue
     
     # Fallback if all attempts fail
-    print("⚠️  All LLM attempts failed. Using fallback planning...")
+    logger.warning('all LLM planning attempts failed, using fallback planning')
     return fallback_planning(state)
 
 
+def parse_plan(response_text: str) -> dict:
+    """
+    Parse the planner's reply into a plan.
+
+    Raises:
+        ValueError: The reply holds no JSON plan with 'goal' and 'plan'
+    """
+    # Clean response - remove markdown code blocks
+    if '```json' in response_text:
+        response_text = response_text.split('```json')[1].split('```')[0].strip()
+    elif '```' in response_text:
+        response_text = response_text.split('```')[1].split('```')[0].strip()
+    
+    # Try to find JSON in the response
+    if '{' in response_text:
+        start = response_text.find('{')
+        end = response_text.rfind('}') + 1
+        response_text = response_text[start:end]
+    
+    plan_data = json.loads(response_text)
+    
+    # Validate plan
+    if not isinstance(plan_data, dict) or 'goal' not in plan_data or 'plan' not in plan_data:
+        raise ValueError("Missing required fields in plan")
+    if not isinstance(plan_data['plan'], list):
+        raise ValueError("Plan is not a list of tools")
+    return plan_data
+
+
+def _is_plan(response_text: str) -> bool:
+    try:
+        parse_plan(response_text.strip())
+        return True
+    except ValueError:
+        return False
+
+
+def page_scope_note(document_metadata: dict) -> str:
+    """Prompt line naming the pages the tools looked at, for page-range queries."""
+    page_range = document_metadata.get('page_range')
+    if not page_range:
+        return ''
+    return f"- Pages in scope: {page_range[0]}-{page_range[1]} of {document_metadata.get('num_pages')} (tool results cover only these pages)\n"
+
+
+def reused_tools_note(state: AgentState) -> str:
+    """Prompt line listing tool outputs carried over from earlier turns, if any."""
+    if not state['tool_outputs']:
+        return ''
+    return f"- Already run earlier in this conversation (no need to plan again): {', '.join(state['tool_outputs'])}\n"
+
+
 def fallback_planning(state: AgentState) -> AgentState:
     """Fallback planning using simple pattern matching."""
     query = state['query'].lower()
@@ -265,6 +317,7 @@ def fallback_planning(state: AgentState) -> AgentState:
     state['goal'] = goal
     state['plan'] = plan
     state['pending_actions'] = plan.copy()
+    skip_reused_tools(state)
     state['reasoning'] = reasoning
     state['status'] = 'executing'
     state['internal_notes'].append(f"Created plan: {plan}")
@@ -300,21 +353,25 @@ def reasoning_node(state: AgentState) -> AgentState:
         state['actions_taken'].append('reasoning:synthesis')
     
     return state
-def synthesis_node(state: AgentState) -> AgentState:
+def build_synthesis_prompt(state: AgentState) -> str:
     """
-    Use LLM to synthesize all tool outputs into a comprehensive final answer.
+    Build the synthesis prompt from the tool outputs, retrieved passages and revision notes.
     """
     query = state['query']
     goal = state['goal']
     outputs = state['tool_outputs']
-    
-    if not ENABLE_LLM_REASONING:
-        return fallback_synthesis(state)
+    document = state_document(state)
     
     # Prepare tool outputs summary
     tool_results = []
     for tool_name, output in outputs.items():
-        tool_results.append(f"{tool_name}:\n  Status: {output['status']}\n  Summary: {output['summary']}\n  Details: {json.dumps(output['details'], indent=2)}")
+        if tool_name == 'retriever':
+            continue  # Passages go into their own section below
+        tool_results.append(f"{tool_name}:\n  Status: {output['status']}\n  Summary: {output['summary']}\n  Details: {json.dumps(output.get('details', {}), indent=2)}")
+    
+    # Ground the answer in the top-k relevant chunks instead of the whole document
+    passages = get_passages(state)
+    excerpts = '\n\n'.join(f"[{i + 1}] {p['text']}" for i, p in enumerate(passages)) or 'None retrieved'
     
     synthesis_prompt = f"""You are analyzing a document based on a user's query. You have gathered information using various tools.
 
@@ -324,7 +381,10 @@ Goal: {goal}
 Tool Results:
 {chr(10).join(tool_results)}
 
-Based on these tool results, provide a clear, direct answer to the user's query.
+Relevant Document Excerpts:
+{excerpts}
+{page_scope_note(document.get('metadata', {}))}{revision_notes(document)}
+Based on these tool results and excerpts, provide a clear, direct answer to the user's query.
 
 Guidelines:
 - Answer the specific question asked
@@ -332,18 +392,41 @@ Guidelines:
 - If the query asks "is there X?", clearly say YES or NO first
 - If asked to summarize, provide the actual summary from the tool results
 - Reference specific findings from the tools
+- Quote or cite the excerpts when the question is about specific content
 - If something wasn't found, say so clearly
 - Use natural, conversational language
 
 Provide your answer now:"""
+    return synthesis_prompt
+
 
-    llm = get_llm(temperature=0.3)
+async def synthesis_node(state: AgentState) -> AgentState:
+    """
+    Use LLM to synthesize all tool outputs into a comprehensive final answer.
+    
+    Streams the answer with astream so tokens reach astream_events as they
+    are generated, and records the time to the first token in state['timings'].
+    """
+    if not ENABLE_LLM_REASONING:
+        return fallback_synthesis(state)
+    
+    synthesis_prompt = build_synthesis_prompt(state)
+    llm = get_llm(temperature=0.3, call_site="synthesis")
     
     for attempt in range(LLM_RETRY_ATTEMPTS):
+        parts = []
+        started = time.perf_counter()
         try:
-            response = llm.invoke(synthesis_prompt)
-            final_answer = response.content.strip()
+            async for chunk in llm.astream(synthesis_prompt):
+                if chunk.content and not parts:
+                    ttft = time.perf_counter() - started
+                    state['timings']['synthesis_ttft'] = ttft
+                    logger.info('first synthesis token', extra={'ttft_ms': round(ttft * 1000)})
+                if chunk.content:
+                    parts.append(chunk.content)
             
+            final_answer = ''.join(parts).strip()
+            state['timings']['synthesis_total'] = time.perf_counter() - started
             log_llm_interaction(synthesis_prompt, final_answer)
             
             state['final_answer'] = final_answer
@@ -353,13 +436,18 @@ Provide your answer now:"""
             return state
             
         except Exception as e:
-            print(f"⚠️  LLM synthesis attempt {attempt + 1} failed: {str(e)}")
+            logger.warning('LLM synthesis attempt failed', extra={'attempt': attempt + 1, 'error': str(e)})
+            if parts:
+                # Tokens already reached the client; a retry would repeat them
+                state['final_answer'] = ''.join(parts).strip()
+                state['status'] = 'completed'
+                state['actions_taken'].append('synthesis:partial')
+                return state
             if attempt < LLM_RETRY_ATTEMPTS - 1:
-                print("🔄 Retrying...")
                 continue
     
     # Fallback if all attempts fail
-    print("⚠️  All LLM attempts failed. Using fallback synthesis...")
+    logger.warning('all LLM synthesis attempts failed, using fallback synthesis')
     return fallback_synthesis(state)
 
 
@@ -419,6 +507,30 @@ Provide your answer now:"""
 #     return fallback_synthesis(state)
 
 
+def revision_notes(document: dict) -> str:
+    """Describe what changed since the previous upload, if this document is a revision."""
+    revision = document.get('revision')
+    if not revision:
+        return ''
+    lines = [f"\nRevision Notes (compared with {revision.get('previous_filename') or 'the previous upload'}):"]
+    for label, key in [('Changed', 'changed_sections'), ('Added', 'added_sections'), ('Removed', 'removed_sections')]:
+        if revision[key]:
+            lines.append(f"- {label} sections: {', '.join(revision[key])}")
+    lines.append(f"- Unchanged sections: {revision['unchanged_sections']}")
+    return '\n'.join(lines) + '\n'
+
+
+def get_passages(state: AgentState) -> list:
+    """Passages from the retriever tool, or retrieved now if it was not planned."""
+    outputs = state['tool_outputs']
+    if 'retriever' in outputs:
+        return outputs['retriever'].get('details', {}).get('passages', [])
+    document = state_document(state)
+    if not RETRIEVAL_IN_SYNTHESIS or not document.get('content'):
+        return []
+    return retrieve_passages(document, state['query'])['details']['passages']
+
+
 def fallback_synthesis(state: AgentState) -> AgentState:
     """Fallback synthesis without LLM."""
     query = state['query']
@@ -0,0 +1,40 @@
+from config import AGENT_MODE, ONE_SHOT_MAX_QUERY_WORDS
+from memory.quick_answers import is_quick_query, normalize_query
+
+
+AGENT_MODES = ("full", "one_shot")
+
+# Phrases that suggest the query needs a multi-step plan
+COMPLEX_QUERY_MARKERS = [
+    'compare', 'versus', ' vs ', 'and then', 'step by step', 'explain why',
+    'validate', 'missing', 'complete', 'recommend', 'improve', 'every ', 'each '
+]
+
+
+def choose_mode(query: str) -> str:
+    """
+    Pick the agent graph for a query.
+
+    Simple queries (the quick-query buttons, short single questions) go to the
+    one-shot graph: cheap tools plus one LLM call. Anything long, multi-part
+    or asking for validation gets the full planning agent.
+
+    Args:
+        query: The user's query
+
+    Returns:
+        "one_shot" or "full"
+    """
+    if AGENT_MODE in AGENT_MODES:
+        return AGENT_MODE
+    if is_quick_query(query):
+        return "one_shot"
+
+    normalized = normalize_query(query)
+    if not normalized or len(normalized.split()) > ONE_SHOT_MAX_QUERY_WORDS:
+        return "full"
+    if normalized.count('?') > 1:
+        return "full"
+    if any(marker in f" {normalized} " for marker in COMPLEX_QUERY_MARKERS):
+        return "full"
+    return "one_shot"
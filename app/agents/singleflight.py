@@ -0,0 +1,177 @@
+import contextvars
+import threading
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from memory.artifacts import document_key
+from memory.quick_answers import normalize_query
+
+
+class _Flight:
+    """One agent run for a key, the tokens it has produced so far and its admission slot."""
+
+    def __init__(self, ticket=None):
+        self.tokens: List[str] = []
+        self.done = False
+        self.started = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.ticket = ticket
+        self.condition = threading.Condition()
+
+
+# key -> flight registered (queued or running) for it
+_flights = {}
+_lock = threading.Lock()
+
+
+def flight_key(document: dict, query: str) -> Tuple[str, str]:
+    """Requests with the same document contents and normalized query share a flight."""
+    return document_key(document), normalize_query(query)
+
+
+def join(key: Tuple[str, str], reserve: Optional[Callable[[], Any]] = None) -> Tuple[_Flight, bool]:
+    """
+    Join the flight registered for key, or register a new one and lead it.
+
+    Deciding leadership and reserving the run's admission slot is one step:
+    reserve() is called under the registry lock, only when no flight exists,
+    and if it raises nothing is registered. The slot belongs to the flight
+    and is released when the run ends, not when its leader's client leaves.
+    A new flight does not run until its leader follows it with produce;
+    the leader may queue first.
+
+    Args:
+        key: From flight_key()
+        reserve: Returns the run's admission ticket (e.g. admission.reserve)
+
+    Returns:
+        (flight, whether the caller leads it and must follow() it with
+        produce or abandon() it)
+    """
+    with _lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _Flight(reserve() if reserve else None)
+        _flights[key] = flight
+        return flight, True
+
+
+def abandon(key: Tuple[str, str], flight: _Flight, reason: str = 'The analysis was cancelled before it started') -> None:
+    """
+    Drop a flight whose leader left (or timed out in the queue) before it started.
+
+    Frees its slot and ends the stream of any request that joined it. Does
+    nothing once the flight has started, so it is safe to call on every exit.
+    """
+    with _lock:
+        if flight.started:
+            return
+        flight.started = True
+        if _flights.get(key) is flight:
+            del _flights[key]
+    _finish(flight, RuntimeError(reason))
+
+
+def follow(flight: _Flight, key: Optional[Tuple[str, str]] = None,
+           produce: Optional[Callable[[], Iterator[str]]] = None) -> Iterator[str]:
+    """
+    Subscribe to a flight's token stream.
+
+    Everyone (including late joiners) receives the complete stream from the
+    beginning. The flight is forgotten once it finishes, so this coalesces
+    concurrent requests only and never serves stale results.
+
+    The subscription is counted on the first step and dropped when the
+    iterator finishes or is closed; one never started is not counted.
+
+    Args:
+        flight: From join()
+        key: The flight's key (leader only)
+        produce: The leader's stream (e.g. iter_agent_stream), started on a
+            background thread once its subscription is counted
+
+    Yields:
+        Stream tokens, in order
+    """
+    with _lock:
+        flight.subscribers += 1
+    index = 0
+    try:
+        if produce is not None:
+            _start(key, flight, produce)
+        while True:
+            with flight.condition:
+                while index >= len(flight.tokens) and not flight.done:
+                    flight.condition.wait()
+                batch = flight.tokens[index:]
+                index += len(batch)
+                finished = flight.done and index >= len(flight.tokens)
+
+            for token in batch:
+                yield token
+
+            if finished:
+                break
+
+        if flight.error is not None:
+            raise flight.error
+    finally:
+        with _lock:
+            flight.subscribers -= 1
+
+
+def in_flight() -> int:
+    """Number of distinct runs currently queued or executing."""
+    with _lock:
+        return len(_flights)
+
+
+def _start(key: Tuple[str, str], flight: _Flight, produce: Callable[[], Iterator[str]]) -> None:
+    with _lock:
+        if flight.started:
+            return
+        flight.started = True
+
+    # The producer inherits the leader's context (session, LLM priority)
+    context = contextvars.copy_context()
+    threading.Thread(
+        target=context.run,
+        args=(_produce, key, flight, produce),
+        name=f"singleflight-{key[0][:8]}",
+        daemon=True
+    ).start()
+
+
+def _produce(key, flight: _Flight, produce: Callable[[], Iterator[str]]) -> None:
+    stream = produce()
+    error = None
+    try:
+        for token in stream:
+            with flight.condition:
+                flight.tokens.append(token)
+                flight.condition.notify_all()
+            
+            # Every client went away; stop spending LLM time on this run.
+            # Unregistering under the lock means no one can join it afterwards.
+            with _lock:
+                if flight.subscribers == 0:
+                    _flights.pop(key, None)
+                    break
+    except Exception as e:
+        error = e
+    finally:
+        stream.close()
+        with _lock:
+            if _flights.get(key) is flight:
+                del _flights[key]
+        _finish(flight, error)
+
+
+def _finish(flight: _Flight, error: Optional[BaseException]) -> None:
+    if flight.ticket is not None:
+        flight.ticket.release()
+    with flight.condition:
+        flight.error = error
+        flight.done = True
+        flight.condition.notify_all()
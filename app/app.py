@@ -1,12 +1,26 @@
-from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
+from startup import mark_app_imported, start_background_startup, startup_status
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, g
 import tempfile
 import os
 import json
+import time
 from datetime import datetime
 from werkzeug.utils import secure_filename
-import asyncio
-from agents.graph import run_agent_stream, run_agent_stream_v2 
+from admission import AdmissionRejected, admission
+from agents.singleflight import abandon, flight_key, follow, join
+from llm.context import llm_context
+from observability.log import bind, get_logger, log_context, timed
+from observability.profiling import profile_request, profile_section
 from main import load_document
+from config import PRECOMPUTE_QUICK_QUERIES, RETRIEVAL_INDEX_ON_UPLOAD, FIGURE_INDEX_ON_UPLOAD, ENABLE_REQUEST_COALESCING, LLM_ENDPOINTS, ENABLE_CHECKPOINTS, JOB_EVENT_HEARTBEAT_SECONDS, JOB_RETRY_AFTER_SECONDS, ADMISSION_QUEUE_TIMEOUT_SECONDS
+from jobs import FINISHED as FINISHED_JOB_STATES, JobQueueFull, runner as job_runner
+from memory import checkpoints
+from memory.artifacts import discard_artifacts, retain_artifacts
+from memory.quick_answers import QUICK_QUERIES, get_cached_stream, precompute_quick_answers, reuse_answers, retain_document, discard_document
+from memory.revisions import detect_revision
+from tools.figure_index import get_figure_index
+from tools.retriever import get_chunk_index
+from uploads import UploadError, abort_upload, completed_path, finalize_upload, init_upload, remove_completed, upload_status, write_chunk
 
 app = Flask(__name__, 
             static_folder='static',
@@ -22,6 +36,28 @@ app.config.update(
 
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt', 'md'}
 documents_store = {}
+logger = get_logger('app')
+
+
+@app.before_request
+def start_request_log():
+    """Tag every log record made for this request with a request id and the session."""
+    g.request_id = request.headers.get('X-Request-ID') or os.urandom(8).hex()
+    g.request_started = time.perf_counter()
+    bind(request_id=g.request_id, session=session.get('session_id'))
+
+
+@app.after_request
+def finish_request_log(response):
+    # For streams this is when the headers go out; the stream logs its own end
+    response.headers['X-Request-ID'] = g.request_id
+    logger.info('request', extra={
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 1)
+    })
+    return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -88,36 +124,136 @@ def upload_file():
     
     try:
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = completed_path(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
-        document = load_document(filepath)
-        
-        if 'session_id' not in session:
-            session['session_id'] = os.urandom(16).hex()
-        session_id = session['session_id']
-        
-        # documents_store[session_id] = {'document': document, 'filepath': filepath}
-        documents_store[session_id] = {
-                                        'document': document,
-                                        'filepath': filepath,
-                                        'loaded': True
-                                      }
-        print("SESSION ID:", session.get('session_id'))
-        print("DOCUMENT STORE KEYS:", list(documents_store.keys()))
-        
-        metadata = document.get('metadata', {})
-        doc_info = {
-            'filename': metadata.get('filename', filename),
-            'file_type': document.get('file_type', 'unknown').upper(),
-            'num_pages': metadata.get('num_pages'),
-            'sections': len(metadata.get('sections', []))
-        }
-        session['document_info'] = doc_info
-        session.modified = True
-        return jsonify({'success': True, 'document_info': doc_info})
+        return jsonify(register_document(filepath, filename))
+    except Exception as e:
+        return jsonify({'error': f'Failed to load document: {str(e)}'}), 500
+
+
+def current_session_id():
+    if 'session_id' not in session:
+        session['session_id'] = os.urandom(16).hex()
+        bind(request_id=g.request_id, session=session['session_id'])
+    return session['session_id']
+
+
+def register_document(filepath, filename, fingerprint=None):
+    """Load an uploaded file and make it the session's current document."""
+    with profile_request('upload', file_path=filepath):
+        return _register_document(filepath, filename, fingerprint)
+
+
+def _register_document(filepath, filename, fingerprint):
+    with profile_section('load_document'):
+        document = load_document(filepath, fingerprint=fingerprint)
+    session_id = current_session_id()
+    
+    # A new version of the current document only needs its changed sections re-analyzed
+    previous = documents_store.get(session_id, {}).get('document')
+    revision = detect_revision(previous, document)
+    retain_document(document, session_id)
+    retain_artifacts(document, session_id)
+    if revision:
+        document['revision'] = revision
+        if previous['content'] == document['content']:
+            reuse_answers(previous, document)
+    if previous and previous.get('fingerprint') != document.get('fingerprint'):
+        discard_document(previous, session_id)
+        discard_artifacts(previous, session_id)
+    
+    # documents_store[session_id] = {'document': document, 'filepath': filepath}
+    documents_store[session_id] = {
+                                    'document': document,
+                                    'filepath': filepath,
+                                    'loaded': True
+                                  }
+    logger.info('document registered', extra={
+        'document': filename,
+        'text_bytes': len(document['content']),
+        'revision': bool(revision),
+        'documents_stored': len(documents_store)
+    })
+    
+    # Lazily loaded PDFs have no content yet; page views are indexed on first query
+    if RETRIEVAL_INDEX_ON_UPLOAD and not document['metadata'].get('lazy_pages'):
+        with profile_section('chunk_index'):
+            get_chunk_index(document)
+    if FIGURE_INDEX_ON_UPLOAD and not document['metadata'].get('lazy_pages'):
+        with profile_section('figure_index'):
+            get_figure_index(document)
+    if PRECOMPUTE_QUICK_QUERIES:
+        precompute_quick_answers(document)
+    
+    metadata = document.get('metadata', {})
+    doc_info = {
+        'filename': metadata.get('filename', filename),
+        'file_type': document.get('file_type', 'unknown').upper(),
+        'num_pages': metadata.get('num_pages'),
+        'sections': len(metadata.get('sections', []))
+    }
+    session['document_info'] = doc_info
+    session.modified = True
+    return {'success': True, 'document_info': doc_info, 'revision': revision}
+
+
+@app.route('/uploads', methods=['POST'])
+def init_chunked_upload():
+    """Start a chunked upload: {filename, size, sha256?} -> {upload_id, chunk_size, num_chunks, received}."""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+    try:
+        status = init_upload(app.config['UPLOAD_FOLDER'], current_session_id(), filename,
+                             int(data.get('size') or 0), data.get('sha256'))
+        return jsonify(status), 201
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid file size'}), 400
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """Chunks already received, so the client can resume."""
+    try:
+        return jsonify(upload_status(app.config['UPLOAD_FOLDER'], current_session_id(), upload_id))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+@app.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(upload_id, index):
+    """Raw chunk bytes in the body; optional X-Chunk-SHA256 header is verified."""
+    try:
+        status = write_chunk(app.config['UPLOAD_FOLDER'], current_session_id(), upload_id, index,
+                             request.stream, request.headers.get('X-Chunk-SHA256'))
+        return jsonify(status)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    try:
+        result = finalize_upload(app.config['UPLOAD_FOLDER'], current_session_id(), upload_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    try:
+        return jsonify(register_document(result['filepath'], result['filename'], result['fingerprint']))
     except Exception as e:
         return jsonify({'error': f'Failed to load document: {str(e)}'}), 500
 
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    try:
+        abort_upload(app.config['UPLOAD_FOLDER'], current_session_id(), upload_id)
+        return jsonify({'success': True})
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
 # @app.route('/analyze-stream', methods=['POST'])
 # def analyze_stream():
 #     """Streams the agent output token by token"""
@@ -225,14 +361,62 @@ def upload_file():
 #         finally:
 #             loop.close()
 #     return Response(stream_with_context(generate()), content_type='text/event-stream')
+def classify_token(token: str) -> str:
+    """Prefix a streamed token with THOUGHT: or ANSWER:."""
+    # More robust JSON detection
+    # Check for common JSON patterns and keywords
+    stripped = token.strip()
+    is_json_data = (
+        stripped.startswith('{') or 
+        stripped.startswith('[') or
+        stripped.endswith('}') or
+        '"goal":' in token or 
+        '"plan":' in token or
+        '"reasoning":' in token or
+        '"action":' in token or
+        '"tool":' in token or
+        # Catch partial JSON fragments
+        ('"' in token and ':' in token and any(kw in token for kw in ['goal', 'plan', 'reasoning', 'action']))
+    )
+    
+    if is_json_data:
+        # This is internal planning/reasoning - send as THOUGHT
+        payload = f"THOUGHT:{token}"
+    elif token.startswith("THOUGHT:"):
+        # Already prefixed as thought
+        payload = token
+    elif token.startswith("ANSWER:"):
+        # Already prefixed as answer
+        payload = token
+    else:
+        # Default: treat unprefixed content as answer
+        payload = f"ANSWER:{token}"
+    
+    return payload
+
+def token_to_sse(token: str) -> str:
+    """Classify a streamed token as THOUGHT or ANSWER and wrap it as an SSE event."""
+    return f"data: {json.dumps({'type': 'token', 'content': classify_token(token)})}\n\n"
+
+def conversation_thread(session_id, conversation_index, document):
+    """
+    Checkpoint thread for a conversation, or None when checkpoints are off.
+
+    Follow-up turns resume the conversation's checkpoint. A new conversation
+    gets the index it will have once its first answer is saved.
+    """
+    if not ENABLE_CHECKPOINTS:
+        return None
+    if conversation_index is None:
+        conversation_index = len(session.get('conversations', []))
+    return checkpoints.thread_id(session_id, conversation_index, document)
+
 @app.route('/analyze-stream', methods=['POST'])
 def analyze_stream():
     """Streams the agent output token by token"""
     data = request.json
     query = data.get('query', '').strip()
     session_id = session.get('session_id')
-    print("SESSION ID:", session.get('session_id'))
-    print("DOCUMENT STORE KEYS:", list(documents_store.keys()))
 
     # if not query:
     #     return jsonify({'error': 'Please enter a question'}), 400
@@ -257,68 +441,241 @@ def analyze_stream():
 
     # document = documents_store[session_id]['document']
     
-    def generate():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        gen = run_agent_stream_v2(query=query, document=document)
-        
+    cached_tokens = get_cached_stream(document, query) if PRECOMPUTE_QUICK_QUERIES else None
+    
+    thread = conversation_thread(session_id, data.get('conversation_index'), document)
+
+    key = None
+    if ENABLE_REQUEST_COALESCING:
+        # Identical concurrent requests share one graph execution; a
+        # conversation with history gets its own, since its context differs
+        key = flight_key(document, query)
+        if thread and checkpoints.has_thread(thread):
+            key += (thread,)
+
+    # Each agent run holds one admission slot. Replays and requests joining a
+    # run already registered start none, so they take none; a leader's slot is
+    # reserved atomically with its leadership and held until the run ends.
+    # Past the limits, fail fast.
+    flight, leader, ticket = None, True, None
+    if cached_tokens is None:
         try:
-            while True:
-                try:
-                    token = loop.run_until_complete(gen.__anext__())
+            if key:
+                flight, leader = join(key, reserve=lambda: admission.reserve(session_id))
+                ticket = flight.ticket if leader else None
+            else:
+                ticket = admission.reserve(session_id)
+        except AdmissionRejected as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, e.status
+
+    def release():
+        if flight is None:
+            if ticket:
+                ticket.release()
+        elif leader:
+            # Left (or timed out in the queue) before the run started; a started
+            # run releases its own slot when it ends
+            abandon(key, flight)
+
+    def generate():
+        if cached_tokens is not None:
+            # Replay the answer precomputed in the background after upload
+            logger.info('analysis stream replayed', extra={'tokens': len(cached_tokens)})
+            for token in cached_tokens:
+                yield token_to_sse(token)
+            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            return
+
+        with timed(logger, 'analysis stream finished', coalesced=not leader) as stats:
+            try:
+                if ticket and not ticket.admitted:
+                    yield from wait_for_admission(ticket)
+                    if not ticket.admitted:
+                        stats['admitted'] = False
+                        return
+                    stats['queued_ms'] = round((time.monotonic() - ticket.enqueued) * 1000, 1)
+
+                # LLM calls made for this request queue fairly against other sessions
+                with llm_context(session=session_id), profile_request('analyze', query, document):
+                    # Imported on first use (or by the background preload) to keep startup fast
+                    from agents.graph import iter_agent_stream
                     
-                    # Skip raw LangGraph state dictionaries
-                    if isinstance(token, dict):
-                        continue 
+                    if flight:
+                        # The leader's run starts once its subscription is counted
+                        produce = (lambda: iter_agent_stream(query, document, thread=thread)) if leader else None
+                        tokens = follow(flight, key, produce)
+                    else:
+                        tokens = iter_agent_stream(query, document, thread=thread)
                     
-                    if isinstance(token, str):
-                        # More robust JSON detection
-                        # Check for common JSON patterns and keywords
-                        stripped = token.strip()
-                        is_json_data = (
-                            stripped.startswith('{') or 
-                            stripped.startswith('[') or
-                            stripped.endswith('}') or
-                            '"goal":' in token or 
-                            '"plan":' in token or
-                            '"reasoning":' in token or
-                            '"action":' in token or
-                            '"tool":' in token or
-                            # Catch partial JSON fragments
-                            ('"' in token and ':' in token and any(kw in token for kw in ['goal', 'plan', 'reasoning', 'action']))
-                        )
-                        
-                        if is_json_data:
-                            # This is internal planning/reasoning - send as THOUGHT
-                            payload = f"THOUGHT:{token}"
-                        elif token.startswith("THOUGHT:"):
-                            # Already prefixed as thought
-                            payload = token
-                        elif token.startswith("ANSWER:"):
-                            # Already prefixed as answer
-                            payload = token
-                        else:
-                            # Default: treat unprefixed content as answer
-                            payload = f"ANSWER:{token}"
+                    stats['tokens'] = 0
+                    try:
+                        for token in tokens:
+                            stats['tokens'] += 1
+                            yield token_to_sse(token)
                         
-                        yield f"data: {json.dumps({'type': 'token', 'content': payload})}\n\n"
+                        yield f"data: {json.dumps({'type': 'done'})}\n\n"
                         
-                except StopAsyncIteration:
-                    break
-            
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
-            
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-        finally:
-            try:
-                loop.close()
-            except:
-                pass
+                    except Exception as e:
+                        logger.exception('analysis stream failed')
+                        yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            finally:
+                release()
     
+    response = Response(stream_with_context(generate()), content_type='text/event-stream')
+    if ticket:
+        # Also frees the slot if the client leaves before the stream starts
+        response.call_on_close(release)
+    return response
+
+def wait_for_admission(ticket):
+    """
+    Hold a queued stream until it is admitted, sending its queue position.
+
+    Ends with an error event if ADMISSION_QUEUE_TIMEOUT_SECONDS pass first.
+    """
+    deadline = time.monotonic() + ADMISSION_QUEUE_TIMEOUT_SECONDS
+    position = None
+    while not ticket.admitted:
+        current = ticket.position()
+        if current != position:
+            position = current
+            yield f"data: {json.dumps({'type': 'queued', 'position': position})}\n\n"
+        if ticket.wait(timeout=1.0):
+            break
+        if time.monotonic() >= deadline:
+            ticket.release()
+            yield f"data: {json.dumps({'type': 'error', 'message': 'The server is busy, please try again'})}\n\n"
+            return
+    yield f"data: {json.dumps({'type': 'admitted'})}\n\n"
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue an analysis on the job pool and return its id immediately.
+
+    The answer is collected with GET /jobs/<id>, or streamed (and resumed
+    after a disconnect) from GET /jobs/<id>/events.
+    """
+    data = request.get_json(silent=True) or {}
+    query = (data.get('query') or '').strip()
+    session_id = current_session_id()
+    if not query:
+        return jsonify({'error': 'Please enter a question'}), 400
+
+    entry = documents_store.get(session_id)
+    if not entry or not entry.get('document'):
+        return jsonify({'error': 'Please upload a document first'}), 400
+    document = entry['document']
+    thread = conversation_thread(session_id, data.get('conversation_index'), document)
+    cached_tokens = get_cached_stream(document, query) if PRECOMPUTE_QUICK_QUERIES else None
+
+    job_id = os.urandom(16).hex()
+    request_id = g.request_id
+
+    def produce():
+        if cached_tokens is not None:
+            yield from cached_tokens
+            return
+        # Jobs are background work: their LLM calls yield to interactive streams
+        with log_context(request_id=request_id, session=session_id, job=job_id), \
+                llm_context(session=session_id, priority='batch'), profile_request('job', query, document):
+            from agents.graph import iter_agent_stream
+            yield from iter_agent_stream(query, document, thread=thread)
+
+    try:
+        job = job_runner.submit(job_id, session_id, query, produce)
+    except JobQueueFull as e:
+        response = jsonify({'error': f'Too many queued analyses ({str(e)}), try again later'})
+        response.headers['Retry-After'] = str(JOB_RETRY_AFTER_SECONDS)
+        return response, 503
+
+    response = jsonify({'job_id': job.id, 'status': job.status, 'position': job_runner.position(job)})
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response, 202
+
+
+def job_result(job):
+    """Job status, with the answer and thoughts streamed so far."""
+    payloads = [classify_token(token) for token in job.tokens]
+    result = job.snapshot()
+    result['position'] = job_runner.position(job)
+    result['answer'] = ''.join(p[len('ANSWER:'):] for p in payloads if p.startswith('ANSWER:'))
+    result['thoughts'] = ''.join(p[len('THOUGHT:'):] for p in payloads if p.startswith('THOUGHT:'))
+    return result
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_runner.get(job_id, current_session_id())
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job_result(job))
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_runner.get(job_id, current_session_id())
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    job_runner.cancel(job)
+    return jsonify({'job_id': job.id, 'status': job.status})
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Stream a job's tokens as SSE, from the start or from where a client left off.
+
+    Each token event carries an id, so a reconnecting EventSource resumes
+    via Last-Event-ID; ?from=<n> does the same for other clients.
+    """
+    job = job_runner.get(job_id, current_session_id())
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    resume = request.headers.get('Last-Event-ID') or request.args.get('from') or 0
+    try:
+        start = max(int(resume), 0)
+    except ValueError:
+        start = 0
+
+    def generate():
+        index = start
+        position = None
+        while True:
+            tokens, status = job.wait_for_tokens(index, JOB_EVENT_HEARTBEAT_SECONDS)
+            for token in tokens:
+                index += 1
+                yield f"id: {index}\n{token_to_sse(token)}"
+
+            if status == 'queued':
+                current = job_runner.position(job)
+                if current != position:
+                    position = current
+                    yield f"data: {json.dumps({'type': 'queued', 'position': position})}\n\n"
+            if status in FINISHED_JOB_STATES:
+                if status == 'failed':
+                    yield f"data: {json.dumps({'type': 'error', 'message': job.error})}\n\n"
+                yield f"data: {json.dumps({'type': 'done', 'status': status})}\n\n"
+                return
+            if not tokens:
+                yield ": keep-alive\n\n"
+
     return Response(stream_with_context(generate()), content_type='text/event-stream')
 
-from langchain_core.messages import HumanMessage, SystemMessage
+
+@app.route('/admission-metrics', methods=['GET'])
+def admission_metrics():
+    """Running and waiting analysis streams, rejections and queue wait times"""
+    return jsonify(admission.metrics())
+
+
+@app.route('/job-metrics', methods=['GET'])
+def job_metrics():
+    """Job pool size, queue depth and running/completed counts"""
+    return jsonify(job_runner.metrics())
+
 from config import get_llm
 
 # def generate_meaningful_title(query):
@@ -378,20 +735,21 @@ from config import get_llm
 #     })
 
 
-from langchain_core.messages import HumanMessage, SystemMessage
-
 def generate_meaningful_title(query):
     """Uses Ollama to generate a clean 3-5 word title."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    
     try:
         # Using your existing get_llm helper
-        llm = get_llm(temperature=0.1) 
+        llm = get_llm(temperature=0.1, call_site="title") 
         
         prompt = [
             SystemMessage(content="Summarize the user's request into a 3-5 word title. Output ONLY the title text. No quotes, no explanations, no periods."),
             HumanMessage(content=query)
         ]
         
-        response = llm.invoke(prompt)
+        with llm_context(session=session.get('session_id')):
+            response = llm.invoke(prompt)
         # Clean up any potential junk formatting
         title = response.content.strip().replace('"', '').replace('*', '')
         
@@ -401,7 +759,7 @@ def generate_meaningful_title(query):
             
         return title
     except Exception as e:
-        print(f"Naming Error: {e}")
+        logger.warning('title generation failed', extra={'error': str(e)})
         return query[:30] + "..."
 
 @app.route('/save-chat', methods=['POST'])
@@ -456,7 +814,7 @@ def save_chat():
         })
 
     except Exception as e:
-        print(f"ERROR IN SAVE-CHAT: {e}") # This shows up in your terminal
+        logger.exception('save-chat failed')
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/clear-document', methods=['POST'])
@@ -468,12 +826,14 @@ def clear_document():
         # Clean up temporary file
         try:
             filepath = documents_store[session_id].get('filepath')
-            if filepath and os.path.exists(filepath):
-                os.remove(filepath)
+            if filepath:
+                remove_completed(filepath)
         except:
             pass
         
         # Remove from memory store
+        discard_document(documents_store[session_id]['document'], session_id)
+        discard_artifacts(documents_store[session_id]['document'], session_id)
         del documents_store[session_id]
     
     session.pop('document_info', None)
@@ -485,6 +845,8 @@ def clear_document():
 def clear_history():
     """Clear chat history"""
     session['conversations'] = []
+    if session.get('session_id'):
+        checkpoints.discard_session(session['session_id'])
     return jsonify({'success': True})
 
 @app.route('/get-conversations', methods=['GET'])
@@ -494,17 +856,34 @@ def get_conversations():
     return jsonify({'conversations': conversations})
 
 
+@app.route('/llm-metrics', methods=['GET'])
+def llm_metrics():
+    """LLM scheduler queue depth, in-flight count and wait times, plus backend load"""
+    from llm.scheduler import scheduler
+    metrics = scheduler.metrics()
+    if len(LLM_ENDPOINTS) > 1:
+        from llm.backends import pool
+        metrics['backends'] = pool.status()
+    return jsonify(metrics)
+
+
+@app.route('/agent-metrics', methods=['GET'])
+def agent_metrics():
+    """Latency of recent runs per agent mode (one-shot vs full)"""
+    from agents.graph import latency_stats
+    return jsonify(latency_stats())
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Startup timings and whether preload and model warm-up have finished"""
+    return jsonify(startup_status())
+
+
 @app.route('/quick-query/<query_type>', methods=['POST'])
 def quick_query(query_type):
     """Handle quick query buttons"""
-    queries = {
-        'format': 'Is the document properly formatted?',
-        'overview': 'Is there an overview section?',
-        'diagrams': 'Does the document contain diagrams or figures?',
-        'summarize': 'Provide a summary of the document'
-    }
-    
-    query = queries.get(query_type, '')
+    query = QUICK_QUERIES.get(query_type, '')
     return jsonify({'query': query})
 @app.route('/delete-conversation', methods=['POST'])
 def delete_conversation():
@@ -524,6 +903,9 @@ def delete_conversation():
             conversations.pop(index_to_delete)
             session['conversations'] = conversations
             session.modified = True
+            # Later conversations shift down one index, so their checkpoint
+            # threads no longer line up; drop them rather than mix them up
+            checkpoints.discard_session(session.get('session_id', ''))
             
             return jsonify({
                 "success": True, 
@@ -533,5 +915,11 @@ def delete_conversation():
     return jsonify({"success": False, "error": "Conversation not found"}), 404
 
 
+mark_app_imported()
+
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # With the debug reloader, only the serving child process does the startup work
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_startup()
+    app.run(debug=True, port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
@@ -1,9 +1,16 @@
-from langchain_ollama import ChatOllama
-from typing import Optional
+import os
+from typing import Callable, Optional
 
 # LLM Configuration
 LLM_MODEL = "gemini-3-flash-preview:cloud"
 LLM_TEMPERATURE = 0.2
+LLM_KEEP_ALIVE = "30m"  # How long Ollama keeps the model loaded after a request
+
+# Startup Configuration
+# The agent stack (LangGraph, langchain-ollama, loaders) is imported on first
+# use; these settings load it and the model in the background at boot instead
+PRELOAD_IN_BACKGROUND = True
+WARM_UP_MODEL = True  # Load LLM_MODEL into Ollama (kept for LLM_KEEP_ALIVE) before the first query
 
 # Agent Configuration
 DEFAULT_MAX_ITERATIONS = 50
@@ -14,30 +21,147 @@ AVAILABLE_TOOLS = [
     "format_checker",
     "heading_search",
     "diagram_checker",
-    "summarizer"
+    "summarizer",
+    "retriever"
 ]
 
+FORMAT_PROFILE = "general"  # Format rules used by format_checker: general, technical_spec, business_report
+HEADING_SEARCH_TOP_K = 5  # Sections returned by heading_search for a query
+
+# Retrieval Configuration
+RETRIEVAL_CHUNK_WORDS = 120  # Approximate passage size for the chunk index
+RETRIEVAL_TOP_K = 4  # Passages fed into synthesis
+RETRIEVAL_INDEX_ON_UPLOAD = True  # Build the chunk index at upload instead of on first query
+RETRIEVAL_IN_SYNTHESIS = True  # Always ground synthesis in retrieved passages
+
+# Agent state carries a small handle instead of the whole document; tools
+# resolve it through memory.document_store to a read-only view
+PASS_DOCUMENTS_BY_REFERENCE = True
+
+# Per-document indexes (section index, ...) kept in memory
+ARTIFACT_CACHE_MAX_DOCUMENTS = 32
+TERM_CACHE_SIZE = 50000  # Tokenized sections/chunks reused across revisions of a document
+
+# Revision Detection Configuration
+REVISION_MIN_SHARED_SECTIONS = 0.5  # Share of headings a new upload must keep to count as a revision
+
+# Agent Mode Configuration
+AGENT_MODE = "auto"  # "auto" routes simple queries to "one_shot"; or force "full" / "one_shot"
+ONE_SHOT_MAX_QUERY_WORDS = 12  # Longer queries always use the full planning agent
+ONE_SHOT_TOOLS = ["heading_search", "format_checker", "diagram_checker", "summarizer", "retriever"]  # Run unconditionally in one-shot mode
+
+# Conversation Checkpoint Configuration
+ENABLE_CHECKPOINTS = True  # Follow-up turns reuse earlier tool outputs and observations
+CHECKPOINT_MAX_THREADS = 64  # Conversations kept; least recently used are dropped
+CHECKPOINT_TTL_SECONDS = 30 * 60  # Idle conversations expire after this long
+CHECKPOINT_MAX_BYTES = 64 * 1024 * 1024  # Serialized checkpoints kept in all; least recently used conversations go first
+
 # Reasoning Configuration
 ENABLE_LLM_REASONING = True  # Set to False to use fallback logic only
 LLM_RETRY_ATTEMPTS = 2  # Number of times to retry LLM on failure
 
+# Document Loading Configuration
+PDF_LAZY_MIN_PAGES = 150  # Larger PDFs load only the outline; pages are extracted on demand (None disables)
+PDF_UNSCOPED_MAX_PAGES = 30  # Pages read for a query on such a PDF that names no pages: the outline section it matches, else the first pages
+DOCX_ENGINE = "python-docx"  # "python-docx" or "streaming" (single-pass XML parser, bounded memory)
+
+# Diagram Analysis Configuration
+# PDF vector geometry is classified per page region (see loaders/diagram_geometry.py)
+DIAGRAM_TIME_BUDGET_SECONDS = 3.0  # check_diagram reports the pages analyzed by then; later calls continue
+DIAGRAM_MAX_PRIMITIVES = 2000  # Vector elements classified per page; busier pages are sampled evenly
+FIGURE_INDEX_ON_UPLOAD = True  # Index figure/table captions and references at upload instead of on first query
+
+# Upload Configuration
+# Large files are sent as numbered chunks (see uploads.py); each request stays
+# under Flask's MAX_CONTENT_LENGTH and an interrupted upload resumes
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+UPLOAD_MAX_BYTES = 2 * 1024 * 1024 * 1024
+UPLOAD_TTL_SECONDS = 24 * 60 * 60  # Unfinished uploads are deleted after this long idle
+
+# Request Configuration
+ENABLE_REQUEST_COALESCING = True  # Concurrent identical queries on the same document share one agent run
+
+# Admission Control Configuration
+# /analyze-stream runs at most ADMISSION_MAX_RUNNING agent runs at once; others
+# wait in a bounded queue (seeing their position) or are refused with Retry-After
+ADMISSION_MAX_RUNNING = 4
+ADMISSION_MAX_WAITING = 16  # Streams refused with 503 once this many are waiting
+ADMISSION_MAX_PER_SESSION = 2  # Running plus waiting streams per session; more get 429
+ADMISSION_QUEUE_TIMEOUT_SECONDS = 120  # A queued stream gives up (with an error event) after this long
+ADMISSION_RETRY_AFTER_SECONDS = 5  # Base Retry-After for refused streams
+
+# Job Configuration
+# POST /jobs runs an analysis on a worker pool instead of the request thread;
+# clients poll GET /jobs/<id> or (re)attach to GET /jobs/<id>/events
+JOB_WORKERS = 2  # Analyses run concurrently by the pool
+JOB_QUEUE_SIZE = 32  # Waiting jobs beyond this are refused with 503
+JOB_RETRY_AFTER_SECONDS = 10  # Retry-After sent with that 503
+JOB_RETENTION_SECONDS = 60 * 60  # Finished jobs (and their results) are kept this long
+JOB_MAX_KEPT = 200  # ...but no more than this many
+JOB_EVENT_HEARTBEAT_SECONDS = 15  # Keep-alive comment on an idle event stream
 
-def get_llm(temperature: Optional[float] = None, model: Optional[str] = None):
+# Quick Query Configuration
+PRECOMPUTE_QUICK_QUERIES = False  # Answer the quick-query buttons in the background after upload
+QUICK_ANSWER_CACHE_MAX_DOCUMENTS = 32  # Documents whose precomputed answers are kept in memory
+
+# LLM Endpoint Configuration
+# Comma-separated Ollama URLs; with more than one, calls are load balanced
+LLM_ENDPOINTS = [url.strip() for url in os.environ.get("OLLAMA_ENDPOINTS", "").split(",") if url.strip()]
+LLM_HEALTH_CHECK_INTERVAL = 10  # Seconds between backend health checks
+LLM_HEDGE_AFTER_SECONDS = 2.0  # Re-issue a stream to a second backend if no token by then (None disables)
+
+# LLM Response Cache Configuration
+LLM_CACHE_ENABLED = True  # Answer repeated prompts from disk instead of calling the model
+LLM_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_cache.sqlite3")
+LLM_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Least recently used responses are evicted past this size
+LLM_CACHE_SITES = {"planning", "title"}  # Call sites allowed to use the cache; add "synthesis" to replay whole answers
+
+# LLM Scheduler Configuration
+LLM_SCHEDULER_ENABLED = True  # Route every get_llm() call through the priority scheduler
+LLM_MAX_IN_FLIGHT = 2  # Concurrent requests sent to the model host
+LLM_PRIORITY_CLASSES = ["synthesis", "planning", "title", "batch"]  # Highest priority first; call sites map to these
+
+
+def get_llm(temperature: Optional[float] = None, model: Optional[str] = None,
+            call_site: Optional[str] = None, cache_validator: Optional[Callable[[str], bool]] = None,
+            read_cache: bool = True):
     """
     Get configured LLM instance.
     
     Args:
         temperature: Override default temperature
         model: Override default model
+        call_site: Name of the caller (e.g. "synthesis"). It picks the
+            scheduler priority class, and sites listed in LLM_CACHE_SITES
+            get a model backed by the response cache
+        cache_validator: Only replies it accepts are stored in the cache
+            (e.g. ones that parse), so a bad reply is not replayed
+        read_cache: False skips cached replies, e.g. for a retry
         
     Returns:
-        ChatOllama instance
+        ChatOllama instance (or a BalancedChatModel over LLM_ENDPOINTS),
+        possibly wrapped by the scheduler and cache
     """
-    return ChatOllama(
-        model=model or LLM_MODEL,
-        temperature=temperature if temperature is not None else LLM_TEMPERATURE,
-        streaming=True
-    )
+    model = model or LLM_MODEL
+    temperature = temperature if temperature is not None else LLM_TEMPERATURE
+    if len(LLM_ENDPOINTS) > 1:
+        from llm.backends import BalancedChatModel
+        llm = BalancedChatModel(model_name=model, temperature=temperature, streaming=True)
+    else:
+        from langchain_ollama import ChatOllama
+        llm = ChatOllama(model=model, temperature=temperature, streaming=True, keep_alive=LLM_KEEP_ALIVE,
+                         base_url=LLM_ENDPOINTS[0] if LLM_ENDPOINTS else None)
+
+    if LLM_SCHEDULER_ENABLED:
+        from llm.scheduler import ScheduledChatModel
+        priority = call_site if call_site in LLM_PRIORITY_CLASSES else LLM_PRIORITY_CLASSES[-1]
+        llm = ScheduledChatModel(inner=llm, priority=priority, streaming=True)
+
+    if LLM_CACHE_ENABLED and call_site in LLM_CACHE_SITES:
+        from llm.cache import CachedChatModel
+        return CachedChatModel(inner=llm, model_name=model, temperature=temperature, streaming=True,
+                               accept=cache_validator, read_cache=read_cache)
+    return llm
 
 
 def get_llm_with_structured_output():
@@ -46,16 +170,50 @@ def get_llm_with_structured_output():
     Some models support structured output modes.
     
     Returns:
-        ChatOllama instance optimized for JSON
+        ChatOllama instance optimized for JSON (scheduled as batch work)
     """
-    return ChatOllama(
-        model=LLM_MODEL,
-        temperature=0.1,  # Lower temp for more consistent JSON
-        format="json"  # Some Ollama models support this
-    )
+    if len(LLM_ENDPOINTS) > 1:
+        from llm.backends import BalancedChatModel
+        llm = BalancedChatModel(model_name=LLM_MODEL, temperature=0.1, format="json")
+    else:
+        from langchain_ollama import ChatOllama
+        llm = ChatOllama(
+            model=LLM_MODEL,
+            temperature=0.1,  # Lower temp for more consistent JSON
+            format="json",  # Some Ollama models support this
+            keep_alive=LLM_KEEP_ALIVE,
+            base_url=LLM_ENDPOINTS[0] if LLM_ENDPOINTS else None
+        )
 
+    if LLM_SCHEDULER_ENABLED:
+        from llm.scheduler import ScheduledChatModel
+        llm = ScheduledChatModel(inner=llm, priority=LLM_PRIORITY_CLASSES[-1])
+    return llm
+
+
+# Profiling Configuration
+# Opt-in per-request profiles (see observability/profiling.py): stack samples in
+# folded (flamegraph) format, a tracemalloc snapshot and tags per request
+PROFILE_REQUESTS = os.environ.get("DOC_ANALYZER_PROFILE", "") not in ("", "0")  # Profile every request
+PROFILE_SAMPLE_RATE = float(os.environ.get("DOC_ANALYZER_PROFILE_SAMPLE_RATE", "0"))  # ...or this fraction of them
+PROFILE_DIR = os.environ.get("DOC_ANALYZER_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "profiles"))
+PROFILE_INTERVAL_SECONDS = 0.005  # Stack sampling period
+PROFILE_MAX_DEPTH = 128  # Frames kept per sampled stack
+PROFILE_TRACEMALLOC_FRAMES = 8  # Frames per allocation traceback in snapshots (0 disables snapshots)
 
 # Logging Configuration
+# Server logs go through observability/log.py: a queue-backed handler, so writes
+# never block request threads, emitting JSON lines with request ids and timings
+LOG_FORMAT = os.environ.get("DOC_ANALYZER_LOG_FORMAT", "json")  # "json" or "text"
+LOG_LEVEL = os.environ.get("DOC_ANALYZER_LOG_LEVEL", "INFO")
+LOG_LEVELS = {  # Per-logger levels; DOC_ANALYZER_LOG_LEVELS="agents=DEBUG,llm=WARNING" adds to these
+    "werkzeug": "WARNING",
+    "httpx": "WARNING",
+    **dict(
+        item.strip().split("=", 1) for item in os.environ.get("DOC_ANALYZER_LOG_LEVELS", "").split(",")
+        if "=" in item
+    )
+}
 VERBOSE_LOGGING = True
 LOG_LLM_PROMPTS = False  # Set to True to debug LLM interactions
 LOG_LLM_RESPONSES = False
@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import JOB_MAX_KEPT, JOB_QUEUE_SIZE, JOB_RETENTION_SECONDS, JOB_WORKERS
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """The job queue is at JOB_QUEUE_SIZE; the client should retry later."""
+
+
+class Job:
+    """
+    One analysis running (or waiting to run) on the job pool.
+
+    Every token the agent streams is kept, so clients can poll for the
+    result or (re)attach to the event stream from any point.
+    """
+
+    def __init__(self, job_id: str, session_id: str, query: str, produce: Callable[[], Iterator[str]]):
+        self.id = job_id
+        self.session_id = session_id
+        self.query = query
+        self.produce = produce
+        self.status = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.tokens = []
+        self.error = None
+        self.cancel_requested = False
+        self._changed = threading.Condition()
+
+    def wait_for_tokens(self, after: int, timeout: float) -> Tuple[List[str], str]:
+        """
+        Tokens past index `after`, waiting up to timeout for new ones.
+
+        Returns:
+            (new tokens, current status)
+        """
+        with self._changed:
+            if len(self.tokens) <= after and self.status not in FINISHED:
+                self._changed.wait(timeout)
+            return self.tokens[after:], self.status
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'query': self.query,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'events': len(self.tokens),
+            'error': self.error
+        }
+
+    def _append(self, token: str) -> None:
+        with self._changed:
+            self.tokens.append(token)
+            self._changed.notify_all()
+
+    def _set_status(self, status: str, error: Optional[str] = None) -> None:
+        with self._changed:
+            self.status = status
+            self.error = error
+            if status == RUNNING:
+                self.started = time.time()
+            elif status in FINISHED:
+                self.finished = time.time()
+                self.produce = None  # Release the document and query closures
+            self._changed.notify_all()
+
+
+class JobRunner:
+    """
+    Bounded worker pool with a bounded FIFO queue for agent runs.
+
+    Workers are started on the first submission. Finished jobs are kept for
+    JOB_RETENTION_SECONDS (at most JOB_MAX_KEPT of them) so clients can
+    collect results after a disconnect.
+    """
+
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._jobs = OrderedDict()  # job_id -> Job, oldest first
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._completed = 0
+
+    def submit(self, job_id: str, session_id: str, query: str, produce: Callable[[], Iterator[str]]) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            produce: Called on a worker thread; returns the agent's token iterator
+
+        Raises:
+            JobQueueFull: If JOB_QUEUE_SIZE jobs are already waiting
+        """
+        job = Job(job_id, session_id, query, produce)
+        with self._cond:
+            if len(self._queue) >= self.max_queued:
+                raise JobQueueFull(f"{len(self._queue)} jobs already queued")
+            self._prune()
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._start_workers()
+            self._cond.notify()
+        logger.info('job queued', extra={'job': job.id, 'position': len(self._queue), 'query': query[:200]})
+        return job
+
+    def get(self, job_id: str, session_id: str) -> Optional[Job]:
+        """The job, if it exists and belongs to the session."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+        return job if job and job.session_id == session_id else None
+
+    def position(self, job: Job) -> int:
+        """1-based place in the queue, or 0 once the job has left it."""
+        with self._cond:
+            try:
+                return self._queue.index(job) + 1
+            except ValueError:
+                return 0
+
+    def cancel(self, job: Job) -> None:
+        """Drop a queued job, or stop a running one after its current token."""
+        with self._cond:
+            job.cancel_requested = True
+            if job in self._queue:
+                self._queue.remove(job)
+                job._set_status(CANCELLED)
+
+    def metrics(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'queued': len(self._queue),
+                'running': sum(1 for job in self._jobs.values() if job.status == RUNNING),
+                'completed': self._completed,
+                'kept': len(self._jobs)
+            }
+
+    def _start_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = self._queue.popleft()
+            self._run(job)
+            with self._cond:
+                self._completed += 1
+
+    def _run(self, job: Job) -> None:
+        job._set_status(RUNNING)
+        tokens = None
+        try:
+            tokens = job.produce()
+            for token in tokens:
+                job._append(token)
+                if job.cancel_requested:
+                    break
+            job._set_status(CANCELLED if job.cancel_requested else SUCCEEDED)
+        except Exception as e:
+            logger.exception('job failed', extra={'job': job.id})
+            job._set_status(FAILED, str(e))
+        finally:
+            # Closing the generator stops a cancelled agent run
+            if tokens is not None and hasattr(tokens, 'close'):
+                tokens.close()
+        logger.info('job finished', extra={
+            'job': job.id, 'status': job.status, 'events': len(job.tokens),
+            'duration_ms': round((job.finished - job.started) * 1000, 1)
+        })
+
+    def _prune(self) -> None:
+        # Caller holds the lock
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        finished = [job for job in self._jobs.values() if job.status in FINISHED]
+        excess = len(self._jobs) - JOB_MAX_KEPT
+        for job in finished:
+            if job.finished < cutoff or excess > 0:
+                del self._jobs[job.id]
+                excess -= 1
+
+
+runner = JobRunner(JOB_WORKERS, JOB_QUEUE_SIZE)
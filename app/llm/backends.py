@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import urllib.request
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_ollama import ChatOllama
+from pydantic import PrivateAttr
+
+from config import LLM_ENDPOINTS, LLM_HEALTH_CHECK_INTERVAL, LLM_HEDGE_AFTER_SECONDS, LLM_KEEP_ALIVE
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+
+HEALTH_CHECK_TIMEOUT = 2.0
+
+
+class Backend:
+    """One Ollama endpoint and its live load."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.last_picked = 0.0
+        self.requests = 0
+        self.failures = 0
+
+
+class BackendPool:
+    """
+    The configured Ollama endpoints, with least-outstanding-requests selection.
+
+    A backend that fails a call is taken out of rotation until the background
+    health check sees it answer again.
+    """
+
+    def __init__(self, urls: List[str], check_interval: float):
+        self.backends = [Backend(url) for url in urls]
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checker = None
+
+    def pick(self, exclude: Optional[set] = None, healthy_only: bool = False) -> Optional[Backend]:
+        """
+        Choose the healthy backend with the fewest requests in progress.
+
+        Args:
+            exclude: URLs not to use (e.g. already tried for this call)
+            healthy_only: Return None rather than fall back to a backend marked down
+
+        Returns:
+            A backend with its outstanding count already incremented, or None
+            if every backend is excluded
+        """
+        self._start_health_checks()
+        exclude = exclude or set()
+        with self._lock:
+            candidates = [b for b in self.backends if b.url not in exclude]
+            if not candidates:
+                return None
+            # Prefer healthy backends, but never refuse to try when all look down
+            healthy = [b for b in candidates if b.healthy]
+            if not healthy and healthy_only:
+                return None
+            candidates = healthy or candidates
+            backend = min(candidates, key=lambda b: (b.outstanding, b.last_picked))
+            backend.outstanding += 1
+            backend.requests += 1
+            backend.last_picked = time.monotonic()
+            return backend
+
+    def release(self, backend: Backend, failed: bool = False) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            if failed:
+                backend.failures += 1
+                backend.healthy = False
+
+    def status(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{
+                'url': b.url,
+                'healthy': b.healthy,
+                'outstanding': b.outstanding,
+                'requests': b.requests,
+                'failures': b.failures
+            } for b in self.backends]
+
+    def _start_health_checks(self) -> None:
+        if self._checker is not None or len(self.backends) < 2:
+            return
+        with self._lock:
+            if self._checker is None:
+                self._checker = threading.Thread(target=self._check_loop, name="llm-health", daemon=True)
+                self._checker.start()
+
+    def _check_loop(self) -> None:
+        while True:
+            for backend in self.backends:
+                healthy = _ping(backend.url)
+                with self._lock:
+                    if backend.healthy != healthy:
+                        logger.log(logging.INFO if healthy else logging.WARNING,
+                                   'LLM backend up' if healthy else 'LLM backend down', extra={'backend': backend.url})
+                    backend.healthy = healthy
+            time.sleep(self.check_interval)
+
+
+def _ping(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url.rstrip('/') + '/api/tags', timeout=HEALTH_CHECK_TIMEOUT) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+pool = BackendPool(LLM_ENDPOINTS, LLM_HEALTH_CHECK_INTERVAL)
+
+# Marks the end of one backend's stream in the race queues
+_END = object()
+
+
+class BalancedChatModel(BaseChatModel):
+    """
+    Chat model that spreads calls over the backend pool.
+
+    Each call goes to the least busy healthy backend. Calling the same
+    instance again (the reasoning nodes' retry loop) prefers backends it has
+    not used yet. When streaming, if no token arrives within
+    LLM_HEDGE_AFTER_SECONDS the request is also sent to a second backend and
+    whichever answers first is kept.
+    """
+
+    model_name: str
+    temperature: float
+    format: Optional[str] = None
+    streaming: bool = False
+    _used: set = PrivateAttr(default_factory=set)
+
+    @property
+    def _llm_type(self) -> str:
+        return "chat-ollama-balanced"
+
+    def _client(self, backend: Backend) -> ChatOllama:
+        # A fresh client per call: async clients must not be shared across event loops
+        return ChatOllama(
+            model=self.model_name,
+            temperature=self.temperature,
+            format=self.format,
+            keep_alive=LLM_KEEP_ALIVE,
+            base_url=backend.url
+        )
+
+    def _pick(self) -> Backend:
+        backend = pool.pick(exclude=self._used)
+        if backend is None:
+            # Every backend has had a turn; start over
+            self._used.clear()
+            backend = pool.pick()
+        self._used.add(backend.url)
+        return backend
+
+    def _hedge_backend(self, first: Backend) -> Optional[Backend]:
+        if LLM_HEDGE_AFTER_SECONDS is None:
+            return None
+        return pool.pick(exclude={first.url}, healthy_only=True)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        backend = self._pick()
+        try:
+            result = self._client(backend)._generate(messages, stop=stop, **kwargs)
+        except Exception:
+            pool.release(backend, failed=True)
+            raise
+        pool.release(backend)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        backend = self._pick()
+        try:
+            result = await self._client(backend)._agenerate(messages, stop=stop, **kwargs)
+        except Exception:
+            pool.release(backend, failed=True)
+            raise
+        pool.release(backend)
+        return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        events = queue.Queue()
+        stops = {}
+
+        def run(backend: Backend, stopped: threading.Event) -> None:
+            failed = False
+            try:
+                for chunk in self._client(backend)._stream(messages, stop=stop, **kwargs):
+                    if stopped.is_set():
+                        break
+                    events.put((backend, chunk))
+                events.put((backend, _END))
+            except Exception as e:
+                failed = True
+                events.put((backend, e))
+            finally:
+                pool.release(backend, failed=failed)
+
+        def launch(backend: Backend) -> None:
+            stops[backend] = threading.Event()
+            threading.Thread(target=run, args=(backend, stops[backend]), daemon=True).start()
+
+        launch(self._pick())
+        winner = None
+        hedged = False
+        try:
+            while True:
+                waiting_for_first = winner is None and not hedged and LLM_HEDGE_AFTER_SECONDS is not None
+                try:
+                    backend, item = events.get(timeout=LLM_HEDGE_AFTER_SECONDS if waiting_for_first else None)
+                except queue.Empty:
+                    hedged = True
+                    second = self._hedge_backend(next(iter(stops)))
+                    if second is not None:
+                        logger.info('hedging stream', extra={'after_seconds': LLM_HEDGE_AFTER_SECONDS, 'backend': second.url})
+                        launch(second)
+                    continue
+
+                winner, done = self._race_step(winner, backend, item, stops)
+                if done:
+                    return
+                if backend is winner and item is not _END:
+                    yield item
+        finally:
+            for stopped in stops.values():
+                stopped.set()
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        events = asyncio.Queue()
+        tasks = {}
+
+        async def run(backend: Backend) -> None:
+            failed = False
+            try:
+                async for chunk in self._client(backend)._astream(messages, stop=stop, **kwargs):
+                    events.put_nowait((backend, chunk))
+                events.put_nowait((backend, _END))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failed = True
+                events.put_nowait((backend, e))
+            finally:
+                pool.release(backend, failed=failed)
+
+        def launch(backend: Backend) -> None:
+            tasks[backend] = asyncio.ensure_future(run(backend))
+
+        launch(self._pick())
+        winner = None
+        hedged = False
+        try:
+            while True:
+                waiting_for_first = winner is None and not hedged and LLM_HEDGE_AFTER_SECONDS is not None
+                try:
+                    if waiting_for_first:
+                        backend, item = await asyncio.wait_for(events.get(), LLM_HEDGE_AFTER_SECONDS)
+                    else:
+                        backend, item = await events.get()
+                except asyncio.TimeoutError:
+                    hedged = True
+                    second = self._hedge_backend(next(iter(tasks)))
+                    if second is not None:
+                        logger.info('hedging stream', extra={'after_seconds': LLM_HEDGE_AFTER_SECONDS, 'backend': second.url})
+                        launch(second)
+                    continue
+
+                winner, done = self._race_step(winner, backend, item, tasks)
+                if done:
+                    return
+                if backend is winner and item is not _END:
+                    yield item
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+    @staticmethod
+    def _race_step(winner: Optional[Backend], backend: Backend, item: Any, running: dict):
+        """
+        Apply one event from a racing backend.
+
+        Returns:
+            (winner, done). The first backend to produce a token (or finish)
+            wins; a failure only ends the call once no other backend is left.
+            Raises the winner's error, or the last error if all failed.
+        """
+        if winner is None:
+            if isinstance(item, Exception):
+                running.pop(backend, None)
+                if not running:
+                    raise item
+                return None, False
+            winner = backend
+        elif backend is not winner:
+            return winner, False
+
+        if isinstance(item, Exception):
+            raise item
+        return winner, item is _END
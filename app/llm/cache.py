@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config import LLM_CACHE_MAX_BYTES, LLM_CACHE_PATH
+
+
+# Cached answers are replayed in word-sized pieces, like a live stream
+REPLAY_PIECE = re.compile(r'\S+\s*|\s+')
+
+
+class ResponseCache:
+    """
+    Prompt-level LLM response cache stored in a local SQLite file.
+
+    Entries are keyed by a hash of (model, temperature, prompt). When the
+    stored responses exceed max_bytes the least recently used are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, temperature REAL,"
+                " response TEXT, size INTEGER, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: List[BaseMessage]) -> str:
+        prompt = [(m.type, m.content) for m in messages]
+        payload = json.dumps([model, temperature, prompt], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, temperature: float, response: str) -> None:
+        size = len(response.encode('utf-8'))
+        if not response or size > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, temperature, response, size, time.time())
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently used, deleting until under the limit
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+
+response_cache = ResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES)
+
+
+def _replay(text: str) -> Iterator[ChatGenerationChunk]:
+    for piece in REPLAY_PIECE.findall(text):
+        yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+class CachedChatModel(BaseChatModel):
+    """
+    Chat model wrapper that answers repeated prompts from the response cache.
+
+    Hits are replayed chunk by chunk through _stream/_astream, so callbacks
+    and astream_events see on_chat_model_stream events exactly as for a live
+    call. Misses go to the wrapped model and are stored once complete, if
+    the caller's accept() check passes: a malformed reply is never
+    replayed. With read_cache off (a retry after a rejected reply) the
+    model is always called.
+    """
+
+    inner: BaseChatModel
+    model_name: str
+    temperature: float
+    streaming: bool = False
+    accept: Optional[Callable[[str], bool]] = None
+    read_cache: bool = True
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.inner._llm_type}"
+
+    def _key(self, messages: List[BaseMessage]) -> str:
+        return ResponseCache.make_key(self.model_name, self.temperature, messages)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        return response_cache.get(key) if self.read_cache else None
+
+    def _store(self, key: str, text: str) -> None:
+        if self.accept is not None:
+            try:
+                if not self.accept(text):
+                    return
+            except Exception:
+                return
+        response_cache.put(key, self.model_name, self.temperature, text)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        key = self._key(messages)
+        cached = self._lookup(key)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=cached))])
+
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        self._store(key, result.generations[0].message.content)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        key = self._key(messages)
+        # SQLite reads and writes (and eviction) run off the event loop
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=cached))])
+
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        await asyncio.to_thread(self._store, key, result.generations[0].message.content)
+        return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        key = self._key(messages)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield from _replay(cached)
+            return
+
+        parts = []
+        for chunk in self.inner._stream(messages, stop=stop, **kwargs):
+            parts.append(chunk.message.content)
+            yield chunk
+        self._store(key, ''.join(parts))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        key = self._key(messages)
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            for chunk in _replay(cached):
+                yield chunk
+            return
+
+        parts = []
+        async for chunk in self.inner._astream(messages, stop=stop, **kwargs):
+            parts.append(chunk.message.content)
+            yield chunk
+        await asyncio.to_thread(self._store, key, ''.join(parts))
@@ -0,0 +1,32 @@
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+
+# Who is asking, for fair queuing, and an optional priority class override
+# (e.g. background precomputation runs everything as "batch")
+current_session = contextvars.ContextVar('llm_session', default=None)
+current_priority = contextvars.ContextVar('llm_priority', default=None)
+
+DEFAULT_SESSION = 'anonymous'
+
+
+@contextmanager
+def llm_context(session: Optional[str] = None, priority: Optional[str] = None):
+    """
+    Tag every LLM call made inside the block with a session and/or priority class.
+
+    Args:
+        session: Session id used for fair queuing
+        priority: Priority class overriding the call site's own class
+    """
+    tokens = []
+    if session is not None:
+        tokens.append((current_session, current_session.set(session)))
+    if priority is not None:
+        tokens.append((current_priority, current_priority.set(priority)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
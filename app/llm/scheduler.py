@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from config import LLM_MAX_IN_FLIGHT, LLM_PRIORITY_CLASSES
+from llm.context import DEFAULT_SESSION, current_priority, current_session
+
+
+WAIT_SAMPLES = 500  # Recent wait times kept per class for percentiles
+
+
+class _Waiter:
+    """A call waiting for (or holding) an in-flight slot."""
+
+    def __init__(self, priority: str, session: str, wake: Callable[[], None]):
+        self.priority = priority
+        self.session = session
+        self.wake = wake
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self.cancelled = False
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM calls.
+
+    At most max_in_flight calls run at once. Waiting calls are served strictly
+    by priority class (earlier in `priorities` wins); within a class, sessions
+    take turns round-robin so one busy session cannot starve the others.
+    Works from plain threads and from any event loop.
+    """
+
+    def __init__(self, max_in_flight: int, priorities: List[str]):
+        self.max_in_flight = max_in_flight
+        self.priorities = list(priorities)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # class -> session -> deque of waiters; dict order is the round-robin turn
+        self._queues = {p: OrderedDict() for p in self.priorities}
+        self._stats = {
+            p: {'granted': 0, 'total_wait': 0.0, 'max_wait': 0.0, 'waits': deque(maxlen=WAIT_SAMPLES)}
+            for p in self.priorities
+        }
+
+    def _class(self, priority: Optional[str]) -> str:
+        return priority if priority in self._queues else self.priorities[-1]
+
+    def _submit(self, priority: str, session: Optional[str], wake: Callable[[], None]) -> _Waiter:
+        waiter = _Waiter(self._class(priority), session or DEFAULT_SESSION, wake)
+        with self._lock:
+            self._queues[waiter.priority].setdefault(waiter.session, deque()).append(waiter)
+            self._dispatch()
+        return waiter
+
+    def _dispatch(self) -> None:
+        # Caller holds self._lock
+        while self._in_flight < self.max_in_flight:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            waiter.granted = True
+            self._in_flight += 1
+
+            wait = time.perf_counter() - waiter.enqueued
+            stats = self._stats[waiter.priority]
+            stats['granted'] += 1
+            stats['total_wait'] += wait
+            stats['max_wait'] = max(stats['max_wait'], wait)
+            stats['waits'].append(wait)
+            waiter.wake()
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for priority in self.priorities:
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            session, waiters = next(iter(sessions.items()))
+            waiter = waiters.popleft()
+            # Served sessions go to the back of the line
+            del sessions[session]
+            if waiters:
+                sessions[session] = waiters
+            return waiter
+        return None
+
+    def _release(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter.granted:
+                waiter.granted = False
+                self._in_flight -= 1
+            elif not waiter.cancelled:
+                # Gave up while still queued
+                waiter.cancelled = True
+                waiters = self._queues[waiter.priority].get(waiter.session)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._queues[waiter.priority][waiter.session]
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: str, session: Optional[str] = None) -> Iterator[None]:
+        """Block the current thread until a slot is free, and hold it for the block."""
+        granted = threading.Event()
+        waiter = self._submit(priority, session, granted.set)
+        try:
+            granted.wait()
+            yield
+        finally:
+            self._release(waiter)
+
+    @asynccontextmanager
+    async def slot_async(self, priority: str, session: Optional[str] = None) -> AsyncIterator[None]:
+        """Await a free slot without blocking the event loop, and hold it for the block."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        waiter = self._submit(priority, session, wake)
+        try:
+            await granted
+            yield
+        finally:
+            self._release(waiter)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, in-flight count and wait-time statistics per priority class."""
+        with self._lock:
+            classes = {}
+            for priority in self.priorities:
+                stats = self._stats[priority]
+                waits = sorted(stats['waits'])
+                granted = stats['granted']
+                classes[priority] = {
+                    'queued': sum(len(w) for w in self._queues[priority].values()),
+                    'waiting_sessions': len(self._queues[priority]),
+                    'granted': granted,
+                    'avg_wait_ms': round(stats['total_wait'] / granted * 1000, 2) if granted else 0.0,
+                    'p95_wait_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0.0,
+                    'max_wait_ms': round(stats['max_wait'] * 1000, 2)
+                }
+            return {
+                'in_flight': self._in_flight,
+                'max_in_flight': self.max_in_flight,
+                'queued': sum(c['queued'] for c in classes.values()),
+                'classes': classes
+            }
+
+
+scheduler = LLMScheduler(LLM_MAX_IN_FLIGHT, LLM_PRIORITY_CLASSES)
+
+
+class ScheduledChatModel(BaseChatModel):
+    """
+    Chat model wrapper that runs every call through the global scheduler.
+
+    The slot is held for the whole call, including a full streamed response.
+    The priority class is the call site's own unless llm_context() overrides it.
+    """
+
+    inner: BaseChatModel
+    priority: str
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    def _ticket(self):
+        return current_priority.get() or self.priority, current_session.get()
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        with scheduler.slot(*self._ticket()):
+            return self.inner._generate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        async with scheduler.slot_async(*self._ticket()):
+            return await self.inner._agenerate(messages, stop=stop, **kwargs)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        with scheduler.slot(*self._ticket()):
+            yield from self.inner._stream(messages, stop=stop, **kwargs)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async with scheduler.slot_async(*self._ticket()):
+            async for chunk in self.inner._astream(messages, stop=stop, **kwargs):
+                yield chunk
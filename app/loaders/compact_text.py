@@ -0,0 +1,190 @@
+from array import array
+from typing import Iterator, Mapping, Optional, Tuple, Union
+
+from memory.artifacts import get_artifact
+
+
+# Decoded pieces handed to regex scans are cut at line starts near this size
+BLOCK_BYTES = 1024 * 1024
+
+_WHITESPACE = frozenset(b' \t\n\r\x0b\x0c')
+
+
+class CompactText:
+    """
+    Document text stored once as UTF-8, with its structure as offset arrays.
+
+    Line starts and paragraph spans are byte offsets into the buffer, held in
+    array('Q') rather than lists of strings. Slices are memoryviews over the
+    buffer; text is only decoded to str for the piece a caller asks for.
+    """
+
+    __slots__ = ('buffer', 'line_starts', 'paragraph_spans', 'word_count')
+
+    def __init__(self, text: Union[str, bytes] = ''):
+        self.buffer = text.encode('utf-8', 'surrogatepass') if isinstance(text, str) else bytes(text)
+        self.line_starts = _line_starts(self.buffer)
+        self.paragraph_spans = _paragraph_spans(self.buffer)
+        # Counted on decoded blocks: str.split() also breaks on non-ASCII spaces (NBSP, ...)
+        self.word_count = sum(len(block.split()) for block in self.blocks())
+
+    # ------------------------------------------------------------------
+    # Whole-text access
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def __bool__(self) -> bool:
+        return bool(self.buffer)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompactText):
+            return self.buffer == other.buffer
+        if isinstance(other, str):
+            return self.buffer == other.encode('utf-8', 'surrogatepass')
+        return NotImplemented
+
+    __hash__ = None
+
+    def __str__(self) -> str:
+        return self.text()
+
+    def _asdict(self) -> dict:
+        # Lets LangGraph's checkpoint serializer store it (rebuilt as CompactText(text=buffer))
+        return {'text': self.buffer}
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the buffer and offset arrays (excluding object headers)."""
+        return (len(self.buffer) + self.line_starts.itemsize * len(self.line_starts)
+                + self.paragraph_spans.itemsize * len(self.paragraph_spans))
+
+    def view(self, start: int = 0, end: Optional[int] = None) -> memoryview:
+        """Zero-copy slice of the UTF-8 buffer (byte offsets)."""
+        return memoryview(self.buffer)[start:end]
+
+    def text(self, start: int = 0, end: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+        """
+        Decode a byte range to str.
+
+        Args:
+            max_chars: Decode only enough bytes for this many characters
+                (a preview); a character cut at the end is dropped
+        """
+        if max_chars is None:
+            return str(self.view(start, end), 'utf-8', 'surrogatepass')
+        end = len(self.buffer) if end is None else end
+        return str(self.view(start, min(end, start + 4 * max_chars)), 'utf-8', 'ignore')[:max_chars]
+
+    def find(self, sub: str, start: int = 0) -> int:
+        """Byte offset of the first occurrence of sub at or after start, or -1."""
+        return self.buffer.find(sub.encode('utf-8', 'surrogatepass'), start)
+
+    def count(self, sub: str) -> int:
+        return self.buffer.count(sub.encode('utf-8', 'surrogatepass'))
+
+    def blocks(self, block_bytes: int = BLOCK_BYTES, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """The text (or a byte range of it) as decoded pieces of about block_bytes, each ending at a line boundary."""
+        for block_start, block_end in self._block_spans(block_bytes, start, end):
+            yield self.text(block_start, block_end)
+
+    # ------------------------------------------------------------------
+    # Lines (as str.split('\n') would produce them)
+    # ------------------------------------------------------------------
+
+    @property
+    def num_lines(self) -> int:
+        return len(self.line_starts)
+
+    def line_span(self, index: int) -> Tuple[int, int]:
+        start = self.line_starts[index]
+        end = self.line_starts[index + 1] - 1 if index + 1 < len(self.line_starts) else len(self.buffer)
+        return start, end
+
+    def line_spans(self, first: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        stop = len(self.line_starts) if stop is None else min(stop, len(self.line_starts))
+        for index in range(first, stop):
+            yield self.line_span(index)
+
+    def lines(self, first: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        for start, end in self.line_spans(first, stop):
+            yield self.text(start, end)
+
+    # ------------------------------------------------------------------
+    # Paragraphs (blank-line separated, stripped, empty ones skipped)
+    # ------------------------------------------------------------------
+
+    @property
+    def num_paragraphs(self) -> int:
+        return len(self.paragraph_spans) // 2
+
+    def paragraph_span(self, index: int) -> Tuple[int, int]:
+        return self.paragraph_spans[2 * index], self.paragraph_spans[2 * index + 1]
+
+    def paragraph(self, index: int, max_chars: Optional[int] = None) -> str:
+        start, end = self.paragraph_span(index)
+        return self.text(start, end, max_chars)
+
+    def paragraphs(self) -> Iterator[str]:
+        for index in range(self.num_paragraphs):
+            yield self.paragraph(index)
+
+    # ------------------------------------------------------------------
+
+    def strip_span(self, start: int, end: int) -> Tuple[int, int]:
+        """Narrow a byte span to exclude leading and trailing whitespace."""
+        return _strip(self.buffer, start, end)
+
+    def _block_spans(self, block_bytes: int = BLOCK_BYTES, start: int = 0,
+                     end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        end = len(self.buffer) if end is None else end
+        while start < end:
+            stop = self.buffer.find(b'\n', min(start + block_bytes, end), end)
+            stop = end if stop < 0 else stop + 1
+            yield start, stop
+            start = stop
+
+
+def compact_text(document: Mapping) -> CompactText:
+    """
+    The document's text as CompactText.
+
+    Loaded documents already store it in 'content'; documents built with a
+    plain string (tests, benchmarks) get one converted once per document.
+    """
+    content = document.get('content') or ''
+    if isinstance(content, CompactText):
+        return content
+    return get_artifact(document, 'compact_text', lambda doc: CompactText(doc.get('content') or ''))
+
+
+def _line_starts(buffer: bytes) -> array:
+    starts = array('Q', [0])
+    index = buffer.find(b'\n')
+    while index >= 0:
+        starts.append(index + 1)
+        index = buffer.find(b'\n', index + 1)
+    return starts
+
+
+def _paragraph_spans(buffer: bytes) -> array:
+    spans = array('Q')
+    start = 0
+    size = len(buffer)
+    while start <= size:
+        end = buffer.find(b'\n\n', start)
+        end = size if end < 0 else end
+        first, last = _strip(buffer, start, end)
+        if first < last:
+            spans.extend((first, last))
+        start = end + 2
+    return spans
+
+
+def _strip(buffer: bytes, start: int, end: int) -> Tuple[int, int]:
+    while start < end and buffer[start] in _WHITESPACE:
+        start += 1
+    while end > start and buffer[end - 1] in _WHITESPACE:
+        end -= 1
+    return start, end
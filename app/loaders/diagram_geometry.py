@@ -0,0 +1,266 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import DIAGRAM_MAX_PRIMITIVES
+
+
+# Region types, in the order the rules below try them. 'drawing' is vector
+# content that fits none of the others (illustrations, maps, logos).
+DIAGRAM_TYPES = ('table_grid', 'chart', 'flowchart', 'decoration', 'drawing')
+
+HAIRLINE = 1.5  # Rects thinner than this (points) are drawn rules, not boxes
+GAP = 8.0  # Elements closer than this belong to the same region
+TOUCH = 3.0  # An endpoint this close to a box edge is connected to it
+FRAME_COVERAGE = 0.6  # Boxes covering this much of the page are frames/backgrounds
+
+
+def page_primitives(page) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A pdfplumber page's vector content as arrays (top-based coordinates).
+
+    Returns:
+        (segments, nodes): segments is (S, 4) x0, y0, x1, y1 for lines, rules,
+        open curves and polylines; nodes is (N, 4) x0, top, x1, bottom for
+        boxes and closed shapes (flowchart diamonds, ellipses)
+    """
+    segments, nodes = [], []
+
+    for line in page.lines:
+        pts = line.get('pts') or [(line['x0'], line['top']), (line['x1'], line['bottom'])]
+        segments.extend((a[0], a[1], b[0], b[1]) for a, b in zip(pts, pts[1:]))
+
+    for rect in page.rects:
+        x0, top, x1, bottom = rect['x0'], rect['top'], rect['x1'], rect['bottom']
+        if x1 - x0 <= HAIRLINE:
+            segments.append(((x0 + x1) / 2, top, (x0 + x1) / 2, bottom))
+        elif bottom - top <= HAIRLINE:
+            segments.append((x0, (top + bottom) / 2, x1, (top + bottom) / 2))
+        else:
+            nodes.append((x0, top, x1, bottom))
+
+    for curve in page.curves:
+        pts = curve.get('pts') or []
+        if len(pts) >= 4 and abs(pts[0][0] - pts[-1][0]) < 1 and abs(pts[0][1] - pts[-1][1]) < 1:
+            nodes.append((curve['x0'], curve['top'], curve['x1'], curve['bottom']))
+        else:
+            segments.extend((a[0], a[1], b[0], b[1]) for a, b in zip(pts, pts[1:]))
+
+    return (np.asarray(segments, dtype=np.float64).reshape(-1, 4),
+            np.asarray(nodes, dtype=np.float64).reshape(-1, 4))
+
+
+def classify_page(segments: np.ndarray, nodes: np.ndarray, width: float, height: float) -> List[dict]:
+    """
+    Group a page's vector elements into regions and classify each one.
+
+    Elements whose (slightly grown) bounding boxes overlap form a region.
+    Each region is classified from vectorized geometric features: the
+    length-weighted orientation histogram of its segments, full-span grid
+    lines, box tiling and baseline alignment, chart axes, and how many boxes
+    connector lines attach to.
+
+    Args:
+        segments: (S, 4) from page_primitives
+        nodes: (N, 4) from page_primitives
+        width, height: Page size in points
+
+    Returns:
+        Regions as {'type', 'bbox', 'elements', 'features'}, largest first
+    """
+    page_area = max(width * height, 1.0)
+
+    # Page frames and background boxes would merge everything into one region
+    areas = _areas(nodes)
+    frames = areas >= FRAME_COVERAGE * page_area
+    regions = [_region('decoration', box, 1, {'frame': True}) for box in nodes[frames]]
+    nodes = nodes[~frames]
+
+    if len(segments) + len(nodes) > DIAGRAM_MAX_PRIMITIVES:
+        # Very busy pages (maps, dense plots): classify an even sample
+        keep = DIAGRAM_MAX_PRIMITIVES * len(segments) // (len(segments) + len(nodes))
+        segments = segments[np.linspace(0, len(segments) - 1, keep).astype(int)] if keep else segments[:0]
+        rest = DIAGRAM_MAX_PRIMITIVES - len(segments)
+        nodes = nodes[np.linspace(0, len(nodes) - 1, rest).astype(int)] if rest else nodes[:0]
+
+    boxes = np.concatenate([_segment_boxes(segments), nodes])
+    if not len(boxes):
+        return regions
+
+    labels = _components(boxes)
+    for label in np.unique(labels):
+        members = labels == label
+        region_segments = segments[members[:len(segments)]]
+        region_nodes = nodes[members[len(segments):]]
+        bbox = _bounds(boxes[members])
+        features = _features(region_segments, region_nodes, bbox)
+        features['page_share'] = round(float(_areas(bbox[None, :])[0] / page_area), 3)
+        kind = _classify(features)
+        regions.append(_region(kind, bbox, int(members.sum()), features))
+
+    regions.sort(key=lambda r: -(r['bbox'][2] - r['bbox'][0]) * (r['bbox'][3] - r['bbox'][1]))
+    return regions
+
+
+def summarize_regions(regions: List[dict]) -> Dict[str, int]:
+    """Count of regions per type, leaving out decoration."""
+    counts = {}
+    for region in regions:
+        if region['type'] != 'decoration':
+            counts[region['type']] = counts.get(region['type'], 0) + 1
+    return counts
+
+
+# ----------------------------------------------------------------------
+# Features
+# ----------------------------------------------------------------------
+
+def _features(segments: np.ndarray, nodes: np.ndarray, bbox: np.ndarray) -> Dict[str, float]:
+    w = max(bbox[2] - bbox[0], 1.0)
+    h = max(bbox[3] - bbox[1], 1.0)
+    dx = np.abs(segments[:, 2] - segments[:, 0])
+    dy = np.abs(segments[:, 3] - segments[:, 1])
+    length = np.hypot(dx, dy)
+    angle = np.degrees(np.arctan2(dy, dx))
+    horizontal = angle < 10
+    vertical = angle > 80
+    total = max(length.sum(), 1e-9)
+
+    # Distinct rows/columns of long rules: the skeleton of a table grid
+    rows = np.unique(np.round(segments[horizontal & (dx >= 0.5 * w), 1] / 2))
+    columns = np.unique(np.round(segments[vertical & (dy >= 0.5 * h), 0] / 2))
+
+    features = {
+        'segments': len(segments),
+        'nodes': len(nodes),
+        'aspect': round(float(w / h), 2),
+        'horizontal': round(float(length[horizontal].sum() / total), 2),
+        'vertical': round(float(length[vertical].sum() / total), 2),
+        'diagonal': round(float(length[~horizontal & ~vertical].sum() / total), 2) if len(segments) else 0.0,
+        'grid_rows': len(rows),
+        'grid_columns': len(columns),
+        'axes': _has_axes(segments, horizontal, vertical, dx, dy, w, h),
+        'bars': _baseline_bars(nodes),
+        'tiled': _tiled_fraction(nodes),
+        'fill': round(float(_areas(nodes).sum() / (w * h)), 2),
+        'connected': _connected_fraction(segments, nodes)
+    }
+    return features
+
+
+def _classify(f: Dict[str, float]) -> str:
+    elements = f['segments'] + f['nodes']
+    if f['page_share'] < 0.002 and not f['nodes']:
+        # Bullets, underlines, tiny glyph-like marks
+        return 'decoration'
+    if f['grid_rows'] >= 3 and f['grid_columns'] >= 2 and f['diagonal'] < 0.1:
+        return 'table_grid'
+    if f['nodes'] >= 4 and f['tiled'] >= 0.8 and f['fill'] >= 0.5 and not f['axes']:
+        return 'table_grid'
+    if f['axes'] and (f['bars'] >= 3 or f['diagonal'] >= 0.2 or f['segments'] >= 8):
+        return 'chart'
+    if f['nodes'] >= 2 and f['connected'] >= 0.5 and f['tiled'] < 0.5:
+        return 'flowchart'
+    if elements <= 2 or (f['nodes'] == 0 and f['diagonal'] == 0 and f['segments'] <= 4):
+        # Rules, underlines, a lone box
+        return 'decoration'
+    return 'drawing'
+
+
+def _has_axes(segments, horizontal, vertical, dx, dy, w, h) -> bool:
+    """A long horizontal and a long vertical line meeting at the lower left."""
+    x_axes = segments[horizontal & (dx >= 0.6 * w)]
+    y_axes = segments[vertical & (dy >= 0.6 * h)]
+    if not len(x_axes) or not len(y_axes):
+        return False
+    # Left end of each x axis, bottom end of each y axis
+    left = np.stack([np.minimum(x_axes[:, 0], x_axes[:, 2]), x_axes[:, 1]], axis=1)
+    bottom = np.stack([y_axes[:, 0], np.maximum(y_axes[:, 1], y_axes[:, 3])], axis=1)
+    distance = np.abs(left[:, None, :] - bottom[None, :, :]).max(axis=2)
+    return bool((distance <= GAP).any())
+
+
+def _baseline_bars(nodes: np.ndarray) -> int:
+    """Most boxes standing on one baseline with differing heights (a bar chart)."""
+    if len(nodes) < 3:
+        return 0
+    baselines, counts = np.unique(np.round(nodes[:, 3] / 2), return_counts=True)
+    on_baseline = np.round(nodes[:, 3] / 2) == baselines[counts.argmax()]
+    heights = nodes[on_baseline, 3] - nodes[on_baseline, 1]
+    if len(heights) < 3 or heights.std() < 0.15 * heights.mean():
+        return 0
+    return int(len(heights))
+
+
+def _tiled_fraction(nodes: np.ndarray) -> float:
+    """Share of boxes that abut another box edge to edge (table cells do, flowchart nodes don't)."""
+    if len(nodes) < 2:
+        return 0.0
+    x0, top, x1, bottom = (nodes[:, i] for i in range(4))
+    overlap_y = (np.minimum(bottom[:, None], bottom[None, :]) - np.maximum(top[:, None], top[None, :])) > 0
+    overlap_x = (np.minimum(x1[:, None], x1[None, :]) - np.maximum(x0[:, None], x0[None, :])) > 0
+    side = (np.abs(x1[:, None] - x0[None, :]) <= TOUCH) & overlap_y
+    stacked = (np.abs(bottom[:, None] - top[None, :]) <= TOUCH) & overlap_x
+    adjacent = side | side.T | stacked | stacked.T
+    np.fill_diagonal(adjacent, False)
+    return round(float(adjacent.any(axis=1).mean()), 2)
+
+
+def _connected_fraction(segments: np.ndarray, nodes: np.ndarray) -> float:
+    """Share of boxes that a connector line (not one of their own edges) ends on."""
+    if not len(nodes) or not len(segments):
+        return 0.0
+    # Segments running along a box edge are part of the box, not connectors
+    mids = (segments[:, :2] + segments[:, 2:]) / 2
+    connectors = segments[~_near_outline(mids, nodes).any(axis=1)]
+    ends = np.concatenate([connectors[:, :2], connectors[:, 2:]])
+    return round(float(_near_outline(ends, nodes).any(axis=0).mean()), 2)
+
+
+def _near_outline(points: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """Whether each point lies within TOUCH of each box's outline: (P, B)."""
+    px, py = points[:, 0:1], points[:, 1:2]
+    x0, top, x1, bottom = (boxes[:, i][None, :] for i in range(4))
+    within_grown = (px >= x0 - TOUCH) & (px <= x1 + TOUCH) & (py >= top - TOUCH) & (py <= bottom + TOUCH)
+    within_shrunk = (px > x0 + TOUCH) & (px < x1 - TOUCH) & (py > top + TOUCH) & (py < bottom - TOUCH)
+    return within_grown & ~within_shrunk
+
+
+# ----------------------------------------------------------------------
+# Regions
+# ----------------------------------------------------------------------
+
+def _components(boxes: np.ndarray) -> np.ndarray:
+    """Label elements whose boxes, grown by GAP, overlap (transitively)."""
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    grown = boxes + np.array([-GAP, -GAP, GAP, GAP]) / 2
+    overlap = ((grown[:, None, 0] <= grown[None, :, 2]) & (grown[None, :, 0] <= grown[:, None, 2]) &
+               (grown[:, None, 1] <= grown[None, :, 3]) & (grown[None, :, 1] <= grown[:, None, 3]))
+    _, labels = connected_components(csr_matrix(overlap), directed=False)
+    return labels
+
+
+def _segment_boxes(segments: np.ndarray) -> np.ndarray:
+    return np.stack([
+        np.minimum(segments[:, 0], segments[:, 2]), np.minimum(segments[:, 1], segments[:, 3]),
+        np.maximum(segments[:, 0], segments[:, 2]), np.maximum(segments[:, 1], segments[:, 3])
+    ], axis=1) if len(segments) else segments
+
+
+def _bounds(boxes: np.ndarray) -> np.ndarray:
+    return np.array([boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()])
+
+
+def _areas(boxes: np.ndarray) -> np.ndarray:
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def _region(kind: str, bbox: np.ndarray, elements: int, features: dict) -> dict:
+    return {
+        'type': kind,
+        'bbox': [round(float(v), 1) for v in bbox],
+        'elements': elements,
+        'features': features
+    }
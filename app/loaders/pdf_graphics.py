@@ -0,0 +1,140 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterable, Iterator, Optional
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+
+# Fields load_pdf leaves out; they are filled in the first time a tool asks
+LAZY_PDF_FIELDS = ['num_tables', 'has_vector_graphics']
+
+# key -> [lock, holders + waiters]; an entry lives only while someone uses it
+_file_locks = {}
+_registry_lock = threading.Lock()
+
+
+def get_page_graphics(document: dict, pages: Optional[Iterable[int]] = None,
+                      deadline: Optional[float] = None) -> Dict[int, dict]:
+    """
+    Detect tables, images and vector diagrams on PDF pages, computing each page once.
+
+    Results are cached per page in document['metadata']['page_graphics'], so
+    later calls only open the PDF for pages that have not been analyzed yet.
+
+    Args:
+        document: Document dict returned by load_pdf
+        pages: Zero-based page indexes to analyze (default: every page, or
+            the pages of a page view)
+        deadline: time.monotonic() value after which no further pages are
+            analyzed; pages left over are missing from the result
+
+    Returns:
+        Dict mapping page index to its graphics info, including 'diagrams':
+        the page's vector regions as [{'type', 'bbox', 'elements'}]
+    """
+    metadata = document.get('metadata', {})
+    num_pages = metadata.get('num_pages', 0)
+    if pages is None:
+        first, last = metadata.get('page_range') or [1, num_pages]
+        pages = range(first - 1, last)
+    wanted = [p for p in pages if 0 <= p < num_pages]
+
+    # Per file: one PDF being analyzed never holds up another. Page views
+    # share the file's page cache, so they share its lock too.
+    with file_lock(('graphics', document['file_path'])):
+        cache = metadata.setdefault('page_graphics', {})
+        missing = [p for p in wanted if p not in cache]
+        if missing:
+            cache.update(_analyze_pages(document['file_path'], missing, deadline))
+        return {p: cache[p] for p in wanted if p in cache}
+
+
+@contextmanager
+def file_lock(key: Hashable) -> Iterator[None]:
+    """Hold a lock for one key (e.g. ('graphics', file path)) without blocking other keys."""
+    with _registry_lock:
+        entry = _file_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _registry_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _file_locks[key]
+
+
+def ensure_graphics_metadata(document: dict) -> dict:
+    """
+    Make sure the lazy PDF fields are present in the document metadata.
+
+    Non-PDF documents already carry every field and are returned unchanged.
+
+    Returns:
+        The document metadata dict
+    """
+    metadata = document.get('metadata', {})
+    if document.get('file_type') != 'pdf' or not metadata.get('lazy_fields'):
+        return metadata
+
+    page_graphics = get_page_graphics(document)
+    metadata['num_tables'] = sum(info['num_tables'] for info in page_graphics.values())
+    metadata['has_vector_graphics'] = any(info['has_vector_graphics'] for info in page_graphics.values())
+    if 'num_images' in metadata['lazy_fields']:
+        metadata['num_images'] = sum(info.get('num_images', 0) for info in page_graphics.values())
+    metadata['lazy_fields'] = []
+    return metadata
+
+
+def _analyze_pages(file_path: str, pages: list, deadline: Optional[float] = None) -> Dict[int, dict]:
+    import pdfplumber
+
+    results = {}
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            for index in pages:
+                if deadline is not None and results and time.monotonic() >= deadline:
+                    break
+                page = pdf.pages[index]
+                # Detect tables using pdfplumber's built-in table finder
+                num_tables = len(page.find_tables())
+                num_lines = len(page.lines)
+                num_rects = len(page.rects)
+                diagrams = _classify_diagrams(page)
+                if diagrams is None:
+                    # Logic for vector diagrams: if a page has many lines/rects
+                    # but few images, it's likely a vector diagram or chart
+                    has_vector_graphics = num_lines > 10 or num_rects > 10
+                else:
+                    has_vector_graphics = any(d['type'] != 'decoration' for d in diagrams)
+                results[index] = {
+                    'num_images': len(page.images),
+                    'num_tables': num_tables,
+                    'num_lines': num_lines,
+                    'num_rects': num_rects,
+                    'has_vector_graphics': has_vector_graphics,
+                    'diagrams': diagrams or []
+                }
+                # Drop the parsed page objects; only the counts are kept
+                page.flush_cache()
+    except FileNotFoundError:
+        # Fail rather than cache zero counts for pages that were never analyzed
+        logger.warning('PDF no longer available for graphics detection', extra={'file_path': file_path})
+        raise FileNotFoundError('The uploaded PDF is no longer available; please upload it again') from None
+    return results
+
+
+def _classify_diagrams(page) -> Optional[list]:
+    """The page's vector regions by type, or None if NumPy/SciPy are unavailable."""
+    try:
+        from loaders.diagram_geometry import classify_page, page_primitives
+    except ImportError:
+        return None
+    segments, nodes = page_primitives(page)
+    return [
+        {'type': region['type'], 'bbox': region['bbox'], 'elements': region['elements']}
+        for region in classify_page(segments, nodes, float(page.width), float(page.height))
+    ]
@@ -0,0 +1,265 @@
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from config import PDF_UNSCOPED_MAX_PAGES
+from loaders.compact_text import CompactText, compact_text
+from loaders.pdf_graphics import LAZY_PDF_FIELDS, file_lock
+from memory.artifacts import get_artifact
+from observability.log import get_logger
+from tools.section_index import tokenize
+
+logger = get_logger(__name__)
+
+
+# "pages 40-60", "page 12", "pp. 40–60", "pages 40 to 60"
+PAGE_RANGE_PATTERN = re.compile(
+    r'\b(?:pages?|pp?\.)\s*(\d+)(?:\s*(?:-|–|—|to|through|thru)\s*(\d+))?',
+    re.IGNORECASE
+)
+
+# A page view counts its own images, since the document total covers every page
+VIEW_LAZY_FIELDS = LAZY_PDF_FIELDS + ['num_images']
+
+
+def parse_page_range(query: str) -> List[int]:
+    """
+    Find a page range named in a query.
+
+    Returns:
+        [first, last] as 1-based inclusive page numbers, or [] if the query
+        does not name one
+    """
+    match = PAGE_RANGE_PATTERN.search(query or '')
+    if not match:
+        return []
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    if first < 1:
+        return []
+    return [min(first, last), max(first, last)]
+
+
+def query_page_range(query: str, document: Optional[dict] = None) -> List[int]:
+    """
+    The pages a query should be answered from.
+
+    A range named in the query wins. A lazily loaded PDF is never read whole:
+    without a named range, the query gets the outline section whose title
+    matches it best, else the first pages, at most PDF_UNSCOPED_MAX_PAGES.
+
+    Returns:
+        [first, last] as 1-based inclusive page numbers, or [] for the whole document
+    """
+    page_range = parse_page_range(query)
+    metadata = (document or {}).get('metadata', {})
+    if page_range or not metadata.get('lazy_pages'):
+        return page_range
+
+    num_pages = metadata.get('num_pages') or 1
+    first, last = 1, num_pages
+    section = _matching_section(metadata.get('outline') or [], query, num_pages)
+    if section:
+        first, last = section
+    return [first, min(last, first + PDF_UNSCOPED_MAX_PAGES - 1)]
+
+
+def _matching_section(outline: List[dict], query: str, num_pages: int) -> Optional[List[int]]:
+    """Pages of the outline entry sharing the most terms with the query."""
+    terms = set(tokenize(query or ''))
+    best, best_score = None, 0
+    for i, entry in enumerate(outline):
+        score = len(terms & set(tokenize(entry['title']))) if entry['page'] else 0
+        if score > best_score:
+            best, best_score = i, score
+    if best is None:
+        return None
+
+    entry = outline[best]
+    # The section runs until the next entry at the same or a higher level
+    end = num_pages
+    for later in outline[best + 1:]:
+        if later['page'] and later['level'] <= entry['level'] and later['page'] > entry['page']:
+            end = later['page'] - 1
+            break
+    return [entry['page'], end]
+
+
+def load_pdf_lazy(file_path: Path) -> dict:
+    """
+    Open a PDF without extracting any page text.
+
+    Only the page count and the outline (bookmarks) are read; page text is
+    extracted on demand by get_page_texts when a page view needs it.
+    """
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        num_pages = len(pdf.pages)
+        outline = read_outline(pdf)
+
+    return {
+        'content': '',
+        'file_path': str(file_path),
+        'file_type': 'pdf',
+        'metadata': {
+            'filename': file_path.name,
+            'num_pages': num_pages,
+            'lazy_pages': True,
+            'lazy_fields': list(VIEW_LAZY_FIELDS),
+            'outline': outline,
+            'sections': [entry['title'] for entry in outline],
+            'page_text': {},
+            'file_size': os.path.getsize(file_path)
+        }
+    }
+
+
+def read_outline(pdf) -> List[dict]:
+    """
+    Read the PDF bookmarks as [{'title', 'level', 'page'}], page being 1-based
+    (None when the destination cannot be resolved).
+    """
+    from pdfminer.pdfdocument import PDFNoOutlines
+
+    page_numbers = {page.page_obj.pageid: page.page_number for page in pdf.pages}
+    outline = []
+    try:
+        for level, title, dest, action, _ in pdf.doc.get_outlines():
+            title = (title or '').strip()
+            if title:
+                page = _outline_page(pdf.doc, dest, action, page_numbers)
+                outline.append({'title': title, 'level': level, 'page': page})
+    except PDFNoOutlines:
+        pass
+    except Exception as e:
+        logger.warning('could not read PDF outline', extra={'error': str(e)})
+    return outline
+
+
+def _outline_page(doc, dest, action, page_numbers: Dict[int, int]) -> Optional[int]:
+    from pdfminer.pdftypes import resolve1
+
+    try:
+        if dest is None and action:
+            action = resolve1(action)
+            dest = action.get('D') if isinstance(action, dict) else None
+        dest = resolve1(dest)
+        if isinstance(dest, (str, bytes)) or hasattr(dest, 'name'):
+            dest = resolve1(doc.get_dest(getattr(dest, 'name', dest)))
+        if isinstance(dest, dict):
+            dest = resolve1(dest.get('D'))
+        if isinstance(dest, list) and dest:
+            return page_numbers.get(getattr(dest[0], 'objid', None))
+    except Exception:
+        pass
+    return None
+
+
+def get_page_texts(document: dict, pages: Iterable[int]) -> Dict[int, str]:
+    """
+    Text of the given pages, extracting each page at most once per document.
+
+    Eagerly loaded PDFs are sliced from their content by page byte offset; lazily
+    loaded ones are extracted from the file and cached in
+    document['metadata']['page_text'].
+
+    Args:
+        document: Document dict returned by load_pdf
+        pages: Zero-based page indexes
+
+    Returns:
+        Dict mapping page index to its text
+    """
+    metadata = document['metadata']
+    pages = [p for p in pages if 0 <= p < metadata.get('num_pages', 0)]
+
+    offsets = metadata.get('page_offsets')
+    if offsets is not None:
+        text = compact_text(document)
+        bounds = offsets + [len(text)]
+        return {p: text.text(bounds[p], bounds[p + 1]).strip('\n') for p in pages}
+
+    # Per file, so extracting pages of one lazy PDF never blocks another
+    with file_lock(('text', document['file_path'])):
+        cache = metadata.setdefault('page_text', {})
+        missing = [p for p in pages if p not in cache]
+        if missing:
+            cache.update(_extract_pages(document['file_path'], missing))
+        return {p: cache[p] for p in pages}
+
+
+def page_view(document: dict, page_range: Optional[List[int]] = None) -> dict:
+    """
+    The document restricted to a page range, for tools to run on.
+
+    Views are built once per range and cached as document artifacts. Each
+    view has its own fingerprint, so indexes built from it never mix with
+    the whole document's.
+
+    Args:
+        document: A PDF document dict
+        page_range: [first, last], 1-based inclusive (default: every page)
+
+    Returns:
+        A document dict holding only the text of the pages in range
+    """
+    num_pages = document['metadata'].get('num_pages') or 1
+    first, last = page_range or [1, num_pages]
+    first, last = min(max(first, 1), num_pages), min(max(last, 1), num_pages)
+    return get_artifact(document, f'pages:{first}-{last}', lambda doc: _build_view(doc, first, last))
+
+
+def _build_view(document: dict, first: int, last: int) -> dict:
+    metadata = document['metadata']
+    texts = get_page_texts(document, range(first - 1, last))
+    content = '\n'.join(texts[p] for p in sorted(texts) if texts[p])
+
+    if metadata.get('outline'):
+        sections = [e['title'] for e in metadata['outline'] if e['page'] and first <= e['page'] <= last]
+    else:
+        sections = [s for s in metadata.get('sections', []) if s in content]
+
+    # Share the per-page graphics cache with the document, so pages analyzed
+    # for one view are not analyzed again for another
+    metadata.setdefault('page_graphics', {})
+    view_metadata = {
+        key: value for key, value in metadata.items()
+        if key not in ('page_offsets', 'page_text', 'outline')
+    }
+    view_metadata.update({
+        'sections': sections,
+        'page_range': [first, last],
+        'lazy_fields': list(VIEW_LAZY_FIELDS)
+    })
+    view = {
+        'content': CompactText(content),
+        'file_path': document.get('file_path'),
+        'file_type': 'pdf',
+        'metadata': view_metadata,
+        'fingerprint': f"{document.get('fingerprint') or 'unknown'}:pages:{first}-{last}"
+    }
+    if document.get('revision'):
+        view['revision'] = document['revision']
+    logger.info('page view built', extra={
+        'page_range': [first, last], 'num_pages': metadata.get('num_pages'), 'words': view['content'].word_count
+    })
+    return view
+
+
+def _extract_pages(file_path: str, pages: list) -> Dict[int, str]:
+    import pdfplumber
+
+    results = {}
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            for index in pages:
+                page = pdf.pages[index]
+                results[index] = page.extract_text() or ''
+                page.flush_cache()
+    except FileNotFoundError:
+        # Fail rather than cache empty text for pages that were never read
+        logger.warning('PDF no longer available for page extraction', extra={'file_path': file_path})
+        raise FileNotFoundError('The uploaded PDF is no longer available; please upload it again') from None
+    return results
@@ -1,10 +1,19 @@
-from agents.graph import run_agent
+import hashlib
 import json
 import os
 from pathlib import Path
+from typing import Optional
+from config import DOCX_ENGINE, PDF_LAZY_MIN_PAGES
+from loaders.compact_text import CompactText
+from loaders.docx_stream import load_docx_streaming
+from loaders.pdf_graphics import LAZY_PDF_FIELDS
+from loaders.pdf_pages import load_pdf_lazy
+from observability.log import get_logger
 
+logger = get_logger(__name__)
 
-def load_document(file_path: str) -> dict:
+
+def load_document(file_path: str, fingerprint: Optional[str] = None) -> dict:
     """
     Load and parse document from file.
     
@@ -12,6 +21,7 @@ def load_document(file_path: str) -> dict:
     
     Args:
         file_path: Path to document file
+        fingerprint: SHA-256 of the file if already known (e.g. hashed during upload)
         
     Returns:
         Dict containing document content and metadata
@@ -22,51 +32,73 @@ def load_document(file_path: str) -> dict:
     file_path = Path(file_path)
     file_ext = file_path.suffix.lower()
     
-    print(f"\n📄 Loading document: {file_path.name}")
-    print(f"📝 File type: {file_ext}")
+    logger.info('loading document', extra={'document': file_path.name, 'file_type': file_ext})
     
     try:
         if file_ext == '.pdf':
-            return load_pdf(file_path)
+            document = load_pdf(file_path)
         elif file_ext == '.docx':
-            return load_docx(file_path)
+            document = load_docx(file_path)
         elif file_ext in ['.txt', '.md']:
-            return load_text(file_path)
+            document = load_text(file_path)
         else:
             raise ValueError(f"Unsupported file format: {file_ext}")
             
     except Exception as e:
-        print(f"❌ Error loading document: {str(e)}")
+        logger.error('error loading document', extra={'document': file_path.name, 'error': str(e)})
         raise
+    
+    # Identifies the exact file contents, so caches survive re-uploads of the same file
+    document['fingerprint'] = fingerprint or file_fingerprint(file_path)
+    # Text is kept once as UTF-8 with line/paragraph offsets; tools slice it instead of splitting
+    if isinstance(document['content'], str):
+        document['content'] = CompactText(document['content'])
+    return document
+
+
+def file_fingerprint(file_path: Path) -> str:
+    """Return the SHA-256 hex digest of a file, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
 def load_pdf(file_path: Path) -> dict:
-    """Load PDF using pdfplumber for better image and diagram detection."""
+    """
+    Load PDF using pdfplumber for better image and diagram detection.
+    
+    Only the cheap fields (text, page count, image count) are extracted here.
+    Table and vector-graphics detection is deferred to
+    loaders.pdf_graphics and runs per page when a tool first needs it.
+    PDFs with PDF_LAZY_MIN_PAGES pages or more are not extracted at all:
+    loaders.pdf_pages reads the outline and extracts pages on demand.
+    """
     try:
         import pdfplumber
         
         full_text = []
+        page_offsets = []
+        offset = 0
         num_images = 0
-        num_tables = 0
-        has_vector_graphics = False
         
         with pdfplumber.open(file_path) as pdf:
+            if PDF_LAZY_MIN_PAGES is not None and len(pdf.pages) >= PDF_LAZY_MIN_PAGES:
+                logger.info('large PDF, extracting pages on demand', extra={'num_pages': len(pdf.pages)})
+                return load_pdf_lazy(file_path)
+            
             for page in pdf.pages:
+                # Byte offset where each page starts in the joined content, for page-range queries
+                page_offsets.append(offset)
+                
                 # Extract text
                 text = page.extract_text()
                 if text:
                     full_text.append(text)
+                    offset += len(text.encode('utf-8', 'surrogatepass')) + 1
                 
                 # Count actual image objects
                 num_images += len(page.images)
-                
-                # Detect tables using pdfplumber's built-in table finder
-                tables = page.find_tables()
-                num_tables += len(tables)
-                
-                # Logic for vector diagrams: if a page has many lines/rects 
-                # but few images, it's likely a vector diagram or chart
-                if len(page.lines) > 10 or len(page.rects) > 10:
-                    has_vector_graphics = True
         
         content = '\n'.join(full_text)
         sections = extract_sections_from_text(content)
@@ -79,17 +111,17 @@ def load_pdf(file_path: Path) -> dict:
                 'filename': file_path.name,
                 'num_pages': len(pdf.pages),
                 'num_images': num_images,
-                'num_tables': num_tables,
-                'has_vector_graphics': has_vector_graphics, # Unique to PDF
+                'lazy_fields': list(LAZY_PDF_FIELDS),  # num_tables, has_vector_graphics
                 'sections': sections,
+                'page_offsets': page_offsets,
                 'file_size': os.path.getsize(file_path)
             }
         }
     except ImportError:
-        print("⚠️ pdfplumber not installed. Install with: pip install pdfplumber")
+        logger.error('pdfplumber not installed. Install with: pip install pdfplumber')
         raise
     except Exception as e:
-        print(f"❌ Error reading PDF: {str(e)}")
+        logger.error('error reading PDF', extra={'error': str(e)})
         raise
 # def load_pdf(file_path: Path) -> dict:
 #     """Load PDF document using PyPDF2 or pdfplumber."""
@@ -131,7 +163,14 @@ def load_pdf(file_path: Path) -> dict:
 
 
 def load_docx(file_path: Path) -> dict:
-    """Load DOCX document using python-docx."""
+    """Load DOCX document using python-docx (or the streaming engine, see DOCX_ENGINE)."""
+    if DOCX_ENGINE == 'streaming':
+        try:
+            return load_docx_streaming(file_path)
+        except Exception as e:
+            logger.error('error reading DOCX', extra={'error': str(e)})
+            raise
+    
     try:
         from docx import Document
         
@@ -165,10 +204,10 @@ def load_docx(file_path: Path) -> dict:
             }
         }
     except ImportError:
-        print("⚠️  python-docx not installed. Install with: pip install python-docx")
+        logger.error('python-docx not installed. Install with: pip install python-docx')
         raise
     except Exception as e:
-        print(f"❌ Error reading DOCX: {str(e)}")
+        logger.error('error reading DOCX', extra={'error': str(e)})
         raise
 
 
@@ -186,43 +225,51 @@ def load_text(file_path: Path) -> dict:
             'file_type': file_path.suffix[1:],  # txt or md
             'metadata': {
                 'filename': file_path.name,
-                'num_lines': len(content.split('\n')),
+                'num_lines': content.count('\n') + 1,
                 'sections': sections,
                 'file_size': os.path.getsize(file_path)
             }
         }
     except Exception as e:
-        print(f"❌ Error reading text file: {str(e)}")
+        logger.error('error reading text file', extra={'error': str(e)})
         raise
 
 
-def extract_sections_from_text(text: str) -> list:
+def extract_sections_from_text(text) -> list:
     """
     Extract section headings from text.
     Looks for common heading patterns.
+    
+    Lines are scanned one at a time (text may be a str or CompactText), so
+    no list of every line is built.
     """
     import re
     
-    sections = []
-    
-    # Pattern 1: Lines that are all caps
-    for line in text.split('\n'):
-        line = line.strip()
-        if line and line.isupper() and len(line) > 3 and len(line) < 100:
-            sections.append(line)
-    
-    # Pattern 2: Markdown headers (# Header)
-    md_headers = re.findall(r'^#+\s+(.+)$', text, re.MULTILINE)
-    sections.extend(md_headers)
-    
-    # Pattern 3: Common section keywords
+    text = text if isinstance(text, CompactText) else CompactText(text)
+    caps_headings, md_headers, keyword_headings = [], [], []
     keywords = ['overview', 'introduction', 'abstract', 'summary', 
                 'methodology', 'results', 'conclusion', 'references']
-    for line in text.split('\n'):
-        line_lower = line.strip().lower()
+    md_pattern = re.compile(r'#+\s+(.+)$')
+    
+    for raw_line in text.lines():
+        line = raw_line.strip()
+        
+        # Pattern 1: Lines that are all caps
+        if line and line.isupper() and len(line) > 3 and len(line) < 100:
+            caps_headings.append(line)
+        
+        # Pattern 2: Markdown headers (# Header)
+        match = md_pattern.match(raw_line)
+        if match:
+            md_headers.append(match.group(1))
+        
+        # Pattern 3: Common section keywords
+        line_lower = line.lower()
         if any(keyword in line_lower for keyword in keywords):
-            if len(line.strip()) < 100:  # Likely a heading
-                sections.append(line.strip())
+            if len(line) < 100:  # Likely a heading
+                keyword_headings.append(line)
+    
+    sections = caps_headings + md_headers + keyword_headings
     
     # Remove duplicates while preserving order
     seen = set()
@@ -268,7 +315,8 @@ def main():
         print("❌ No query provided. Exiting.")
         return
     
-    # Run the agent
+    # Run the agent (imported here: loading documents does not need the agent stack)
+    from agents.graph import run_agent
     final_state = run_agent(
         query=query,
         document=document,
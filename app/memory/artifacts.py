@@ -0,0 +1,79 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+from config import ARTIFACT_CACHE_MAX_DOCUMENTS
+
+
+# document key -> {artifact name: artifact}, least recently used first
+_artifacts = OrderedDict()
+# document key -> sessions holding the document; its artifacts are dropped
+# when the last one lets go (or when it ages out of the LRU)
+_holders = {}
+_lock = threading.Lock()
+
+
+def document_key(document: dict) -> str:
+    """Stable cache key for a document: its file fingerprint, else a content hash."""
+    fingerprint = document.get('fingerprint')
+    if fingerprint:
+        return fingerprint
+    content = document.get('content') or ''
+    # Plain string, or the UTF-8 buffer of a loaded document's CompactText
+    data = content.encode('utf-8', 'surrogatepass') if isinstance(content, str) else content.buffer
+    return 'content:' + hashlib.sha1(data).hexdigest()
+
+
+def get_artifact(document: dict, name: str, builder: Callable[[dict], Any]) -> Any:
+    """
+    Return a derived per-document artifact (index, parsed view, ...), building it once.
+
+    Args:
+        document: Loaded document dict
+        name: Artifact name, e.g. 'section_index'
+        builder: Called with the document when the artifact is not cached yet
+
+    Returns:
+        The cached or freshly built artifact
+    """
+    key = document_key(document)
+    with _lock:
+        entry = _artifacts.get(key)
+        if entry is not None and name in entry:
+            _artifacts.move_to_end(key)
+            return entry[name]
+
+    artifact = builder(document)
+
+    with _lock:
+        entry = _artifacts.setdefault(key, {})
+        artifact = entry.setdefault(name, artifact)
+        _artifacts.move_to_end(key)
+        while len(_artifacts) > ARTIFACT_CACHE_MAX_DOCUMENTS:
+            _artifacts.popitem(last=False)
+    return artifact
+
+
+def retain_artifacts(document: dict, session_id: str) -> None:
+    """Record that a session holds the document, so its artifacts outlive other sessions' discards."""
+    with _lock:
+        _holders.setdefault(document_key(document), set()).add(session_id)
+
+
+def discard_artifacts(document: dict, session_id: str) -> None:
+    """
+    Release a session's hold on a document.
+
+    Every artifact derived from it is dropped once no session holds the
+    file; another session using the same file keeps its indexes.
+    """
+    key = document_key(document)
+    with _lock:
+        holders = _holders.get(key)
+        if holders is not None:
+            holders.discard(session_id)
+            if holders:
+                return
+            del _holders[key]
+        _artifacts.pop(key, None)
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config import CHECKPOINT_MAX_BYTES, CHECKPOINT_MAX_THREADS, CHECKPOINT_TTL_SECONDS
+
+
+# One saver for every graph; threads are conversations. Created on first
+# use so importing this module does not pull in LangGraph.
+_saver = None
+
+# thread_id -> last used (monotonic seconds), least recently used first
+_threads = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_saver():
+    """The shared checkpointer."""
+    global _saver
+    with _lock:
+        if _saver is None:
+            from langgraph.checkpoint.memory import InMemorySaver
+            from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+            # Documents passed by value carry their text as CompactText
+            serde = JsonPlusSerializer(allowed_msgpack_modules=[('loaders.compact_text', 'CompactText')])
+            _saver = InMemorySaver(serde=serde)
+        return _saver
+
+
+def _delete(thread: str) -> None:
+    if _saver is not None:
+        _saver.delete_thread(thread)
+
+
+def thread_id(session_id: str, conversation_index: Any, document: dict) -> str:
+    """
+    Checkpoint thread for one conversation about one version of a document.
+
+    The document fingerprint is part of the id, so uploading a revision
+    starts a fresh thread instead of reusing outputs for the old file.
+    """
+    fingerprint = (document.get('fingerprint') or 'unknown')[:16]
+    return f"{session_id}:{conversation_index}:{fingerprint}"
+
+
+def thread_config(thread: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread}}
+
+
+def has_thread(thread: str) -> bool:
+    """True if the conversation has a live (unexpired) checkpoint."""
+    _expire()
+    with _lock:
+        return thread in _threads
+
+
+def load_carryover(graph, thread: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch what a new turn can reuse from the conversation's last checkpoint.
+
+    Args:
+        graph: A graph compiled with get_saver()
+        thread: From thread_id()
+
+    Returns:
+        {'tool_outputs', 'observations', 'page_range'} from the previous turn, or None
+    """
+    if not has_thread(thread):
+        return None
+    snapshot = graph.get_state(thread_config(thread))
+    values = snapshot.values if snapshot else None
+    if not values:
+        return None
+    return {
+        'tool_outputs': dict(values.get('tool_outputs', {})),
+        'observations': list(values.get('observations', [])),
+        'page_range': list(values.get('page_range', []))
+    }
+
+
+def start_turn(thread: str) -> None:
+    """
+    Reset the thread before a new turn and mark it recently used.
+
+    The carryover has already been read, so the previous turn's step-by-step
+    checkpoints are dropped; each thread holds one turn's history at most.
+    """
+    _delete(thread)
+    with _lock:
+        _threads[thread] = time.monotonic()
+        _threads.move_to_end(thread)
+        evicted = []
+        while len(_threads) > CHECKPOINT_MAX_THREADS:
+            evicted.append(_threads.popitem(last=False)[0])
+    for old in evicted:
+        _delete(old)
+    _enforce_byte_budget()
+
+
+def end_turn(thread: str) -> None:
+    """
+    Apply the byte budget once a turn's checkpoints are written.
+
+    Tool outputs and observations can be large, so besides the thread count
+    the serialized checkpoints are kept under CHECKPOINT_MAX_BYTES, dropping
+    least recently used conversations first (the one just run last of all).
+    """
+    _enforce_byte_budget()
+
+
+def discard_session(session_id: str) -> None:
+    """Drop every checkpoint belonging to a session (e.g. history cleared)."""
+    prefix = f"{session_id}:"
+    with _lock:
+        doomed = [t for t in _threads if t.startswith(prefix)]
+        for thread in doomed:
+            del _threads[thread]
+    for thread in doomed:
+        _delete(thread)
+
+
+def _expire() -> None:
+    cutoff = time.monotonic() - CHECKPOINT_TTL_SECONDS
+    with _lock:
+        doomed = []
+        for thread, last_used in _threads.items():
+            if last_used >= cutoff:
+                break
+            doomed.append(thread)
+        for thread in doomed:
+            del _threads[thread]
+    for thread in doomed:
+        _delete(thread)
+
+
+def _enforce_byte_budget() -> None:
+    sizes = _thread_bytes()
+    with _lock:
+        total = sum(sizes.get(thread, 0) for thread in _threads)
+        doomed = []
+        for thread in _threads:
+            if total <= CHECKPOINT_MAX_BYTES:
+                break
+            doomed.append(thread)
+            total -= sizes.get(thread, 0)
+        for thread in doomed:
+            del _threads[thread]
+    for thread in doomed:
+        _delete(thread)
+
+
+def _thread_bytes() -> Dict[str, int]:
+    """Serialized bytes held per thread by the in-memory saver (checkpoints, blobs, writes)."""
+    sizes = {}
+    if _saver is None:
+        return sizes
+    for thread, namespaces in list(_saver.storage.items()):
+        sizes[thread] = sizes.get(thread, 0) + _payload_bytes(namespaces)
+    for table in (_saver.blobs, _saver.writes):
+        for key, value in list(table.items()):
+            sizes[key[0]] = sizes.get(key[0], 0) + _payload_bytes(value)
+    return sizes
+
+
+def _payload_bytes(value: Any) -> int:
+    # The saver stores serialized values as (type, bytes) inside nested dicts/tuples
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_payload_bytes(v) for v in list(value.values()))
+    if isinstance(value, (tuple, list)):
+        return sum(_payload_bytes(v) for v in value)
+    return 0
@@ -0,0 +1,80 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping, Union
+
+from config import PASS_DOCUMENTS_BY_REFERENCE
+from loaders.pdf_pages import page_view, query_page_range
+from memory.artifacts import document_key
+
+
+# handle -> document, for documents used by at least one running agent
+_documents = {}
+_pins = Counter()
+_lock = threading.Lock()
+
+
+@contextmanager
+def pinned(document: dict) -> Iterator[Union[str, dict]]:
+    """
+    Make a document resolvable by handle for the duration of an agent run.
+
+    The handle is the document's cache key (fingerprint or content hash), so
+    concurrent runs on the same file share one entry. The entry is dropped
+    when the last run using it finishes.
+
+    Yields:
+        The handle to put in agent state, or the document itself when
+        PASS_DOCUMENTS_BY_REFERENCE is off
+    """
+    if not PASS_DOCUMENTS_BY_REFERENCE or not document:
+        yield document
+        return
+
+    handle = document_key(document)
+    with _lock:
+        _documents[handle] = document
+        _pins[handle] += 1
+    try:
+        yield handle
+    finally:
+        with _lock:
+            _pins[handle] -= 1
+            if _pins[handle] <= 0:
+                del _pins[handle]
+                _documents.pop(handle, None)
+
+
+def resolve(handle: str) -> Mapping[str, Any]:
+    """
+    Read-only view of a pinned document.
+
+    Top-level fields cannot be replaced through the view; nested metadata
+    is shared, so lazily computed fields (e.g. page graphics) still cache.
+
+    Raises:
+        KeyError: If no running agent has the document pinned
+    """
+    with _lock:
+        document = _documents.get(handle)
+    if document is None:
+        raise KeyError(f"Document {handle[:16]} is not in the document store")
+    return MappingProxyType(document)
+
+
+def state_document(state: Mapping[str, Any]) -> Mapping[str, Any]:
+    """
+    The document an agent state refers to, whether it holds a handle or the document itself.
+
+    For a PDF, tools only see the state's page range; lazily loaded PDFs
+    always go through a bounded page view (see query_page_range), since
+    their content is not extracted.
+    """
+    document = state['document']
+    if isinstance(document, str):
+        document = resolve(document)
+    page_range = state.get('page_range') or query_page_range(state.get('query', ''), document)
+    if document.get('file_type') == 'pdf' and (page_range or document.get('metadata', {}).get('lazy_pages')):
+        return MappingProxyType(page_view(document, page_range))
+    return document
@@ -0,0 +1,170 @@
+import itertools
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from config import QUICK_ANSWER_CACHE_MAX_DOCUMENTS
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+
+# Canned prompts behind the quick-query buttons
+QUICK_QUERIES = {
+    'format': 'Is the document properly formatted?',
+    'overview': 'Is there an overview section?',
+    'diagrams': 'Does the document contain diagrams or figures?',
+    'summarize': 'Provide a summary of the document'
+}
+
+# fingerprint -> {normalized query: [stream tokens]}, oldest document first
+_answers = OrderedDict()
+# fingerprint -> sessions holding the document, and the epoch answers may be
+# stored under; a discarded document's epoch is gone, so a precompute still
+# running for it stores nothing
+_holders = {}
+_epochs = {}
+_next_epoch = itertools.count(1)
+_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries match."""
+    return ' '.join((query or '').lower().split())
+
+
+_CANNED_QUERIES = {normalize_query(q) for q in QUICK_QUERIES.values()}
+
+
+def is_quick_query(query: str) -> bool:
+    """Return True if the query is one of the quick-query button prompts."""
+    return normalize_query(query) in _CANNED_QUERIES
+
+
+def get_cached_stream(document: dict, query: str) -> Optional[List[str]]:
+    """
+    Look up a precomputed token stream for a canned query.
+
+    Args:
+        document: Loaded document dict (must carry a 'fingerprint')
+        query: The user's query
+
+    Returns:
+        The recorded stream tokens, or None if nothing is cached yet
+    """
+    fingerprint = document.get('fingerprint')
+    if not fingerprint or not is_quick_query(query):
+        return None
+
+    with _lock:
+        answers = _answers.get(fingerprint)
+        if answers is None:
+            return None
+        _answers.move_to_end(fingerprint)
+        tokens = answers.get(normalize_query(query))
+        return list(tokens) if tokens is not None else None
+
+
+def precompute_quick_answers(document: dict) -> Optional[threading.Thread]:
+    """
+    Start a background thread that answers every quick query for a document.
+
+    The thread runs the regular agent stream once per canned query and records
+    the tokens it yields, so a later click can replay them instantly.
+
+    Returns:
+        The started thread, or None if the document has no fingerprint or
+        is not retained by any session (see retain_document)
+    """
+    fingerprint = document.get('fingerprint')
+    with _lock:
+        epoch = _epochs.get(fingerprint)
+    if not fingerprint or epoch is None:
+        return None
+
+    thread = threading.Thread(
+        target=_run_precompute,
+        args=(document, epoch),
+        name=f"quick-answers-{fingerprint[:8]}",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def reuse_answers(previous: dict, document: dict) -> bool:
+    """
+    Carry precomputed answers over to a document with identical content.
+
+    Returns:
+        True if answers were copied
+    """
+    with _lock:
+        answers = _answers.get(previous.get('fingerprint'))
+        epoch = _epochs.get(document.get('fingerprint'))
+        if answers is None or epoch is None:
+            return False
+    for query, tokens in list(answers.items()):
+        _store(document['fingerprint'], epoch, query, tokens)
+    return True
+
+
+def retain_document(document: dict, session_id: str) -> None:
+    """Record that a session holds the document, so its answers may be cached."""
+    fingerprint = document.get('fingerprint')
+    if not fingerprint:
+        return
+    with _lock:
+        _holders.setdefault(fingerprint, set()).add(session_id)
+        _epochs.setdefault(fingerprint, next(_next_epoch))
+
+
+def discard_document(document: dict, session_id: str) -> None:
+    """
+    Release a session's hold on a document.
+
+    Its precomputed answers are forgotten once no session holds the file,
+    and a precompute still running for it stops storing answers.
+    """
+    fingerprint = document.get('fingerprint')
+    with _lock:
+        holders = _holders.get(fingerprint)
+        if holders is None:
+            return
+        holders.discard(session_id)
+        if not holders:
+            del _holders[fingerprint]
+            del _epochs[fingerprint]
+            _answers.pop(fingerprint, None)
+
+
+def _store(fingerprint: str, epoch: int, query: str, tokens: List[str]) -> bool:
+    """Store an answer unless the document was discarded since epoch; False if it was."""
+    with _lock:
+        if _epochs.get(fingerprint) != epoch:
+            return False
+        answers = _answers.setdefault(fingerprint, {})
+        answers[normalize_query(query)] = tokens
+        _answers.move_to_end(fingerprint)
+        while len(_answers) > QUICK_ANSWER_CACHE_MAX_DOCUMENTS:
+            _answers.popitem(last=False)
+    return True
+
+
+def _run_precompute(document: dict, epoch: int) -> None:
+    # Imported here so the cache can be used without pulling in the agent graph
+    from agents.graph import iter_agent_stream
+    from llm.context import llm_context
+
+    for query in QUICK_QUERIES.values():
+        if get_cached_stream(document, query) is not None:
+            continue
+        try:
+            # Background work must never delay a user's live request
+            with llm_context(priority='batch'):
+                tokens = list(iter_agent_stream(query, document))
+        except Exception as e:
+            logger.warning('precomputing quick answer failed', extra={'query': query, 'error': str(e)})
+            continue
+        if not _store(document['fingerprint'], epoch, query, tokens):
+            return  # Discarded while this answer was computed
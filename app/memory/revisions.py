@@ -0,0 +1,43 @@
+from typing import Optional
+
+from config import REVISION_MIN_SHARED_SECTIONS
+from tools.section_index import get_sections
+
+
+def detect_revision(previous: dict, document: dict) -> Optional[dict]:
+    """
+    Decide whether a new upload is a revision of the session's current document.
+
+    Sections are compared by heading and by a content hash of heading plus
+    body, so only sections whose text actually changed are reported.
+
+    Args:
+        previous: The document currently loaded in the session
+        document: The newly uploaded document
+
+    Returns:
+        Revision report (changed/added/removed headings and reuse counts),
+        or None if the upload looks like an unrelated document
+    """
+    if not previous or previous.get('fingerprint') == document.get('fingerprint'):
+        return None
+
+    old_sections = {s['heading']: s['hash'] for s in get_sections(previous)}
+    new_sections = {s['heading']: s['hash'] for s in get_sections(document)}
+    if not old_sections or not new_sections:
+        return None
+
+    shared = [h for h in new_sections if h in old_sections]
+    if len(shared) / max(len(old_sections), len(new_sections)) < REVISION_MIN_SHARED_SECTIONS:
+        return None
+
+    changed = [h for h in shared if new_sections[h] != old_sections[h]]
+    return {
+        'previous_fingerprint': previous.get('fingerprint'),
+        'previous_filename': previous.get('metadata', {}).get('filename'),
+        'changed_sections': changed,
+        'added_sections': [h for h in new_sections if h not in old_sections],
+        'removed_sections': [h for h in old_sections if h not in new_sections],
+        'unchanged_sections': len(shared) - len(changed)
+    }
+
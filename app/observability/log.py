@@ -0,0 +1,171 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS
+
+
+# Fields bound to the current request (request_id, session, job, ...). Threads
+# started with a copy of the context (singleflight producers) carry them too.
+_fields: contextvars.ContextVar[Dict[str, object]] = contextvars.ContextVar('log_fields', default={})
+
+# Attributes every LogRecord has; anything else was passed as extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Logger for a module, with the app's handlers installed on first use.
+
+    Records go to a queue and are formatted and written by a background
+    thread, so logging never blocks request or stream threads on I/O.
+    """
+    if _listener is None:
+        setup_logging()
+    return logging.getLogger(name)
+
+
+def setup_logging() -> None:
+    """
+    Route all logging through a queue to one writer thread.
+
+    LOG_LEVEL sets the default level, LOG_LEVELS per-logger ones (e.g.
+    {'agents': 'DEBUG', 'werkzeug': 'WARNING'}); LOG_FORMAT picks JSON
+    lines or plain text. Safe to call more than once.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+
+        records = queue.SimpleQueue()
+        handler = _QueueHandler(records)
+        handler.addFilter(_ContextFilter())
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(LOG_LEVEL)
+        for name, level in LOG_LEVELS.items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # Flush what is still queued at exit
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """Add fields (request_id, session, job, ...) to every record logged inside the block."""
+    token = _fields.set({**_fields.get(), **fields})
+    try:
+        yield
+    finally:
+        try:
+            _fields.reset(token)
+        except ValueError:
+            # Closed from another context (a generator finished elsewhere)
+            pass
+
+
+def bind(**fields) -> None:
+    """Set the fields for the rest of the current context (e.g. a whole request)."""
+    _fields.set(dict(fields))
+
+
+@contextmanager
+def timed(logger: logging.Logger, event: str, level: int = logging.INFO, **fields) -> Iterator[Dict[str, object]]:
+    """
+    Log event with its duration_ms when the block ends.
+
+    Yields a dict the block can add fields to (counts, sizes, ...).
+    """
+    started = time.perf_counter()
+    extra = dict(fields)
+    try:
+        yield extra
+    except GeneratorExit:
+        # A stream whose client went away
+        extra['closed_early'] = True
+        raise
+    except BaseException as e:
+        extra['error'] = repr(e)
+        raise
+    finally:
+        extra['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        logger.log(level, event, extra=extra)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues a copy of each record with its message merged with its args.
+
+    The stock prepare() formats the record and clears exc_info, folding the
+    traceback into the message; the formatters on the writer thread need it
+    kept apart (JSON lines put it under 'exc').
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _ContextFilter(logging.Filter):
+    """Copies the bound fields onto each record in the thread that logged it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _fields.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, then bound and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable lines for local runs, with the extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s', '%H:%M:%S')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += '  ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
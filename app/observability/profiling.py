@@ -0,0 +1,243 @@
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Optional
+
+from config import (
+    PROFILE_REQUESTS,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_DIR,
+    PROFILE_INTERVAL_SECONDS,
+    PROFILE_TRACEMALLOC_FRAMES,
+    PROFILE_MAX_DEPTH
+)
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+
+# Profile recording the current request, if it was chosen for profiling.
+# Threads started with a copy of the context (singleflight producers) see it too.
+_active: contextvars.ContextVar[Optional['Profile']] = contextvars.ContextVar('active_profile', default=None)
+
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+class _NoProfile:
+    """Returned when profiling is off, so the hooks cost one check and a no-op with-block."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_PROFILE = _NoProfile()
+
+
+def profile_request(kind: str, query: str = '', document: Optional[dict] = None,
+                    file_path: Optional[str] = None):
+    """
+    Profile this request if profiling is on for it.
+
+    Every request is profiled when PROFILE_REQUESTS is set, otherwise a
+    PROFILE_SAMPLE_RATE fraction of them. Use as a context manager around
+    the request's work; code it calls can add labelled sections with
+    profile_section.
+
+    Args:
+        kind: What is being profiled ('upload', 'analyze', 'job', ...)
+        query: User query, recorded with the profile
+        document: Document being analyzed, for its size and name
+        file_path: File being loaded, when there is no document yet
+
+    Returns:
+        A context manager; a no-op when the request is not profiled
+    """
+    if not PROFILE_REQUESTS and not PROFILE_SAMPLE_RATE:
+        return _NO_PROFILE
+    if _active.get() is not None:
+        # Already inside a profiled request; its profile covers this too
+        return profile_section(kind)
+    if not PROFILE_REQUESTS and random.random() >= PROFILE_SAMPLE_RATE:
+        return _NO_PROFILE
+    return Profile(kind, _tags(query, document, file_path))
+
+
+def profile_section(name: str):
+    """
+    Label the current thread's samples with name while inside the block.
+
+    Sections nest, and a section entered on another thread (e.g. a graph run
+    on a singleflight producer) adds that thread to the profile.
+    """
+    profile = _active.get()
+    if profile is None:
+        return _NO_PROFILE
+    return _Section(profile, name)
+
+
+class Profile:
+    """
+    One profiled request: a sampling thread plus a tracemalloc snapshot.
+
+    Stacks of the threads doing the request's work are sampled every
+    PROFILE_INTERVAL_SECONDS and written in the folded format that
+    flamegraph.pl and speedscope read, next to the snapshot and a JSON file
+    of tags (kind, query, document size, duration, peak memory).
+    """
+
+    def __init__(self, kind: str, tags: Dict[str, object]):
+        self.kind = kind
+        self.tags = tags
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{kind}-{os.urandom(3).hex()}"
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads: Dict[int, list] = {}  # thread id -> section label stack
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._token = None
+
+    def __enter__(self):
+        global _tracemalloc_users
+        if PROFILE_TRACEMALLOC_FRAMES:
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+                _tracemalloc_users += 1
+        self._token = _active.set(self)
+        self._enter_thread(self.kind)
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _tracemalloc_users
+        duration = time.perf_counter() - self.started
+        self._stop.set()
+        self._sampler.join()
+        self._exit_thread()
+        try:
+            _active.reset(self._token)
+        except ValueError:
+            # Exited from another context (a generator finished elsewhere)
+            _active.set(None)
+
+        snapshot, peak = None, None
+        if PROFILE_TRACEMALLOC_FRAMES:
+            with _tracemalloc_lock:
+                if tracemalloc.is_tracing():
+                    snapshot = tracemalloc.take_snapshot()
+                    peak = tracemalloc.get_traced_memory()[1]
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0:
+                    tracemalloc.stop()
+
+        self.tags.update({
+            'duration_seconds': round(duration, 4),
+            'samples': self.samples,
+            'interval_seconds': PROFILE_INTERVAL_SECONDS,
+            'peak_traced_bytes': peak,
+            'error': repr(exc) if exc else None
+        })
+        try:
+            self._write(snapshot)
+        except OSError as e:
+            logger.warning('could not write profile', extra={'profile': self.id, 'error': str(e)})
+        return False
+
+    def _write(self, snapshot) -> None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, self.id)
+        with open(base + '.folded', 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        if snapshot is not None:
+            snapshot.dump(base + '.tracemalloc')
+        with open(base + '.json', 'w', encoding='utf-8') as file:
+            json.dump(self.tags, file, indent=2, default=str)
+        logger.info('profile written', extra={
+            'profile': self.id, 'samples': self.samples, 'duration_seconds': self.tags['duration_seconds'],
+            'path': base + '.folded'
+        })
+
+    def _enter_thread(self, name: str) -> None:
+        with self._lock:
+            self._threads.setdefault(threading.get_ident(), []).append(name)
+
+    def _exit_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            labels = self._threads.get(ident)
+            if labels:
+                labels.pop()
+                if not labels:
+                    del self._threads[ident]
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(PROFILE_INTERVAL_SECONDS):
+            with self._lock:
+                threads = {ident: ';'.join(labels) for ident, labels in self._threads.items()}
+            frames = sys._current_frames()
+            for ident, label in threads.items():
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                self.stacks[f"{label};{_fold(frame)}"] += 1
+                self.samples += 1
+            del frames
+
+
+class _Section:
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile._enter_thread(self.name)
+        return self.profile
+
+    def __exit__(self, *exc):
+        self.profile._exit_thread()
+        return False
+
+
+def _fold(frame) -> str:
+    """A frame's stack, outermost first, as 'file:function' joined by ';'."""
+    names = []
+    while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _tags(query: str, document: Optional[dict], file_path: Optional[str]) -> Dict[str, object]:
+    tags = {'query': query}
+    if document is not None:
+        metadata = document.get('metadata', {})
+        tags.update({
+            'filename': metadata.get('filename'),
+            'file_type': document.get('file_type'),
+            'file_size': metadata.get('file_size'),
+            'text_bytes': len(document.get('content') or ''),
+            'num_pages': metadata.get('num_pages'),
+            'page_range': metadata.get('page_range')
+        })
+    elif file_path:
+        tags.update({
+            'filename': os.path.basename(file_path),
+            'file_size': os.path.getsize(file_path) if os.path.exists(file_path) else None
+        })
+    return tags
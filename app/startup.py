@@ -0,0 +1,111 @@
+import importlib
+import threading
+import time
+from typing import Any, Dict
+
+# Imported first by app.py, so this approximates process start
+PROCESS_START = time.perf_counter()
+
+from config import LLM_ENDPOINTS, LLM_KEEP_ALIVE, LLM_MODEL, PRELOAD_IN_BACKGROUND, WARM_UP_MODEL
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+
+# Heavy modules the first upload/query would otherwise import on the request path
+PRELOAD_MODULES = [
+    'langchain_ollama',
+    'langgraph.graph',
+    'agents.graph',
+    'llm.scheduler',
+    'llm.cache',
+    'pdfplumber',
+    'docx',
+    'numpy',
+    'scipy.sparse'
+]
+
+_status = {
+    'app_import_ms': None,
+    'modules_ms': None,
+    'model_ms': None,
+    'modules_loaded': [],
+    'errors': {}
+}
+_done = {'modules': threading.Event(), 'model': threading.Event()}
+_started = False
+_lock = threading.Lock()
+
+
+def _elapsed_ms() -> float:
+    return round((time.perf_counter() - PROCESS_START) * 1000, 1)
+
+
+def mark_app_imported() -> None:
+    """Record how long the Flask app took to import (the page can be served from here)."""
+    _status['app_import_ms'] = _elapsed_ms()
+    logger.info('app imported', extra={'app_import_ms': round(_status['app_import_ms'])})
+
+
+def start_background_startup() -> None:
+    """
+    Preload the agent stack and warm up the model on background threads.
+
+    app.py calls this when run directly; under a WSGI server, call it from
+    the worker's post-fork hook. Safe to call more than once; only the
+    first call starts the work.
+    """
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+
+    if PRELOAD_IN_BACKGROUND:
+        threading.Thread(target=_preload_modules, name="startup-preload", daemon=True).start()
+    else:
+        _done['modules'].set()
+
+    if WARM_UP_MODEL:
+        threading.Thread(target=_warm_up_model, name="startup-warm-up", daemon=True).start()
+    else:
+        _done['model'].set()
+
+
+def startup_status() -> Dict[str, Any]:
+    """Startup timings (ms since process start) and whether the app is fully warm."""
+    return {
+        'ready': all(event.is_set() for event in _done.values()),
+        **_status
+    }
+
+
+def _preload_modules() -> None:
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+            _status['modules_loaded'].append(name)
+        except ImportError as e:
+            _status['errors'][name] = str(e)
+    _status['modules_ms'] = _elapsed_ms()
+    logger.info('modules preloaded', extra={
+        'modules': len(_status['modules_loaded']), 'modules_ms': round(_status['modules_ms'])
+    })
+    _done['modules'].set()
+
+
+def _warm_up_model() -> None:
+    # An empty prompt makes Ollama load the model without generating anything
+    try:
+        from ollama import Client
+        for host in LLM_ENDPOINTS or [None]:
+            Client(host=host).generate(model=LLM_MODEL, prompt='', keep_alive=LLM_KEEP_ALIVE)
+        _status['model_ms'] = _elapsed_ms()
+        logger.info('model warm', extra={
+            'model': LLM_MODEL, 'model_ms': round(_status['model_ms']), 'keep_alive': LLM_KEEP_ALIVE
+        })
+    except Exception as e:
+        _status['errors']['model'] = str(e)
+        logger.warning('model warm-up failed', extra={'error': str(e)})
+    finally:
+        _done['model'].set()
@@ -1,11 +1,15 @@
-from typing import TypedDict, List, Dict, Any
+from typing import TypedDict, List, Dict, Any, Union
+
+from loaders.pdf_pages import query_page_range
+from memory.document_store import resolve
 
 
 class AgentState(TypedDict):
     """Enhanced state that supports autonomous planning."""
     # User input
     query: str
-    document: Dict[str, Any]  # The document to analyze
+    document: Union[str, Dict[str, Any]]  # Handle into memory.document_store (or the document itself)
+    page_range: List[int]  # [first, last] pages in scope (PDFs only, see query_page_range); empty for the whole document
     
     # Planning
     goal: str  # Derived from query
@@ -33,13 +37,19 @@ class AgentState(TypedDict):
     # Results
     final_answer: str
     error_message: str
+    timings: Dict[str, float]  # Seconds, e.g. synthesis_ttft (time to first token)
 
 
-def create_initial_state(query: str, document: Dict[str, Any] = None) -> AgentState:
+def create_initial_state(query: str, document: Union[str, Dict[str, Any]] = None) -> AgentState:
     """Create initial state for autonomous agent."""
+    try:
+        resolved = resolve(document) if isinstance(document, str) else document
+    except KeyError:
+        resolved = None
     return {
         'query': query,
         'document': document or {},
+        'page_range': query_page_range(query, resolved),
         'goal': '',
         'plan': [],
         'pending_actions': [],
@@ -54,5 +64,6 @@ def create_initial_state(query: str, document: Dict[str, Any] = None) -> AgentSt
         'loop_counter': 0,
         'max_iterations': 20,
         'final_answer': '',
-        'error_message': ''
+        'error_message': '',
+        'timings': {}
     }
\ No newline at end of file
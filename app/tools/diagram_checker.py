@@ -1,3 +1,19 @@
+import time
+
+from config import DIAGRAM_TIME_BUDGET_SECONDS
+from loaders.pdf_graphics import ensure_graphics_metadata, get_page_graphics
+from tools.figure_index import KINDS, get_figure_index
+from tools.section_index import tokenize
+
+
+DIAGRAM_LABELS = {'flowchart': 'flowchart', 'chart': 'chart', 'table_grid': 'table grid', 'drawing': 'vector drawing'}
+# Query words (as tokenized) that ask for a diagram type found by page geometry
+QUERY_DIAGRAM_TYPES = {
+    'flowchart': 'flowchart', 'flow': 'flowchart', 'workflow': 'flowchart',
+    'chart': 'chart', 'graph': 'chart', 'plot': 'chart', 'grid': 'table_grid'
+}
+
+
 # def check_diagram(document: dict) -> dict:
 #     """
 #     Check for diagrams, figures, or images in document.
@@ -58,44 +74,141 @@
 #             }
 #         }
 
-def check_diagram(document: dict) -> dict:
+def check_diagram(document: dict, query: str = None) -> dict:
+    """
+    Report the document's images, tables, vector diagrams and captions.
+
+    With a query about a particular visual ("is there a use case diagram?",
+    "what does Figure 3 show?") the caption index is searched for it first.
+
+    Args:
+        document: Document dict with 'content' and 'metadata'
+        query: The user's query
+
+    Returns:
+        Dict with status, summary, and details
+    """
     metadata = document.get('metadata', {})
-    content = document.get('content', '')
+    diagram_pages = {}
+    pages_pending = 0
+    
+    if document.get('file_type') == 'pdf' and document.get('file_path'):
+        # PDF pages are analyzed lazily on first use, as many as fit in the
+        # time budget; later calls pick up where this one stopped
+        deadline = time.monotonic() + DIAGRAM_TIME_BUDGET_SECONDS
+        page_graphics = get_page_graphics(document, deadline=deadline)
+        first, last = metadata.get('page_range') or [1, metadata.get('num_pages', 0)]
+        pages_pending = (last - first + 1) - len(page_graphics)
+        if not pages_pending:
+            metadata = ensure_graphics_metadata(document)
+        
+        for index, info in sorted(page_graphics.items()):
+            for kind in sorted({d['type'] for d in info.get('diagrams', [])} - {'decoration'}):
+                diagram_pages.setdefault(kind, []).append(index + 1)
+        
+        imgs = sum(info.get('num_images', 0) for info in page_graphics.values())
+        tbls = sum(info['num_tables'] for info in page_graphics.values())
+        vectors = any(info['has_vector_graphics'] for info in page_graphics.values())
+    else:
+        metadata = ensure_graphics_metadata(document)
+        imgs = metadata.get('num_images', 0)
+        tbls = metadata.get('num_tables', 0)
+        vectors = metadata.get('has_vector_graphics', False)
     
     diagrams_found = []
     
     # Check 1: Metadata counts (Reliable for DOCX and PDF)
-    imgs = metadata.get('num_images', 0)
-    tbls = metadata.get('num_tables', 0)
-    vectors = metadata.get('has_vector_graphics', False)
-    
     if imgs > 0:
         diagrams_found.append(f"{imgs} images")
     if tbls > 0:
         diagrams_found.append(f"{tbls} tables")
-    if vectors:
+    for kind, pages in diagram_pages.items():
+        diagrams_found.append(f"{DIAGRAM_LABELS.get(kind, kind)} ({_page_list(pages)})")
+    if vectors and not diagram_pages:
         diagrams_found.append("vector-based diagrams/charts")
     
-    # Check 2: Textual references (Backup for Text/MD files)
-    import re
-    patterns = {
-        'Figure': r'Fig(?:ure|[\.])?\s*\d+',
-        'Diagram': r'Diagram\s*\d+',
-        'Table': r'Table\s*\d+'
-    }
-    
-    for label, pattern in patterns.items():
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        if matches:
-            # We only add text-found labels if we didn't find them in metadata
-            unique_count = len(set(matches))
-            diagrams_found.append(f"{unique_count} text references to {label}s")
+    # Check 2: Captions and in-text references, from the figure index built at load
+    index = get_figure_index(document)
+    captions = index.captions()
+    for kind in KINDS.values():
+        captioned = [e for e in captions if e['kind'] == kind]
+        referenced = [e for e in index.entries.values() if e['kind'] == kind and e['references']]
+        if captioned:
+            diagrams_found.append(f"{len(captioned)} captioned {kind.lower()}{'s' if len(captioned) > 1 else ''}")
+        elif referenced:
+            # No captions in the text (e.g. inside images); the references still count
+            diagrams_found.append(f"{len(referenced)} text references to {kind}s")
+
+    issues = []
+    dangling = index.dangling()
+    unreferenced = index.unreferenced()
+    if dangling:
+        issues.append(f"referenced but not captioned: {_label_list(dangling)}")
+    if unreferenced:
+        issues.append(f"never referenced in the text: {_label_list(unreferenced)}")
+
+    # Check 3: The visual the query asks about, by caption lookup (and, for
+    # PDFs, among the diagram types found on the pages)
+    terms, matches = index.lookup(query) if query else ([], [])
+    asked_types = {QUERY_DIAGRAM_TYPES[t] for t in tokenize(query or '') if t in QUERY_DIAGRAM_TYPES}
+    detected = [kind for kind in diagram_pages if kind in asked_types]
+    lookup_note = ''
+    if matches:
+        lookup_note = 'Caption match: ' + '; '.join(_describe(e, diagram_pages) for e in matches[:5]) + '. '
+    elif detected:
+        lookup_note = 'Detected ' + ', '.join(
+            f"{DIAGRAM_LABELS[kind]} ({_page_list(diagram_pages[kind])})" for kind in detected
+        ) + '. '
+    elif terms:
+        lookup_note = f"No caption matches '{' '.join(terms)}'. "
 
+    pending_note = f" ({pages_pending} pages not analyzed yet)" if pages_pending else ''
+    issues_note = f". Caption issues: {'; '.join(issues)}" if issues else ''
     if diagrams_found:
         return {
             'status': 'found',
-            'summary': f"Visuals detected: {', '.join(diagrams_found)}",
-            'details': {'found_types': diagrams_found}
+            'summary': f"{lookup_note}Visuals detected: {', '.join(diagrams_found)}{pending_note}{issues_note}",
+            'details': {
+                'found_types': diagrams_found,
+                'diagram_pages': diagram_pages,
+                'pages_pending': pages_pending,
+                'captions': [_caption_details(e) for e in captions],
+                'dangling_references': [_caption_details(e) for e in dangling],
+                'unreferenced': [e['label'] for e in unreferenced],
+                'query_terms': terms,
+                'caption_matches': [_caption_details(e) for e in matches]
+            }
         }
     
-    return {'status': 'not_found', 'summary': 'No diagrams or tables detected.'}
\ No newline at end of file
+    return {'status': 'not_found', 'summary': f'{lookup_note}No diagrams or tables detected.{pending_note}'}
+
+
+def _describe(entry: dict, diagram_pages: dict) -> str:
+    """'Figure 4 "Use case diagram" (page 3, flowchart)'"""
+    where = []
+    if entry['page']:
+        where.append(f"page {entry['page']}")
+        where.extend(DIAGRAM_LABELS.get(kind, kind) for kind, pages in diagram_pages.items() if entry['page'] in pages)
+    suffix = f" ({', '.join(where)})" if where else ''
+    return f'{entry["label"]} "{entry["title"]}"{suffix}'
+
+
+def _caption_details(entry: dict) -> dict:
+    return {
+        'label': entry['label'],
+        'title': entry['title'],
+        'page': entry['page'],
+        'references': len(entry['references']),
+        'reference_pages': entry['reference_pages']
+    }
+
+
+def _label_list(entries: list) -> str:
+    shown = ', '.join(e['label'] for e in entries[:10])
+    return shown + (f" and {len(entries) - 10} more" if len(entries) > 10 else '')
+
+
+def _page_list(pages: list) -> str:
+    shown = ', '.join(str(page) for page in pages[:10])
+    more = f" and {len(pages) - 10} more" if len(pages) > 10 else ''
+    return f"page{'s' if len(pages) > 1 else ''} {shown}{more}"
\ No newline at end of file
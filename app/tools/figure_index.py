@@ -0,0 +1,210 @@
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from loaders.compact_text import compact_text
+from memory.artifacts import get_artifact
+from tools.section_index import tokenize
+
+
+# "Figure 3", "Fig. 3.2", "Figures 2-4", "Tables 1, 2 and 5", "Diagram 1" (UTF-8 bytes)
+_NUMBER = rb'\d+(?:\.\d+)*'
+_LIST_SEPARATOR = rb'[ \t]*(?:,|&|\band\b|\bto\b|-|\xe2\x80\x93)[ \t]*'
+LABEL_PATTERN = re.compile(
+    rb'\b(?P<label>fig(?:ure)?(?P<plural>s)?\.?|diagram(?P<diagrams>s)?|table(?P<tables>s)?)'
+    rb'[ \t]*(?P<numbers>' + _NUMBER + rb'(?:' + _LIST_SEPARATOR + _NUMBER + rb')*)\b',
+    re.IGNORECASE
+)
+NUMBER_PATTERN = re.compile(_NUMBER)
+
+# What follows the number on a caption line: "Figure 3: Title", "Table 2 - Title"
+CAPTION_SEPARATOR = re.compile(r'^\s*(?:[:.|\-–—]\s*)?')
+DOT_LEADERS = re.compile(r'\s*(?:\.\s?){4,}\s*\d*\s*$')  # "Figure 1: Overview ........ 12" (a list of figures)
+MAX_TITLE_CHARS = 200
+MAX_RANGE = 20  # "Figures 2-4" expands to each number; wider spans are taken as two numbers
+
+KINDS = {'fig': 'Figure', 'diagram': 'Diagram', 'table': 'Table'}
+
+# Query words that name a kind of visual (or ask about captions) rather than its subject
+GENERIC_TERMS = {
+    'figure', 'fig', 'diagram', 'table', 'chart', 'graph', 'image', 'picture', 'illustration',
+    'visual', 'drawing', 'caption', 'captioned', 'label', 'labelled', 'labeled', 'numbered',
+    'all', 'list', 'include', 'included', 'missing', 'referenced', 'reference', 'unreferenced',
+    'dangling', 'mentioned', 'text', 'page', 'pages'
+}
+
+
+class FigureIndex:
+    """
+    The document's figure, diagram and table captions and the references to them.
+
+    Built in one pass over the UTF-8 text: an occurrence that opens a line and
+    is followed by a title is a caption, every other occurrence a reference.
+    Entries are keyed by (kind, number), e.g. ('Figure', '3').
+    """
+
+    def __init__(self, buffer: bytes, page_offsets: Optional[List[int]] = None):
+        self.page_offsets = page_offsets
+        self.entries: Dict[Tuple[str, str], Dict] = {}
+        listed = {}  # Captions found only in a list of figures/tables
+
+        for match in LABEL_PATTERN.finditer(buffer):
+            kind = _kind(match.group('label'))
+            plural = match.group('plural') or match.group('diagrams') or match.group('tables')
+            numbers = _numbers(match.group('numbers'), plural)
+
+            caption = None if plural or len(numbers) > 1 else self._caption(buffer, match)
+            if caption is not None:
+                key = (kind, numbers[0])
+                title, is_listing = caption
+                if is_listing:
+                    listed.setdefault(key, (title, match.start()))
+                    continue
+                entry = self._entry(key)
+                if entry['offset'] < 0:
+                    entry.update({'title': title, 'offset': match.start(), 'page': self.page_of(match.start())})
+                    continue
+                # A second caption with the same number is counted as a reference
+
+            for number in numbers:
+                entry = self._entry((kind, number))
+                entry['references'].append(match.start())
+
+        # Numbers only captioned in a list of figures keep that title
+        for key, (title, offset) in listed.items():
+            entry = self._entry(key)
+            if entry['offset'] < 0:
+                entry.update({'title': title, 'offset': offset, 'page': self.page_of(offset)})
+
+        for entry in self.entries.values():
+            entry['reference_pages'] = sorted({p for p in map(self.page_of, entry['references']) if p})
+
+    def _entry(self, key: Tuple[str, str]) -> Dict:
+        entry = self.entries.get(key)
+        if entry is None:
+            kind, number = key
+            entry = self.entries[key] = {
+                'kind': kind, 'number': number, 'label': f"{kind} {number}",
+                'title': None, 'offset': -1, 'page': None, 'references': []
+            }
+        return entry
+
+    @staticmethod
+    def _caption(buffer: bytes, match) -> Optional[Tuple[str, bool]]:
+        """(title, is list-of-figures entry) when the match opens a caption line, else None."""
+        line_start = buffer.rfind(b'\n', 0, match.start()) + 1
+        if buffer[line_start:match.start()].strip():
+            return None
+        number_end = NUMBER_PATTERN.match(buffer, match.start('numbers')).end()
+        line_end = buffer.find(b'\n', number_end)
+        rest = buffer[number_end:line_end if line_end >= 0 else len(buffer)].decode('utf-8', 'ignore')
+
+        separator = CAPTION_SEPARATOR.match(rest).group()
+        title = rest[len(separator):].strip()
+        if not title:
+            return None
+        # Without a separator only a capitalized title makes a caption ("Table 2 Results",
+        # not "Figure 3 shows the ...")
+        if not separator.strip() and not title[0].isupper():
+            return None
+
+        is_listing = bool(DOT_LEADERS.search(title))
+        title = DOT_LEADERS.sub('', title)
+        return title[:MAX_TITLE_CHARS], is_listing
+
+    def page_of(self, offset: int) -> Optional[int]:
+        """1-based page holding a byte offset, when the document has page offsets."""
+        if not self.page_offsets or offset < 0:
+            return None
+        return bisect_right(self.page_offsets, offset)
+
+    # ------------------------------------------------------------------
+
+    def captions(self, kind: Optional[str] = None) -> List[Dict]:
+        """Captioned entries in document order, optionally of one kind."""
+        return sorted(
+            (e for e in self.entries.values() if e['offset'] >= 0 and (kind is None or e['kind'] == kind)),
+            key=lambda e: e['offset']
+        )
+
+    def dangling(self) -> List[Dict]:
+        """
+        Referenced numbers that have no caption.
+
+        Only kinds with at least one caption are checked: a document whose
+        captions were not extracted as text (e.g. inside images) would
+        otherwise flag every reference.
+        """
+        captioned = {e['kind'] for e in self.entries.values() if e['offset'] >= 0}
+        return sorted(
+            (e for e in self.entries.values() if e['offset'] < 0 and e['kind'] in captioned),
+            key=lambda e: e['references'][0]
+        )
+
+    def unreferenced(self) -> List[Dict]:
+        """Captioned entries the text never refers to."""
+        return [e for e in self.captions() if not e['references']]
+
+    def lookup(self, query: str) -> Tuple[List[str], List[Dict]]:
+        """
+        Find the captions a query asks about.
+
+        A query naming a number ("what does Figure 3 show") gets that entry;
+        otherwise captions are matched on the query's subject terms ("is
+        there a use case diagram" -> 'use', 'case'), best match first.
+
+        Returns:
+            (subject terms, matching entries); no terms means the query asks
+            about visuals in general and nothing was looked up
+        """
+        named = []
+        for match in LABEL_PATTERN.finditer(query.encode('utf-8', 'surrogatepass')):
+            kind = _kind(match.group('label'))
+            named.extend((kind, number) for number in _numbers(match.group('numbers'), True))
+        if named:
+            named = list(dict.fromkeys(named))
+            return [f"{kind} {number}" for kind, number in named], [self.entries[k] for k in named if k in self.entries]
+
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t not in GENERIC_TERMS and not t.isdigit()]
+        if not terms:
+            return [], []
+
+        needed = (len(terms) + 1) // 2
+        scored = []
+        for entry in self.captions():
+            title_terms = set(tokenize(entry['title']))
+            score = sum(term in title_terms for term in terms)
+            if score >= needed:
+                scored.append((-score, entry['offset'], entry))
+        return terms, [entry for _, _, entry in sorted(scored, key=lambda s: s[:2])]
+
+
+def _kind(label: bytes) -> str:
+    label = label.lower()
+    return next(kind for prefix, kind in KINDS.items() if label.startswith(prefix.encode()))
+
+
+def _numbers(text: bytes, is_list: bool) -> List[str]:
+    """The numbers in a reference; a singular label refers to its first number only."""
+    numbers = [n.decode() for n in NUMBER_PATTERN.findall(text)]
+    if not is_list:
+        return numbers[:1]
+    # "Figures 2-4" / "Figures 2 to 4" -> 2, 3, 4
+    expanded = []
+    for part in re.split(rb'[ \t]*(?:,|&|\band\b)[ \t]*', text, flags=re.IGNORECASE):
+        bounds = [n.decode() for n in NUMBER_PATTERN.findall(part)]
+        if len(bounds) == 2 and bounds[0].isdigit() and bounds[1].isdigit() \
+                and 0 < int(bounds[1]) - int(bounds[0]) <= MAX_RANGE:
+            expanded.extend(str(n) for n in range(int(bounds[0]), int(bounds[1]) + 1))
+        else:
+            expanded.extend(bounds)
+    return list(dict.fromkeys(expanded))
+
+
+def get_figure_index(document: dict) -> FigureIndex:
+    """Return the document's figure/table index, building it on first use."""
+    return get_artifact(
+        document,
+        'figure_index',
+        lambda doc: FigureIndex(compact_text(doc).buffer, doc.get('metadata', {}).get('page_offsets'))
+    )
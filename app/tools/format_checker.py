@@ -1,4 +1,8 @@
-def check_format(document: dict) -> dict:
+from loaders.compact_text import compact_text
+from tools.format_rules import get_rule_engine, scan_document_content
+
+
+def check_format(document: dict, profile: str = None) -> dict:
     """
     Comprehensive document format and structure validation.
     
@@ -11,11 +15,12 @@ def check_format(document: dict) -> dict:
     
     Args:
         document: Document dict with 'content' and 'metadata'
+        profile: Format profile name (default: FORMAT_PROFILE)
         
     Returns:
         Dict with status, summary, and detailed validation results
     """
-    content = document.get('content', '')
+    text = compact_text(document)
     metadata = document.get('metadata', {})
     file_type = document.get('file_type', 'unknown')
     
@@ -28,7 +33,7 @@ def check_format(document: dict) -> dict:
     # ========================================================================
     
     # Check if document has sufficient content
-    word_count = len(content.split())
+    word_count = text.word_count
     if word_count < 50:
         errors.append(f'Document is too short ({word_count} words)')
     elif word_count < 200:
@@ -49,43 +54,33 @@ def check_format(document: dict) -> dict:
     # 2. REQUIRED SECTIONS CHECK
     # ========================================================================
     
-    # Common required sections for technical/business documents
-    required_sections = {
-        'overview': ['overview', 'executive summary', 'abstract'],
-        'introduction': ['introduction', 'background'],
-        'methodology': ['methodology', 'approach', 'methods', 'implementation'],
-        'results': ['results', 'findings', 'outcomes'],
-        'conclusion': ['conclusion', 'summary', 'closing']
-    }
-    
-    sections_lower = [s.lower() for s in sections]
+    # Required sections come from the active format profile; all heading
+    # rules run in a single pass of the compiled rule engine
+    engine = get_rule_engine(profile)
+    heading_scan = engine.scan_headings(sections)
+    heading_categories = heading_scan['categories']
     found_required = {}
     
-    for category, keywords in required_sections.items():
-        found = False
-        for keyword in keywords:
-            if any(keyword in section for section in sections_lower):
-                found = True
-                found_required[category] = True
-                break
+    for category in engine.required_sections:
+        found = any(category in matched for matched in heading_categories)
+        found_required[category] = found
         
         if found:
             validations.append(f'✓ Found {category} section')
         else:
             warnings.append(f'⚠ Missing {category} section')
-            found_required[category] = False
     
     # ========================================================================
     # 3. CONTENT ORGANIZATION CHECKS
     # ========================================================================
     
     # Check if sections are in logical order
-    expected_order = ['overview', 'introduction', 'methodology', 'results', 'conclusion']
+    expected_order = list(engine.required_sections)
     section_positions = {}
     
-    for i, section in enumerate(sections_lower):
+    for i, matched in enumerate(heading_categories):
         for category in expected_order:
-            if any(keyword in section for keyword in required_sections[category]):
+            if category in matched:
                 section_positions[category] = i
                 break
     
@@ -110,10 +105,8 @@ def check_format(document: dict) -> dict:
         else:
             warnings.append('Some headings are unusually long or short')
     
-    # Check for numbered sections
-    import re
-    numbered_sections = [s for s in sections if re.match(r'^\d+\.', s.strip())]
-    if len(numbered_sections) > len(sections) / 2:
+    # Check for numbered sections (matched in the same heading pass)
+    if heading_scan['numbered'] > len(sections) / 2:
         validations.append('Document uses numbered sections')
     
     # ========================================================================
@@ -149,13 +142,12 @@ def check_format(document: dict) -> dict:
     # ========================================================================
     
     # Check for placeholder text
-    placeholders = ['lorem ipsum', 'todo', 'tbd', 'xxx', '[insert', 'placeholder']
-    found_placeholders = [p for p in placeholders if p in content.lower()]
+    found_placeholders = scan_document_content(document, profile)['placeholders']
     if found_placeholders:
         warnings.append(f'Found placeholder text: {", ".join(found_placeholders)}')
     
     # Check for empty sections (multiple consecutive line breaks)
-    empty_sections = content.count('\n\n\n\n')
+    empty_sections = text.count('\n\n\n\n')
     if empty_sections > 3:
         warnings.append(f'Document has {empty_sections} potentially empty sections')
     
@@ -0,0 +1,180 @@
+import re
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Union
+
+from config import FORMAT_PROFILE
+from loaders.compact_text import compact_text
+from memory.artifacts import get_artifact
+from tools.section_index import cached_by_hash, get_text_regions
+
+
+# ============================================================================
+# FORMAT PROFILES
+# ============================================================================
+# Each profile is plain data: keyword rules for required sections (matched as
+# substrings of the lowercased headings, in the expected order) and keyword
+# rules for placeholder text (matched anywhere in the content).
+
+FORMAT_PROFILES = {
+    'general': {
+        'required_sections': {
+            'overview': ['overview', 'executive summary', 'abstract'],
+            'introduction': ['introduction', 'background'],
+            'methodology': ['methodology', 'approach', 'methods', 'implementation'],
+            'results': ['results', 'findings', 'outcomes'],
+            'conclusion': ['conclusion', 'summary', 'closing']
+        },
+        'placeholders': ['lorem ipsum', 'todo', 'tbd', 'xxx', '[insert', 'placeholder']
+    },
+    'technical_spec': {
+        'required_sections': {
+            'overview': ['overview', 'abstract', 'purpose'],
+            'scope': ['scope', 'background'],
+            'requirements': ['requirements', 'use case', 'user stories'],
+            'architecture': ['architecture', 'design', 'system diagram'],
+            'testing': ['testing', 'validation', 'acceptance criteria'],
+            'conclusion': ['conclusion', 'summary', 'future work']
+        },
+        'placeholders': ['lorem ipsum', 'todo', 'tbd', 'xxx', '[insert', 'placeholder', 'fixme']
+    },
+    'business_report': {
+        'required_sections': {
+            'overview': ['executive summary', 'overview'],
+            'introduction': ['introduction', 'background', 'context'],
+            'analysis': ['analysis', 'market', 'financial'],
+            'results': ['results', 'findings', 'outcomes'],
+            'recommendations': ['recommendations', 'next steps', 'action plan'],
+            'conclusion': ['conclusion', 'closing']
+        },
+        'placeholders': ['lorem ipsum', 'todo', 'tbd', 'xxx', '[insert', 'placeholder']
+    }
+}
+
+# Regex rule shared by every profile: numbered headings
+NUMBERED_HEADING_PATTERN = r'^\d+\.'
+
+
+def _alternation(words: List[str]) -> str:
+    # An empty rule list must never match (an empty alternation matches everywhere)
+    return '|'.join(map(re.escape, words)) if words else '(?!)'
+
+
+class FormatRuleEngine:
+    """
+    A format profile compiled into two single-pass automata.
+
+    Every keyword and regex rule is folded into one alternation per input
+    (headings, content). The alternation sits inside a lookahead, so matches
+    may overlap: "executive summary" still credits the 'summary' keyword.
+    """
+
+    def __init__(self, profile: dict):
+        self.required_sections = profile['required_sections']
+        self.placeholders = profile['placeholders']
+
+        # keyword -> categories it satisfies; keywords longest first so the
+        # alternation prefers the longest match at a position
+        self.keyword_categories = {}
+        for category, keywords in self.required_sections.items():
+            for keyword in keywords:
+                self.keyword_categories.setdefault(keyword, []).append(category)
+        keywords = sorted(self.keyword_categories, key=len, reverse=True)
+
+        # A match also satisfies every shorter keyword it starts with
+        self.keyword_prefixes = {
+            keyword: [k for k in keywords if keyword.startswith(k)] for keyword in keywords
+        }
+
+        self.heading_automaton = re.compile(
+            r'(?=(?:(?P<keyword>' + _alternation(keywords) + r')'
+            r'|(?P<numbered>' + NUMBERED_HEADING_PATTERN + r')))',
+            re.MULTILINE
+        )
+
+        placeholders = sorted(self.placeholders, key=len, reverse=True)
+        self.placeholder_prefixes = {
+            p: [k for k in placeholders if p.startswith(k)] for p in placeholders
+        }
+        self.content_automaton = re.compile(
+            r'(?=(?P<placeholder>' + _alternation(placeholders) + r'))',
+            re.IGNORECASE
+        )
+
+    def scan_headings(self, sections: List[str]) -> Dict:
+        """
+        Run the heading rules over all headings in one pass.
+
+        Returns:
+            'categories': per heading, the set of required-section categories it matches
+            'numbered': number of headings that start with a section number
+        """
+        lines = [s.strip().lower() for s in sections]
+        text = '\n'.join(lines)
+        line_starts = [0]
+        for line in lines[:-1]:
+            line_starts.append(line_starts[-1] + len(line) + 1)
+
+        categories = [set() for _ in lines]
+        numbered = set()
+        for match in self.heading_automaton.finditer(text):
+            index = bisect_right(line_starts, match.start()) - 1
+            keyword = match.group('keyword')
+            if keyword:
+                for prefix in self.keyword_prefixes[keyword]:
+                    categories[index].update(self.keyword_categories[prefix])
+            elif match.group('numbered'):
+                numbered.add(index)
+
+        return {'categories': categories, 'numbered': len(numbered)}
+
+    def scan_content(self, content: Union[str, Iterable[str]]) -> Dict:
+        """
+        Run the content rules over the text in one pass.
+
+        Args:
+            content: The text, or the text as consecutive pieces cut at line
+                boundaries (e.g. CompactText.blocks())
+
+        Returns:
+            'placeholders': placeholder keywords found, in profile order
+        """
+        found_placeholders = set()
+
+        for piece in ([content] if isinstance(content, str) else content):
+            for match in self.content_automaton.finditer(piece):
+                found_placeholders.update(self.placeholder_prefixes[match.group('placeholder').lower()])
+
+        return {'placeholders': [p for p in self.placeholders if p in found_placeholders]}
+
+
+_engines = {}
+
+
+def get_rule_engine(profile: str = None) -> FormatRuleEngine:
+    """Return the compiled engine for a profile (compiled once per process)."""
+    name = profile or FORMAT_PROFILE
+    if name not in _engines:
+        _engines[name] = FormatRuleEngine(FORMAT_PROFILES[name])
+    return _engines[name]
+
+
+def scan_document_content(document: dict, profile: str = None) -> Dict:
+    """
+    Content scan for a document, run once per document and profile.
+
+    Sections are scanned separately and their matches cached by content hash,
+    so a revised upload only scans the sections that changed.
+    """
+    name = profile or FORMAT_PROFILE
+    return get_artifact(document, f'content_rules:{name}', lambda doc: _scan_regions(doc, name))
+
+
+def _scan_regions(document: dict, profile: str) -> Dict:
+    engine = get_rule_engine(profile)
+    text = compact_text(document)
+    found = set()
+    for start, end, key in get_text_regions(document):
+        found.update(cached_by_hash(
+            f'rules:{profile}:{key}', lambda: engine.scan_content(text.blocks(start=start, end=end))['placeholders']
+        ))
+    return {'placeholders': [p for p in engine.placeholders if p in found]}
@@ -1,25 +1,35 @@
-def search_headings(document: dict) -> dict:
+from config import HEADING_SEARCH_TOP_K
+from loaders.compact_text import compact_text
+from tools.section_index import get_section_index, tokenize
+
+
+def search_headings(document: dict, query: str = None) -> dict:
     """
     Search for headings/sections in the document.
-    
+
+    With a query, sections are ranked by a BM25 index over headings and their
+    body text, and only the top matches are returned. Without one (or when
+    the query has no searchable terms) the full section list is returned.
+
     Args:
         document: Document dict with 'content' and 'metadata'
-        
+        query: The user's query
+
     Returns:
         Dict with status, summary, and details
     """
     sections = document.get('metadata', {}).get('sections', [])
-    content = document.get('content', '')
-    
+
     if not sections:
         # Try to extract from content if metadata doesn't have sections
-        import re
-        lines = content.split('\n')
         sections = []
-        for line in lines[:100]:  # Check first 100 lines
+        for line in compact_text(document).lines(0, 100):  # Check first 100 lines
             if line.strip().isupper() and 5 < len(line.strip()) < 100:
                 sections.append(line.strip())
-    
+
+    if sections and query and tokenize(query):
+        return _search_sections(document, sections, query)
+
     if sections:
         return {
             'status': 'found',
@@ -38,3 +48,36 @@ def search_headings(document: dict) -> dict:
                 'count': 0
             }
         }
+
+
+def _search_sections(document: dict, sections: list, query: str) -> dict:
+    """Rank sections against the query and return only the top matches."""
+    # Headings recovered from the content are deterministic per document,
+    # so they can share the document's cached index
+    metadata = {**document.get('metadata', {}), 'sections': sections}
+    index = get_section_index({**document, 'metadata': metadata})
+
+    matches = index.search(query, top_k=HEADING_SEARCH_TOP_K)
+
+    if matches:
+        return {
+            'status': 'found',
+            'summary': f'{len(matches)} of {len(sections)} sections match the query (best: {matches[0]["heading"]})',
+            'details': {
+                'query': query,
+                'matches': matches,
+                'sections': [match['heading'] for match in matches],
+                'count': len(sections)
+            }
+        }
+
+    return {
+        'status': 'not_found',
+        'summary': f'Query terms not found in any of the {len(sections)} sections/headings',
+        'details': {
+            'query': query,
+            'matches': [],
+            'sections': sections[:HEADING_SEARCH_TOP_K],  # Outline preview for context
+            'count': len(sections)
+        }
+    }
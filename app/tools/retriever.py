@@ -0,0 +1,198 @@
+import math
+from collections import Counter
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from config import RETRIEVAL_CHUNK_WORDS, RETRIEVAL_TOP_K
+from loaders.compact_text import CompactText, compact_text
+from memory.artifacts import get_artifact
+from observability.log import get_logger
+from tools.section_index import cached_by_hash, get_text_regions, iter_tokens, tokenize
+
+logger = get_logger(__name__)
+
+
+def split_chunks(text: CompactText, chunk_words: int = RETRIEVAL_CHUNK_WORDS,
+                 start: int = 0, end: Optional[int] = None) -> array:
+    """
+    Split the text, or the byte range start-end of it, into passages of roughly chunk_words words.
+
+    Lines are never cut, so a chunk always starts at a line boundary (or at
+    start). Chunks depend only on the range's own text, so an unchanged
+    section always produces the same chunks.
+
+    Returns:
+        Flat array of (start, end) byte spans into the text, one pair per
+        chunk, trimmed of surrounding whitespace
+    """
+    spans = array('Q')
+    end = len(text) if end is None else end
+    chunk_start, chunk_end, words = None, 0, 0
+
+    first_line = max(bisect_right(text.line_starts, start) - 1, 0)
+    for line_start, line_end in text.line_spans(first_line):
+        if line_start >= end:
+            break
+        line_start, line_end = max(line_start, start), min(line_end, end)
+        if chunk_start is None:
+            chunk_start = line_start
+        chunk_end = line_end
+        words += len(text.buffer[line_start:line_end].split())
+        if words >= chunk_words:
+            _add_span(spans, text, chunk_start, chunk_end)
+            chunk_start, words = None, 0
+
+    if chunk_start is not None:
+        _add_span(spans, text, chunk_start, chunk_end)
+    return spans
+
+
+def _add_span(spans: array, text: CompactText, start: int, end: int) -> None:
+    start, end = text.strip_span(start, end)
+    if start < end:
+        spans.extend((start, end))
+
+
+class ChunkIndex:
+    """
+    TF-IDF index over document chunks stored as a sparse matrix.
+
+    Chunks are kept as byte spans into the document text; only the passages
+    a search returns are decoded.
+    """
+
+    def __init__(self, spans: array, text: CompactText, chunk_terms: List[Counter]):
+        try:
+            import numpy as np
+            from scipy.sparse import csr_matrix
+        except ImportError:
+            logger.error('numpy/scipy not installed. Install with: pip install numpy scipy')
+            raise
+
+        self.spans = spans
+        self.text = text
+        self.num_chunks = len(spans) // 2
+        self.vocabulary = {}
+        # Matrix coordinates as typed arrays rather than lists of Python numbers
+        rows, cols, values = array('i'), array('i'), array('f')
+
+        for row, counts in enumerate(chunk_terms):
+            for term, tf in counts.items():
+                col = self.vocabulary.setdefault(term, len(self.vocabulary))
+                rows.append(row)
+                cols.append(col)
+                values.append(1.0 + math.log(tf))  # Sublinear term frequency
+
+        shape = (self.num_chunks, len(self.vocabulary))
+        matrix = csr_matrix(
+            (np.frombuffer(values, dtype=np.float32), (np.frombuffer(rows, dtype=np.intc), np.frombuffer(cols, dtype=np.intc))),
+            shape=shape
+        )
+
+        # Smoothed idf per term, applied column-wise
+        document_frequency = np.bincount(matrix.indices, minlength=shape[1])
+        self.idf = (np.log((1 + shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+        matrix = matrix.multiply(self.idf).tocsr()
+
+        # L2-normalize rows so a dot product is cosine similarity
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        # Column-major, since queries only ever read a handful of term columns
+        self.matrix = csr_matrix(matrix.multiply(1.0 / norms[:, None])).tocsc()
+
+    def search(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> List[Dict]:
+        """
+        Return the top_k chunks most similar to the query, best first.
+        """
+        import numpy as np
+
+        counts = Counter(t for t in tokenize(query) if t in self.vocabulary)
+        if not counts or not self.num_chunks:
+            return []
+
+        cols = np.fromiter((self.vocabulary[t] for t in counts), dtype=np.int64, count=len(counts))
+        weights = np.fromiter((1.0 + math.log(tf) for tf in counts.values()), dtype=np.float32, count=len(counts))
+        weights *= self.idf[cols]
+
+        # Only the query's columns contribute, so score with that slice alone
+        scores = self.matrix[:, cols] @ weights
+        scores /= np.linalg.norm(weights)
+
+        k = min(top_k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        return [
+            {
+                'text': self.text.text(self.spans[2 * i], self.spans[2 * i + 1]),
+                'offset': self.spans[2 * i],
+                'score': round(float(scores[i]), 3)
+            }
+            for i in best
+        ]
+
+
+def build_chunk_index(document: dict) -> ChunkIndex:
+    """
+    Chunk the document section by section and index the chunks.
+
+    Chunks never cross a section start. A section whose text is unchanged
+    (e.g. in a revised upload) reuses its chunks and their term counts, so
+    only changed sections are split and tokenized again.
+    """
+    text = compact_text(document)
+    spans, chunk_terms = array('Q'), []
+    for start, end, key in get_text_regions(document):
+        relative, terms = cached_by_hash(
+            f'chunks:{RETRIEVAL_CHUNK_WORDS}:{key}', lambda: _chunk_region(text, start, end)
+        )
+        spans.extend(offset + start for offset in relative)
+        chunk_terms.extend(terms)
+    return ChunkIndex(spans, text, chunk_terms)
+
+
+def _chunk_region(text: CompactText, start: int, end: int) -> Tuple[array, List[Counter]]:
+    # Spans relative to the region start, so they apply wherever the section moved to
+    spans = split_chunks(text, start=start, end=end)
+    terms = [Counter(iter_tokens(text.text(spans[i], spans[i + 1]))) for i in range(0, len(spans), 2)]
+    return array('Q', (offset - start for offset in spans)), terms
+
+
+def get_chunk_index(document: dict) -> ChunkIndex:
+    """Return the document's chunk index, building it on first use."""
+    return get_artifact(document, 'chunk_index', build_chunk_index)
+
+
+def retrieve_passages(document: dict, query: str = None) -> dict:
+    """
+    Retrieve the document passages most relevant to the query.
+
+    Args:
+        document: Document dict with 'content' and 'metadata'
+        query: The user's query
+
+    Returns:
+        Dict with status, summary, and details
+    """
+    passages = get_chunk_index(document).search(query or '')
+
+    if passages:
+        return {
+            'status': 'found',
+            'summary': f'Retrieved {len(passages)} relevant passages',
+            'details': {
+                'passages': passages,
+                'count': len(passages)
+            }
+        }
+    return {
+        'status': 'not_found',
+        'summary': 'No passages relevant to the query were found',
+        'details': {
+            'passages': [],
+            'count': 0
+        }
+    }
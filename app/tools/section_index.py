@@ -0,0 +1,231 @@
+import difflib
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from config import TERM_CACHE_SIZE
+from loaders.compact_text import CompactText, compact_text
+from memory.artifacts import get_artifact
+
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+', re.IGNORECASE)
+
+# Words that carry no meaning for locating a section ("is there an overview section?")
+STOPWORDS = {
+    'a', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'can', 'check', 'contain',
+    'contains', 'do', 'document', 'does', 'for', 'from', 'has', 'have', 'heading',
+    'headings', 'how', 'if', 'in', 'into', 'is', 'it', 'its', 'me', 'of', 'on', 'or',
+    'please', 'section', 'sections', 'show', 'so', 'that', 'the', 'there', 'this', 'to',
+    'was', 'what', 'where', 'which', 'with', 'yes'
+}
+
+HEADING_WEIGHT = 3  # A heading term counts like this many body occurrences
+BM25_K1 = 1.5
+BM25_B = 0.75
+FUZZY_CUTOFF = 0.8  # Minimum similarity for a misspelled query term to match
+
+# content hash -> value derived from that text (term counts, chunks, rule
+# matches), shared across documents so revisions only process changed sections
+_term_cache = OrderedDict()
+_term_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords dropped and plural 's' stripped."""
+    return list(iter_tokens(text))
+
+
+def iter_tokens(text: str) -> Iterator[str]:
+    """tokenize() one token at a time, without a lowercased copy of the text."""
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group().lower()
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        yield token
+
+
+def text_hash(text: str) -> str:
+    """Content hash used to recognize unchanged text across documents."""
+    return hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def cached_by_hash(key: str, build: Callable[[], Any]) -> Any:
+    """
+    A value derived from a piece of text, memoized under the text's content hash.
+
+    Keys are a content hash (e.g. a section's 'hash') with a prefix naming
+    what was derived. The returned value is shared; callers must not modify it.
+    """
+    with _term_lock:
+        value = _term_cache.get(key)
+        if value is not None:
+            _term_cache.move_to_end(key)
+            return value
+
+    value = build()
+
+    with _term_lock:
+        _term_cache[key] = value
+        while len(_term_cache) > TERM_CACHE_SIZE:
+            _term_cache.popitem(last=False)
+    return value
+
+
+def split_sections(document: dict) -> List[Dict]:
+    """
+    Locate each detected heading in the content and hash its body text.
+
+    A heading is located on a line it opens (see _heading_offset), never
+    at a mention mid-line such as "the RESULTS section below".
+
+    Returns:
+        Sections in document order: dicts with heading, byte offsets (offset,
+        body_start, end) into the document's CompactText and a content hash
+        of heading plus body. Headings that cannot be located keep offset -1
+        and an empty body.
+    """
+    text = compact_text(document)
+    headings = [h for h in document.get('metadata', {}).get('sections', []) if h and h.strip()]
+
+    located = []
+    unlocated = []
+    for heading in headings:
+        offset = _heading_offset(text.buffer, heading)
+        if offset >= 0:
+            located.append((offset, heading))
+        else:
+            unlocated.append(heading)
+    located.sort()
+
+    sections = []
+    for i, (offset, heading) in enumerate(located):
+        end = located[i + 1][0] if i + 1 < len(located) else len(text)
+        body_start = offset + len(heading.encode('utf-8', 'surrogatepass'))
+        sections.append({
+            'heading': heading,
+            'offset': offset,
+            'body_start': body_start,
+            'end': end,
+            'hash': _section_hash(heading, text.view(body_start, end))
+        })
+    for heading in unlocated:
+        sections.append({'heading': heading, 'offset': -1, 'body_start': -1, 'end': -1, 'hash': text_hash(heading + '\n')})
+    return sections
+
+
+def _heading_offset(buffer: bytes, heading: str) -> int:
+    """
+    Byte offset of a heading on a line it opens, or -1.
+
+    Indentation and markdown '#'s may precede it. A line holding only the
+    heading wins over one that merely starts with it.
+    """
+    pattern = rb'^[ \t#]*(' + re.escape(heading.encode('utf-8', 'surrogatepass')) + rb')'
+    match = re.search(pattern + rb'[ \t\r]*$', buffer, re.MULTILINE) or re.search(pattern, buffer, re.MULTILINE)
+    return match.start(1) if match else -1
+
+
+def _section_hash(heading: str, body: memoryview) -> str:
+    # Same digest as text_hash(heading + '\n' + body), without decoding the body
+    digest = hashlib.sha1(heading.encode('utf-8', 'surrogatepass') + b'\n')
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def section_body(text: CompactText, section: Dict) -> str:
+    """Decode a section's body text (empty for headings that were not located)."""
+    return text.text(section['body_start'], section['end']) if section['offset'] >= 0 else ''
+
+
+def get_sections(document: dict) -> List[Dict]:
+    """Return the document's located sections, splitting them on first use."""
+    return get_artifact(document, 'sections', split_sections)
+
+
+def get_text_regions(document: dict) -> List[Tuple[int, int, str]]:
+    """
+    The document text cut at its section starts, as (start, end, content hash).
+
+    The regions cover the whole text: any preamble before the first located
+    heading, then each located section. A section whose text did not change
+    in a revision keeps its hash, so work derived from it can be reused.
+    """
+    return get_artifact(document, 'text_regions', _split_regions)
+
+
+def _split_regions(document: dict) -> List[Tuple[int, int, str]]:
+    text = compact_text(document)
+    starts = sorted({s['offset'] for s in get_sections(document) if s['offset'] > 0})
+    bounds = [0] + starts + [len(text)]
+    # Hashed by their own bytes: a section's 'hash' also covers heading
+    # text that can overlap the next (duplicate or nested) heading
+    return [
+        (start, end, hashlib.sha1(text.view(start, end)).hexdigest())
+        for start, end in zip(bounds, bounds[1:]) if start < end
+    ]
+
+
+class SectionIndex:
+    """BM25 inverted index over section headings and their body text."""
+
+    def __init__(self, sections: List[Dict], text: CompactText):
+        self.sections = sections
+        self.postings = defaultdict(list)  # term -> [(section id, weighted tf)]
+        self.lengths = []
+
+        for section_id, section in enumerate(sections):
+            # Body terms of an unchanged section come from the shared cache
+            counts = Counter(cached_by_hash(
+                'terms:' + section['hash'], lambda: Counter(iter_tokens(section_body(text, section)))
+            ))
+            for token in tokenize(section['heading']):
+                counts[token] += HEADING_WEIGHT
+            for token, tf in counts.items():
+                self.postings[token].append((section_id, tf))
+            self.lengths.append(sum(counts.values()))
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def _expand(self, term: str) -> List[str]:
+        # Exact term if indexed, otherwise the closest vocabulary entries (typos, variants)
+        if term in self.postings:
+            return [term]
+        return difflib.get_close_matches(term, self.postings.keys(), n=2, cutoff=FUZZY_CUTOFF)
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        """
+        Score sections against a query.
+
+        Returns:
+            Up to top_k matches (heading, score, offset), best first
+        """
+        num_sections = len(self.sections)
+        scores = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            for indexed_term in self._expand(term):
+                postings = self.postings[indexed_term]
+                idf = math.log(1 + (num_sections - len(postings) + 0.5) / (len(postings) + 0.5))
+                for section_id, tf in postings:
+                    norm = 1 - BM25_B + BM25_B * self.lengths[section_id] / (self.avg_length or 1)
+                    scores[section_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            {
+                'heading': self.sections[section_id]['heading'],
+                'score': round(score, 3),
+                'offset': self.sections[section_id]['offset']
+            }
+            for section_id, score in ranked
+        ]
+
+
+def get_section_index(document: dict) -> SectionIndex:
+    """Return the document's section index, building it on first use."""
+    return get_artifact(document, 'section_index', lambda doc: SectionIndex(get_sections(doc), compact_text(doc)))
@@ -1,3 +1,6 @@
+from loaders.compact_text import compact_text
+
+
 def summarize_content(document: dict) -> dict:
     """
     Summarize document content.
@@ -8,14 +11,12 @@ def summarize_content(document: dict) -> dict:
     Returns:
         Dict with status, summary, and details
     """
-    content = document.get('content', '')
+    text = compact_text(document)
     metadata = document.get('metadata', {})
     sections = metadata.get('sections', [])
     
-    # Get first few paragraphs as summary
-    paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
-    
-    if not paragraphs:
+    # Paragraph boundaries were found once at load; nothing is split here
+    if not text.num_paragraphs:
         return {
             'status': 'error',
             'summary': 'Unable to summarize - no content found',
@@ -30,9 +31,9 @@ def summarize_content(document: dict) -> dict:
         summary_parts.append(f'Sections include: {", ".join(sections[:5])}')
     
     # Get first paragraph as overview
-    first_para = paragraphs[0][:500] if paragraphs else ''
+    first_para = text.paragraph(0, max_chars=500)
     
-    word_count = len(content.split())
+    word_count = text.word_count
     
     return {
         'status': 'success',
@@ -41,6 +42,6 @@ def summarize_content(document: dict) -> dict:
             'structure': ', '.join(summary_parts),
             'preview': first_para,
             'word_count': word_count,
-            'paragraph_count': len(paragraphs)
+            'paragraph_count': text.num_paragraphs
         }
     }
\ No newline at end of file
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import UPLOAD_CHUNK_BYTES, UPLOAD_MAX_BYTES, UPLOAD_TTL_SECONDS
+from observability.log import get_logger
+
+logger = get_logger(__name__)
+
+# Bytes read from the request stream at a time, so a chunk is never held in memory whole
+STREAM_BLOCK_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    """A chunked upload request that cannot be honoured; carries the HTTP status to return."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+# upload_id -> lock / running whole-file digest. Only the lock and a ~200 byte
+# hash object live in memory; everything else is in the upload's directory.
+_locks = {}
+_digests = {}
+_registry_lock = threading.Lock()
+
+
+def init_upload(root: str, session_id: str, filename: str, size: int,
+                sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Start a chunked upload.
+
+    The data file is created at its final size up front, so chunks can be
+    written at their offsets in any order and retried independently.
+
+    Args:
+        root: Directory uploads are staged in
+        session_id: Owner; other sessions cannot touch the upload
+        filename: Already secured file name
+        size: Total file size in bytes
+        sha256: Optional hex digest of the whole file, checked on finalize
+
+    Returns:
+        Upload status (see upload_status)
+    """
+    if size <= 0:
+        raise UploadError('File is empty')
+    if size > UPLOAD_MAX_BYTES:
+        raise UploadError(f'File exceeds the {UPLOAD_MAX_BYTES // (1024 * 1024)} MB limit', 413)
+
+    expire_uploads(root)
+    upload_id = os.urandom(16).hex()
+    directory = _upload_dir(root, upload_id)
+    os.makedirs(directory)
+    with open(os.path.join(directory, 'data'), 'wb') as file:
+        file.truncate(size)
+
+    meta = {
+        'upload_id': upload_id,
+        'session_id': session_id,
+        'filename': filename,
+        'size': size,
+        'chunk_size': UPLOAD_CHUNK_BYTES,
+        'num_chunks': -(-size // UPLOAD_CHUNK_BYTES),
+        'sha256': sha256.lower() if sha256 else None,
+        'received': {},  # chunk index (str) -> sha256
+        'updated': time.time()
+    }
+    _write_meta(directory, meta)
+    with _registry_lock:
+        _locks[upload_id] = threading.Lock()
+        _digests[upload_id] = [hashlib.sha256(), 0]
+    logger.info('chunked upload started', extra={
+        'upload': upload_id, 'document': filename, 'size': size, 'num_chunks': meta['num_chunks']
+    })
+    return _public(meta)
+
+
+def write_chunk(root: str, session_id: str, upload_id: str, index: int, stream,
+                expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Stream one chunk from the request body into the data file at its offset.
+
+    The chunk is hashed while it is staged in a part file, and copied into
+    the data file only once its length and checksum are valid. A rejected
+    re-send therefore leaves the chunk received earlier intact, and the
+    client simply re-sends it.
+
+    Args:
+        stream: File-like request body
+        expected_sha256: Hex digest the client computed for the chunk
+
+    Returns:
+        Upload status
+    """
+    directory, meta = _owned(root, session_id, upload_id)
+    if not 0 <= index < meta['num_chunks']:
+        raise UploadError(f'Chunk {index} is out of range (0-{meta["num_chunks"] - 1})')
+
+    offset = index * meta['chunk_size']
+    length = min(meta['chunk_size'], meta['size'] - offset)
+    part = os.path.join(directory, f'chunk-{index}-{os.urandom(4).hex()}.part')
+    try:
+        digest = hashlib.sha256()
+        written = 0
+        with open(part, 'wb') as file:
+            while written < length:
+                block = stream.read(min(STREAM_BLOCK_BYTES, length - written))
+                if not block:
+                    break
+                file.write(block)
+                digest.update(block)
+                written += len(block)
+            extra = stream.read(1)
+
+        if written != length or extra:
+            raise UploadError(f'Chunk {index} must be exactly {length} bytes')
+        checksum = digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != checksum:
+            raise UploadError(f'Chunk {index} checksum mismatch', 422)
+
+        with _lock_for(upload_id):
+            meta = _read_meta(directory)
+            previous = meta['received'].get(str(index))
+            if previous != checksum:
+                if previous:
+                    # Rewritten with different bytes; the running digest may already cover it
+                    with _registry_lock:
+                        _digests.pop(upload_id, None)
+                _copy_into(part, os.path.join(directory, 'data'), offset)
+            meta['received'][str(index)] = checksum
+            meta['updated'] = time.time()
+            _write_meta(directory, meta)
+            _advance_digest(directory, meta)
+    finally:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+    return _public(meta)
+
+
+def upload_status(root: str, session_id: str, upload_id: str) -> Dict[str, Any]:
+    """Which chunks the server already has, so an interrupted upload can resume."""
+    _, meta = _owned(root, session_id, upload_id)
+    return _public(meta)
+
+
+def finalize_upload(root: str, session_id: str, upload_id: str) -> Dict[str, Any]:
+    """
+    Check that every chunk arrived and move the file to its final name.
+
+    Returns:
+        {'filepath', 'filename', 'fingerprint'} where fingerprint is the
+        SHA-256 of the whole file (computed as chunks arrived where possible)
+    """
+    directory, meta = _owned(root, session_id, upload_id)
+    with _lock_for(upload_id):
+        missing = [i for i in range(meta['num_chunks']) if str(i) not in meta['received']]
+        if missing:
+            raise UploadError(f'{len(missing)} chunk(s) missing, first is {missing[0]}', 409)
+
+        with _registry_lock:
+            running = _digests.get(upload_id)
+        if running and running[1] == meta['num_chunks']:
+            fingerprint = running[0].hexdigest()
+        else:
+            # Digest state is lost on restart; hash the file once from disk
+            from main import file_fingerprint
+            fingerprint = file_fingerprint(os.path.join(directory, 'data'))
+
+        if meta['sha256'] and meta['sha256'] != fingerprint:
+            raise UploadError('File checksum mismatch', 422)
+
+        filepath = completed_path(root, meta['filename'], upload_id)
+        os.replace(os.path.join(directory, 'data'), filepath)
+    _discard(root, upload_id)
+    logger.info('chunked upload complete', extra={'upload': upload_id, 'document': meta['filename']})
+    return {'filepath': filepath, 'filename': meta['filename'], 'fingerprint': fingerprint}
+
+
+def completed_path(root: str, filename: str, upload_id: Optional[str] = None) -> str:
+    """
+    Where an uploaded file is kept while it is a session's document.
+
+    Scoped by upload id: two sessions uploading files with the same name
+    must not overwrite (or delete) each other's, since lazily loaded PDFs
+    keep reading the file after the upload.
+
+    Args:
+        root: Directory uploads are kept in
+        filename: Already secured file name
+        upload_id: The chunked upload's id; a new one for single-request uploads
+    """
+    filepath = os.path.join(root, 'completed_uploads', upload_id or os.urandom(16).hex(), filename)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    return filepath
+
+
+def remove_completed(filepath: str) -> None:
+    """Delete a file from completed_path() together with its upload directory."""
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    directory = os.path.dirname(filepath)
+    if os.path.basename(os.path.dirname(directory)) == 'completed_uploads':
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def abort_upload(root: str, session_id: str, upload_id: str) -> None:
+    _owned(root, session_id, upload_id)
+    _discard(root, upload_id)
+
+
+def expire_uploads(root: str) -> None:
+    """Delete uploads idle for longer than UPLOAD_TTL_SECONDS."""
+    base = os.path.join(root, 'chunked_uploads')
+    if not os.path.isdir(base):
+        return
+    cutoff = time.time() - UPLOAD_TTL_SECONDS
+    for upload_id in os.listdir(base):
+        try:
+            if _read_meta(os.path.join(base, upload_id))['updated'] < cutoff:
+                _discard(root, upload_id)
+        except (OSError, ValueError, KeyError):
+            continue
+
+
+def _advance_digest(directory: str, meta: Dict[str, Any]) -> None:
+    # Extend the whole-file hash over the contiguous run of received chunks,
+    # so finalize does not have to read the file again. Caller holds the lock.
+    with _registry_lock:
+        running = _digests.get(meta['upload_id'])
+    if running is None:
+        return
+    digest, next_index = running
+    if str(next_index) not in meta['received']:
+        return
+    with open(os.path.join(directory, 'data'), 'rb') as file:
+        file.seek(next_index * meta['chunk_size'])
+        while str(next_index) in meta['received']:
+            remaining = min(meta['chunk_size'], meta['size'] - next_index * meta['chunk_size'])
+            while remaining:
+                block = file.read(min(STREAM_BLOCK_BYTES, remaining))
+                digest.update(block)
+                remaining -= len(block)
+            next_index += 1
+    running[1] = next_index
+
+
+def _copy_into(source: str, target: str, offset: int) -> None:
+    with open(source, 'rb') as src, open(target, 'r+b') as dst:
+        dst.seek(offset)
+        shutil.copyfileobj(src, dst, STREAM_BLOCK_BYTES)
+
+
+def _owned(root: str, session_id: str, upload_id: str):
+    directory = _upload_dir(root, upload_id)
+    try:
+        meta = _read_meta(directory)
+    except (OSError, ValueError):
+        raise UploadError('Upload not found or expired', 404)
+    if meta['session_id'] != session_id:
+        raise UploadError('Upload not found or expired', 404)
+    return directory, meta
+
+
+def _lock_for(upload_id: str) -> threading.Lock:
+    with _registry_lock:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _discard(root: str, upload_id: str) -> None:
+    shutil.rmtree(_upload_dir(root, upload_id), ignore_errors=True)
+    with _registry_lock:
+        _locks.pop(upload_id, None)
+        _digests.pop(upload_id, None)
+
+
+def _upload_dir(root: str, upload_id: str) -> str:
+    if not upload_id.isalnum():
+        raise UploadError('Invalid upload id')
+    return os.path.join(root, 'chunked_uploads', upload_id)
+
+
+def _read_meta(directory: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _write_meta(directory: str, meta: Dict[str, Any]) -> None:
+    # Write-then-rename so a crash never leaves a half-written meta file
+    temp = os.path.join(directory, 'meta.json.tmp')
+    with open(temp, 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+    os.replace(temp, os.path.join(directory, 'meta.json'))
+
+
+def _public(meta: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'upload_id': meta['upload_id'],
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'chunk_size': meta['chunk_size'],
+        'num_chunks': meta['num_chunks'],
+        'received': sorted(int(i) for i in meta['received'])
+    }
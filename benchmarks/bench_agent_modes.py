@@ -0,0 +1,81 @@
+"""
+Compare end-to-end latency of the one-shot and full agent graphs.
+
+Runs the same simple queries through both modes against a stub Ollama
+server whose first token takes a fixed time, so the difference is the
+number of LLM round trips.
+
+Usage (from the repository root):
+    python benchmarks/bench_agent_modes.py --runs 5 --first-token-delay 0.5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB = os.path.join(ROOT, 'benchmarks', 'ollama_stub.py')
+PORT = 11511
+
+QUERIES = [
+    'Is there an overview section?',
+    'Does the document contain diagrams or figures?',
+    'What does the introduction say?'
+]
+
+DOCUMENT_TEXT = """Overview
+This report describes the floor plan verification pipeline.
+
+Introduction
+Floor plans are checked for area mismatches before approval.
+
+Methodology
+Each room polygon is measured and compared against the declared area, see Figure 1.
+
+Results
+Most plans were within tolerance.
+
+Conclusion
+Automated verification saves reviewers time.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--first-token-delay', type=float, default=0.5)
+    args = parser.parse_args()
+
+    os.environ['OLLAMA_ENDPOINTS'] = f'http://127.0.0.1:{PORT}'
+    sys.path.insert(0, os.path.join(ROOT, 'app'))
+    import config
+    config.LLM_CACHE_ENABLED = False  # Every run must reach the (stub) model
+
+    stub = subprocess.Popen([sys.executable, STUB, '--port', str(PORT),
+                             '--first-token-delay', str(args.first_token_delay)])
+    try:
+        time.sleep(1.0)
+        from agents.graph import iter_agent_stream, latency_stats
+        document = {
+            'content': DOCUMENT_TEXT,
+            'file_type': 'txt',
+            'metadata': {'sections': ['Overview', 'Introduction', 'Methodology', 'Results', 'Conclusion']},
+            'fingerprint': 'bench-agent-modes'
+        }
+        for mode in ('full', 'one_shot'):
+            for _ in range(args.runs):
+                for query in QUERIES:
+                    for _ in iter_agent_stream(query, document, mode=mode):
+                        pass
+
+        print(f"\n{'mode':<10}{'runs':>6}{'first token p50':>18}{'total p50':>12}{'total p95':>12}")
+        for mode, stats in latency_stats().items():
+            print(f"{mode:<10}{stats['runs']:>6}{stats['first_token_median_ms']:>15.0f} ms"
+                  f"{stats['total_median_ms']:>9.0f} ms{stats['total_p95_ms']:>9.0f} ms")
+    finally:
+        stub.terminate()
+
+
+if __name__ == '__main__':
+    main()
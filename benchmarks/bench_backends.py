@@ -0,0 +1,80 @@
+"""
+Compare streamed-call latency across stub Ollama backends with and without hedging.
+
+Starts three stub servers (one of them slow), points the app's LLM pool at
+them and streams a batch of prompts through get_llm().
+
+Usage (from the repository root):
+    python benchmarks/bench_backends.py --calls 30
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB = os.path.join(ROOT, 'benchmarks', 'ollama_stub.py')
+PORTS = [11501, 11502, 11503]
+
+
+def start_stubs():
+    delays = {11501: 0.05, 11502: 0.05, 11503: 3.0}
+    return [
+        subprocess.Popen([sys.executable, STUB, '--port', str(port), '--first-token-delay', str(delays[port])])
+        for port in PORTS
+    ]
+
+
+def run(calls: int, hedge_after):
+    import config
+    config.LLM_HEDGE_AFTER_SECONDS = hedge_after
+    import llm.backends as backends
+    backends.LLM_HEDGE_AFTER_SECONDS = hedge_after
+
+    from langchain_core.messages import HumanMessage
+    latencies = []
+    for i in range(calls):
+        llm = config.get_llm(model='stub')
+        started = time.perf_counter()
+        first = None
+        for chunk in llm.stream([HumanMessage(content=f'prompt {i}')]):
+            if first is None and chunk.content:
+                first = time.perf_counter() - started
+        latencies.append(first)
+    return latencies
+
+
+def report(label, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{label:<12} first token: median {statistics.median(ordered) * 1000:7.1f} ms   "
+          f"p95 {p95 * 1000:7.1f} ms   max {ordered[-1] * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=30)
+    parser.add_argument('--hedge-after', type=float, default=0.25)
+    args = parser.parse_args()
+
+    os.environ['OLLAMA_ENDPOINTS'] = ','.join(f'http://127.0.0.1:{port}' for port in PORTS)
+    sys.path.insert(0, os.path.join(ROOT, 'app'))
+
+    # The stubs are not a real model; keep cached answers out of the measurement
+    import config
+    config.LLM_CACHE_ENABLED = False
+
+    stubs = start_stubs()
+    try:
+        time.sleep(1.0)
+        report('no hedging', run(args.calls, None))
+        report(f'hedge {args.hedge_after}s', run(args.calls, args.hedge_after))
+    finally:
+        for stub in stubs:
+            stub.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Measure cold-start time of the web app.
+
+Reports, from process launch:
+  - import: time to import app.py in a fresh interpreter
+  - first page: time until GET / answers 200
+  - ready: time until /health reports the agent stack preloaded and the
+    model warm (against a stub Ollama with a simulated model-load delay)
+
+Usage (from the repository root):
+    python benchmarks/bench_cold_start.py --runs 3 --load-delay 2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, 'app')
+STUB = os.path.join(ROOT, 'benchmarks', 'ollama_stub.py')
+STUB_PORT = 11531
+APP_PORT = 5731
+
+
+def time_import() -> float:
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, '-c', code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def get(path: str):
+    with urllib.request.urlopen(f'http://127.0.0.1:{APP_PORT}{path}', timeout=1) as response:
+        return response.status, response.read()
+
+
+def time_server(timeout: float = 120.0):
+    env = dict(os.environ, PORT=str(APP_PORT), OLLAMA_ENDPOINTS=f'http://127.0.0.1:{STUB_PORT}')
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, 'app.py'], cwd=APP_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_page = ready = None
+    try:
+        while time.perf_counter() - started < timeout and ready is None:
+            try:
+                if first_page is None and get('/')[0] == 200:
+                    first_page = time.perf_counter() - started
+                if first_page is not None and json.loads(get('/health')[1])['ready']:
+                    ready = time.perf_counter() - started
+            except Exception:
+                pass
+            time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_page, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--load-delay', type=float, default=2.0, help='Simulated model load time in the stub')
+    args = parser.parse_args()
+
+    stub = subprocess.Popen([sys.executable, STUB, '--port', str(STUB_PORT), '--load-delay', str(args.load_delay)],
+                            stdout=subprocess.DEVNULL)
+    try:
+        time.sleep(1.0)
+        imports, pages, readies = [], [], []
+        for _ in range(args.runs):
+            imports.append(time_import())
+            first_page, ready = time_server()
+            pages.append(first_page)
+            readies.append(ready)
+
+        def fmt(values):
+            values = [v for v in values if v is not None]
+            return f"{statistics.median(values) * 1000:8.0f} ms" if values else "     n/a"
+
+        print(f"\nimport app.py     {fmt(imports)}")
+        print(f"first page (GET /) {fmt(pages)}")
+        print(f"ready (/health)   {fmt(readies)}   (model load {args.load_delay}s)")
+    finally:
+        stub.terminate()
+
+
+if __name__ == '__main__':
+    main()
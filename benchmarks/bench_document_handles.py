@@ -0,0 +1,107 @@
+"""
+Compare passing the document by value vs by handle through the agent graph.
+
+Runs the full agent (checkpointed, like /analyze-stream) on a large
+synthetic document against a zero-latency stub Ollama server and reports:
+  - event payload: pickled size of all astream_events data
+  - event throughput: events per second
+  - peak traced memory during the run (tracemalloc)
+
+Usage (from the repository root):
+    python benchmarks/bench_document_handles.py --mb 20
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB = os.path.join(ROOT, 'benchmarks', 'ollama_stub.py')
+PORT = 11521
+QUERY = 'Check the format and the figures in this specification'
+
+
+def make_document(megabytes: float) -> dict:
+    sections, parts, i = [], [], 0
+    paragraph = ("The verification service measures every room polygon and compares it with the "
+                 "declared area, flagging any mismatch above tolerance. See Figure 1 and Table 2. ") * 8
+    while sum(map(len, parts)) < megabytes * 1024 * 1024:
+        heading = f"{i + 1}. Section {i + 1}"
+        sections.append(heading)
+        parts.append(f"{heading}\n{paragraph}\n")
+        i += 1
+    return {
+        'content': '\n'.join(parts),
+        'file_type': 'txt',
+        'metadata': {'sections': sections, 'filename': 'large.txt'},
+        'fingerprint': f'bench-large-{megabytes}'
+    }
+
+
+async def run_once(document: dict, thread: str, measure_payload: bool):
+    from agents.graph import get_agent_graph, resume_conversation
+    from memory import checkpoints
+    from memory.document_store import pinned
+    from state.agent_state import create_initial_state
+
+    app = get_agent_graph('full', checkpointed=True)
+    events = payload = 0
+    started = time.perf_counter()
+    with pinned(document) as document_ref:
+        state = create_initial_state(QUERY, document_ref)
+        resume_conversation(state, app, thread)
+        async for event in app.astream_events(state, config=checkpoints.thread_config(thread), version='v2'):
+            events += 1
+            if measure_payload:
+                payload += len(pickle.dumps(event.get('data'), protocol=pickle.HIGHEST_PROTOCOL))
+    return events, payload, time.perf_counter() - started
+
+
+def measure(document: dict, by_reference: bool) -> dict:
+    import memory.document_store as document_store
+    document_store.PASS_DOCUMENTS_BY_REFERENCE = by_reference
+    label = 'handle' if by_reference else 'value'
+
+    # Payload size (pickling slows the run, so throughput is timed separately)
+    _, payload, _ = asyncio.run(run_once(document, f'bench:{label}:payload', True))
+
+    tracemalloc.start()
+    events, _, elapsed = asyncio.run(run_once(document, f'bench:{label}:timed', False))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'events': events, 'payload': payload, 'elapsed': elapsed, 'peak': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=20, help='Document size in MB')
+    args = parser.parse_args()
+
+    os.environ['OLLAMA_ENDPOINTS'] = f'http://127.0.0.1:{PORT}'
+    sys.path.insert(0, os.path.join(ROOT, 'app'))
+    import config
+    config.LLM_CACHE_ENABLED = False
+
+    stub = subprocess.Popen([sys.executable, STUB, '--port', str(PORT),
+                             '--first-token-delay', '0', '--token-delay', '0'])
+    try:
+        time.sleep(1.0)
+        document = make_document(args.mb)
+        print(f"\n📄 Document: {len(document['content']) / 1024 / 1024:.1f} MB, "
+              f"{len(document['metadata']['sections'])} sections\n")
+        print(f"{'mode':<8}{'events':>8}{'payload':>14}{'events/s':>11}{'peak memory':>14}")
+        for by_reference in (False, True):
+            r = measure(document, by_reference)
+            print(f"{'handle' if by_reference else 'value':<8}{r['events']:>8}"
+                  f"{r['payload'] / 1024 / 1024:>11.1f} MB{r['events'] / r['elapsed']:>11.0f}"
+                  f"{r['peak'] / 1024 / 1024:>11.1f} MB")
+    finally:
+        stub.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Measure the memory a loaded document costs, and the peak while tools run.
+
+Writes a synthetic text document, loads it with load_document and runs
+every tool on it under tracemalloc, reporting:
+  - retained: memory held by the loaded document
+  - load peak: peak while loading
+  - tools peak: peak above the loaded document while all tools run
+  - after tools: retained document plus the indexes the tools cached
+
+Pass --app-dir to measure another checkout (e.g. a worktree of an older
+commit) for a before/after comparison.
+
+Usage (from the repository root):
+    python benchmarks/bench_document_memory.py --mb 20
+    python benchmarks/bench_document_memory.py --mb 20 --unicode
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERY = 'Where does the report verify room areas against the declared floor plan?'
+
+
+def write_document(path: str, megabytes: float, unicode: bool) -> None:
+    # A non-Latin-1 character (the en dash) makes Python store the whole str
+    # at 2 bytes per character; UTF-8 keeps it at about 1
+    dash = ' – ' if unicode else ' - '
+    paragraph = (f"The verification service measures every room polygon{dash}and compares it with the "
+                 "declared area, flagging any mismatch above tolerance. See Figure 1 and Table 2.\n") * 6
+    written, i = 0, 0
+    with open(path, 'w', encoding='utf-8') as file:
+        while written < megabytes * 1024 * 1024:
+            heading = f"SECTION {i + 1} RESULTS" if i % 10 == 0 else f"{i + 1}. Room checks {i + 1}"
+            block = f"{heading}\n\n{paragraph}\n"
+            file.write(block)
+            written += len(block.encode('utf-8'))
+            i += 1
+
+
+def measure(path: str) -> dict:
+    from agents.actions import QUERY_AWARE_TOOLS, TOOL_REGISTRY
+    from main import load_document
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    started = time.perf_counter()
+    document = load_document(path)
+    load_seconds = time.perf_counter() - started
+    gc.collect()
+    retained, load_peak = tracemalloc.get_traced_memory()
+
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    for name, tool in TOOL_REGISTRY.items():
+        tool(document, QUERY) if name in QUERY_AWARE_TOOLS else tool(document)
+    tools_seconds = time.perf_counter() - started
+    gc.collect()
+    after_tools, tools_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'retained': retained - before,
+        'load_peak': load_peak - before,
+        'tools_peak': tools_peak - retained,
+        'after_tools': after_tools - before,
+        'load_seconds': load_seconds,
+        'tools_seconds': tools_seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=20, help='Document size in MB (UTF-8)')
+    parser.add_argument('--unicode', action='store_true', help='Include non-Latin-1 characters')
+    parser.add_argument('--app-dir', default=os.path.join(ROOT, 'app'), help='app/ directory to measure')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.app_dir))
+    os.chdir(args.app_dir)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'large.txt')
+        write_document(path, args.mb, args.unicode)
+        size = os.path.getsize(path)
+        r = measure(path)
+
+    def mb(value):
+        return f"{value / 1024 / 1024:8.1f} MB ({value / size:4.1f}x)"
+
+    print(f"\n📄 {size / 1024 / 1024:.1f} MB {'unicode' if args.unicode else 'ascii'} text, {args.app_dir}")
+    print(f"retained      {mb(r['retained'])}   load {r['load_seconds']:.2f}s")
+    print(f"load peak     {mb(r['load_peak'])}")
+    print(f"tools peak    {mb(r['tools_peak'])}   tools {r['tools_seconds']:.2f}s")
+    print(f"after tools   {mb(r['after_tools'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Minimal stand-in for an Ollama server, for exercising load balancing and hedging.
+
+Implements GET /api/tags (health check), POST /api/generate (model load) and
+POST /api/chat (streamed NDJSON) with a configurable first-token delay,
+per-token delay and failure rate.
+Prompts asking for "valid JSON" get a canned agent plan.
+
+Usage:
+    python benchmarks/ollama_stub.py --port 11501 --first-token-delay 0.1
+    python benchmarks/ollama_stub.py --port 11502 --first-token-delay 5   # a slow backend
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPLY = "This is a stub answer from port {port}. It streams one word at a time."
+# Returned when the prompt asks for the agent's JSON plan
+PLAN_REPLY = '{"goal": "Answer the query", "plan": ["heading_search", "retriever"], "reasoning": "Stub plan"}'
+
+
+def make_handler(args):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def _json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/api/tags':
+                self._json(200, {'models': [{'name': args.model, 'model': args.model}]})
+            else:
+                self._json(200, {'status': 'Ollama is running'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+
+            if self.path == '/api/generate':
+                # Model load / warm-up request: nothing to generate
+                time.sleep(args.load_delay)
+                self._json(200, {'model': request.get('model', args.model), 'response': '', 'done': True})
+                return
+            if self.path != '/api/chat':
+                self._json(404, {'error': f'unknown path {self.path}'})
+                return
+            if random.random() < args.fail_rate:
+                self._json(500, {'error': 'stub failure'})
+                return
+
+            model = request.get('model', args.model)
+            prompt = ' '.join(str(m.get('content', '')) for m in request.get('messages', []))
+            reply = PLAN_REPLY if 'valid JSON' in prompt else REPLY.format(port=args.port)
+            words = reply.split(' ')
+            started = time.perf_counter()
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            time.sleep(args.first_token_delay)
+            try:
+                for i, word in enumerate(words):
+                    self._chunk(model, (' ' if i else '') + word, done=False)
+                    time.sleep(args.token_delay)
+                self._chunk(model, '', done=True, duration=time.perf_counter() - started, count=len(words))
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                # The client hedged elsewhere and hung up
+                pass
+
+        def _chunk(self, model, content, done, duration=0.0, count=0):
+            line = {
+                'model': model,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'message': {'role': 'assistant', 'content': content},
+                'done': done
+            }
+            if done:
+                line.update({
+                    'done_reason': 'stop',
+                    'total_duration': int(duration * 1e9),
+                    'prompt_eval_count': 1,
+                    'eval_count': count
+                })
+            data = (json.dumps(line) + '\n').encode('utf-8')
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=11501)
+    parser.add_argument('--model', default='stub')
+    parser.add_argument('--first-token-delay', type=float, default=0.05, help='Seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Seconds between tokens')
+    parser.add_argument('--load-delay', type=float, default=0.0, help='Seconds a warm-up (/api/generate) request takes')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of chat requests answered with HTTP 500')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(args))
+    print(f"🧪 Ollama stub on http://127.0.0.1:{args.port} "
+          f"(first token {args.first_token_delay}s, fail rate {args.fail_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()